@@ -0,0 +1,181 @@
+import argparse
+import os
+import random
+import time
+from collections import Counter
+from src.models.nav_graph import NavGraph
+from src.controllers.fleet_manager import FleetManager
+from src.controllers.site_fleet_manager import SiteFleetManager
+from src.models.site_graph import SiteGraph
+from src.gui.raster_renderer import RasterRenderer
+from src.utils.clock import SimulatedClock
+
+SIMULATION_TICK = 0.1  # simulated seconds per fleet update (matches the GUI tick)
+ANIMATION_FRAME_MS = 100  # playback time per frame of an exported animation
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the fleet simulation headless on a simulated clock")
+    parser.add_argument("nav_graph", help="Path to the nav graph JSON file")
+    parser.add_argument("--robots", type=int, default=10, help="Number of robots to spawn")
+    parser.add_argument("--duration", type=float, default=3600, help="Simulated duration in seconds")
+    parser.add_argument("--tick", type=float, default=SIMULATION_TICK, help="Simulated seconds per update")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for spawns and tasks")
+    parser.add_argument("--order-rate", type=float, default=None,
+                        help="Orders per simulated minute; by default every free robot always has one waiting")
+    parser.add_argument("--compact", action="store_true",
+                        help="Load the map as a compact CSR graph (uses the binary map cache)")
+    parser.add_argument("--site", action="store_true",
+                        help="Run every level of a multi-floor map, robots ride lifts between floors")
+    parser.add_argument("--log-file", default="fleet_logs.jsonl", help="Fleet event log (JSON lines)")
+    parser.add_argument("--frames", metavar="DIR", help="Write rendered frames as numbered PNGs into DIR")
+    parser.add_argument("--animation", metavar="FILE",
+                        help="Write rendered frames as one animation (.gif, .png or .webp); "
+                             "frames are kept in memory until the run ends")
+    parser.add_argument("--frame-interval", type=float, default=1.0,
+                        help="Simulated seconds between rendered frames")
+    parser.add_argument("--frame-size", default="800x600", help="Frame size in pixels, WIDTHxHEIGHT")
+    return parser.parse_args()
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    nav_graph = NavGraph(args.nav_graph, compact=args.compact)
+    # Start on a whole second so runs with the same seed step through the same clock values
+    clock = SimulatedClock(start=float(int(time.time())))
+    # Single-threaded stepping, so the traffic manager can skip locking
+    fleet_manager = FleetManager(nav_graph, clock, log_file=args.log_file, thread_safe=False, tick=args.tick)
+
+    # Robots cannot share a vertex, so the fleet is capped by the map size
+    vertices = list(range(len(nav_graph.vertices)))
+    rng.shuffle(vertices)
+    if args.robots > len(vertices):
+        print(f"Map has only {len(vertices)} vertices, spawning {len(vertices)} robots")
+    for vertex_idx in vertices[:args.robots]:
+        fleet_manager.spawn_robot(vertex_idx)
+
+    ticks = int(args.duration / args.tick)
+    dispatcher = fleet_manager.dispatcher
+    orders_due = 0.0
+    
+    # Replay frames, rendered offscreen so no display is needed
+    renderer = None
+    animation_frames = []
+    if args.frames or args.animation:
+        width, height = (int(size) for size in args.frame_size.lower().split("x"))
+        renderer = RasterRenderer(nav_graph, width, height)
+        frame_every = max(1, round(args.frame_interval / args.tick))
+        if args.frames:
+            os.makedirs(args.frames, exist_ok=True)
+    
+    started = time.perf_counter()
+
+    for tick in range(ticks):
+        # Orders go to the dispatcher, which hands them out as robots free up
+        if args.order_rate is None:
+            orders = len(dispatcher.available) - len(dispatcher.pending)
+        else:
+            orders_due += args.order_rate * args.tick / 60
+            orders = int(orders_due)
+            orders_due -= orders
+        for _ in range(orders):
+            dispatcher.submit(rng.randrange(len(nav_graph.vertices)))
+
+        fleet_manager.update_robots()
+        clock.advance(args.tick)
+        
+        if renderer is not None and tick % frame_every == 0:
+            frame_number = tick // frame_every
+            frame = renderer.render(
+                fleet_manager.snapshot(frame_number),
+                caption=f"t={(tick + 1) * args.tick:.0f}s  robots={len(fleet_manager.robots)}  "
+                        f"tasks completed={dispatcher.completed}"
+            )
+            if args.frames:
+                frame.save(os.path.join(args.frames, f"frame_{frame_number:05d}.png"))
+            if args.animation:
+                animation_frames.append(frame)
+
+    elapsed = time.perf_counter() - started
+    fleet_manager.close()
+    if animation_frames:
+        animation_frames[0].save(args.animation, save_all=True, append_images=animation_frames[1:],
+                                 duration=ANIMATION_FRAME_MS, loop=0)
+    statuses = Counter(robot.status for robot in fleet_manager.robots)
+
+    print(f"Simulated {ticks * args.tick:.0f}s in {elapsed:.2f}s wall time "
+          f"({ticks * args.tick / max(elapsed, 1e-9):.0f}x real time)")
+    metrics = dispatcher.metrics()
+    print(f"Robots: {len(fleet_manager.robots)}, tasks completed: {metrics['tasks_completed']}, "
+          f"failed: {metrics['tasks_failed']}, pending: {metrics['tasks_pending']}")
+    print(f"Throughput: {metrics['tasks_per_hour']:.1f} tasks/hour, "
+          f"mean queue latency {metrics['mean_queue_latency']:.1f}s, idle ratio {metrics['idle_ratio']:.1%}")
+    charging = fleet_manager.charging_scheduler.metrics()
+    energy = fleet_manager.energy_planner.metrics()
+    print(f"Charging: emergency={charging['emergency_charges']}, planned={charging['planned_charges']}, "
+          f"opportunistic={charging['opportunistic_charges']}, detours={energy['charging_detours']}, "
+          f"infeasible tasks={energy['infeasible_tasks']}")
+    print("Final status: " + ", ".join(f"{status}={count}" for status, count in sorted(statuses.items())))
+    conflicts = fleet_manager.traffic_manager.get_conflict_counts()
+    print("Conflicts: " + (", ".join(f"{kind}={count}" for kind, count in sorted(conflicts.items())) or "none"))
+    deadlocks = fleet_manager.traffic_manager.get_deadlock_counts()
+    print(f"Deadlocks: detected={deadlocks.get('detected', 0)}, rerouted={deadlocks.get('reroute', 0)}, "
+          f"backed off={deadlocks.get('backoff', 0)}, unresolved={deadlocks.get('unresolved', 0)}")
+
+
+def run_site(args):
+    """Headless run over all floors of a site, every free robot always has a task"""
+    rng = random.Random(args.seed)
+    site_graph = SiteGraph(args.nav_graph, compact=args.compact)
+    clock = SimulatedClock(start=float(int(time.time())))
+    fleet = SiteFleetManager(site_graph, clock, log_file=args.log_file, thread_safe=False, tick=args.tick)
+
+    # Spread the robots over the floors; each floor is only loaded once a robot spawns there
+    levels = site_graph.level_names
+    spawned = 0
+    for _ in range(args.robots * 10):
+        if spawned == args.robots:
+            break
+        level = rng.choice(levels)
+        if fleet.spawn_robot(level, rng.randrange(site_graph.vertex_counts[level])) is not None:
+            spawned += 1
+    if spawned < args.robots:
+        print(f"Found free vertices for only {spawned} robots")
+
+    ticks = int(args.duration / args.tick)
+    started = time.perf_counter()
+    for tick in range(ticks):
+        for _, robot in fleet.robots():
+            if robot.status in ("idle", "complete") and robot.id not in fleet.legs:
+                target_level = rng.choice(levels)
+                target = rng.randrange(site_graph.vertex_counts[target_level])
+                fleet.assign_task(robot.id, target_level, target)
+        fleet.update_robots()
+        clock.advance(args.tick)
+
+    elapsed = time.perf_counter() - started
+    fleet.close()
+    metrics = fleet.metrics()
+    print(f"Simulated {ticks * args.tick:.0f}s in {elapsed:.2f}s wall time "
+          f"({ticks * args.tick / max(elapsed, 1e-9):.0f}x real time)")
+    print(f"Robots: {spawned}, tasks completed: {metrics['tasks_completed']}, "
+          f"failed: {metrics['tasks_failed']}, in progress: {metrics['tasks_active']}")
+    print(f"Lift rides: {metrics['lift_rides']}, riding now: {metrics['riding']}, "
+          f"floors loaded: {', '.join(metrics['loaded_levels']) or 'none'}")
+    statuses = Counter(robot.status for _, robot in fleet.robots())
+    print("Final status: " + ", ".join(f"{status}={count}" for status, count in sorted(statuses.items())))
+
+
+def main():
+    args = parse_args()
+    if args.site:
+        if args.frames or args.animation or args.order_rate is not None:
+            print("--frames, --animation and --order-rate are not supported with --site")
+            return
+        run_site(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import math
+from src.models.robot import (
+    BATTERY_DRAIN_RATE, BATTERY_CHARGE_RATE, LOW_BATTERY_THRESHOLD, CRITICAL_BATTERY,
+    CHARGE_COMPLETE_THRESHOLD, lane_updates
+)
+
+OPPORTUNISTIC_CHARGE_LEVEL = 40  # idle robots below this top up when a charger is free right away
+OPPORTUNISTIC_IDLE_TIME = 5.0     # seconds a robot must have been idle before it tops up
+TICKS_PER_LANE = lane_updates()  # updates a robot needs to cross one lane
+PARKED_ROBOT_TICKS = 20 * TICKS_PER_LANE  # assumed wait for a charger blocked by a parked robot
+
+
+def charge_ticks(battery):
+    """Updates needed to charge from battery to CHARGE_COMPLETE_THRESHOLD"""
+    return max(0, math.ceil((CHARGE_COMPLETE_THRESHOLD - battery) / BATTERY_CHARGE_RATE))
+
+
+class ChargingScheduler:
+    """Charger slot reservations for a FleetManager.
+
+    Every charger has a queue of robots that reserved it, the first one
+    holding the slot. A robot that needs charging gets the charger where it
+    can start charging soonest: travel time or the time the robots ahead of
+    it in the queue need to finish, whichever is longer. Robots therefore
+    spread over the chargers instead of all heading for the nearest one.
+
+    Idle robots are also sent to charge ahead of time. This happens when the
+    energy their queued work is forecast to need would take them down to
+    LOW_BATTERY_THRESHOLD, or, if there is nothing to do, when they are
+    below OPPORTUNISTIC_CHARGE_LEVEL, have been idle for OPPORTUNISTIC_IDLE_TIME
+    and a charger is free. A top-up charges to CHARGE_COMPLETE_THRESHOLD like
+    any other charge, so a robot does not go back for every few percent.
+    """
+
+    def __init__(self, fleet_manager):
+        self.fleet_manager = fleet_manager
+        self.nav_graph = fleet_manager.nav_graph
+        self.robots = fleet_manager.robots
+        self.queues = {charger: [] for charger in self.nav_graph.chargers}  # charger -> robot IDs
+        self.robot_chargers = {}  # robot_id -> reserved charger
+        self.hops = {}            # charger -> {vertex: lane hops to the charger}, built on first use
+
+        # Metrics
+        self.emergency_charges = 0
+        self.planned_charges = 0      # Sent ahead of time for forecast work
+        self.opportunistic_charges = 0
+
+    def charger_hops(self, charger):
+        if charger not in self.hops:
+            self.hops[charger] = self.nav_graph.hop_counts(charger)
+        return self.hops[charger]
+
+    def _holder_ticks(self, robot):
+        """Updates until a robot ahead in a charger queue is done with the charger"""
+        charger = self.robot_chargers[robot.id]
+        if robot.status == "charging":
+            return charge_ticks(robot.battery)
+        hops = self.charger_hops(charger).get(robot.current_vertex, 0)
+        return hops * TICKS_PER_LANE + charge_ticks(robot.battery - hops * BATTERY_DRAIN_RATE)
+
+    def ready_ticks(self, charger, robot_id=None):
+        """Updates until charger is free for robot_id (or for a newcomer at the end of the queue)"""
+        ticks = 0
+        for holder_id in self._live_queue(charger):
+            if holder_id == robot_id:
+                break
+            ticks += self._holder_ticks(self.robots[holder_id])
+
+        occupant = self.robots.robot_at(charger)
+        if occupant is not None and occupant.id != robot_id and occupant.id not in self.queues[charger]:
+            # Standing on the charger without a reservation, e.g. parked after a task
+            if occupant.status == "charging":
+                ticks += charge_ticks(occupant.battery)
+            elif occupant.current_lane is None:
+                ticks += PARKED_ROBOT_TICKS
+        return ticks
+
+    def _live_queue(self, charger):
+        """Queue of a charger without robots that were despawned or disabled since reserving"""
+        queue = self.queues[charger]
+        live = [robot_id for robot_id in queue
+                if robot_id in self.robots and self.robots[robot_id].status != "disabled"]
+        if len(live) != len(queue):
+            for robot_id in queue:
+                if robot_id not in live:
+                    self.robot_chargers.pop(robot_id, None)
+            self.queues[charger] = live
+        return live
+
+    def rank_chargers(self, robot, blocked_vertices=None):
+        """Reachable chargers as (start ticks, charger), soonest start of charging first"""
+        ranked = []
+        for charger in self.nav_graph.chargers:
+            if blocked_vertices is not None and charger in blocked_vertices:
+                continue
+            hops = self.charger_hops(charger).get(robot.current_vertex)
+            if hops is None:
+                continue
+            if robot.battery - hops * BATTERY_DRAIN_RATE <= CRITICAL_BATTERY and hops > 0:
+                continue  # Would be disabled on the way
+            travel = hops * TICKS_PER_LANE
+            ranked.append((max(travel, self.ready_ticks(charger, robot.id)), travel, charger))
+        ranked.sort()
+        return [(start, charger) for start, _, charger in ranked]
+
+    def reserve(self, robot, blocked_lanes=None, blocked_vertices=None):
+        """Reserve the best charger for robot: (charger, path to it), or (None, None)"""
+        self.release(robot.id)
+        for _, charger in self.rank_chargers(robot, blocked_vertices):
+            path = self.nav_graph.find_shortest_path(robot.current_vertex, charger, blocked_lanes,
+                                                     blocked_vertices)
+            if path:
+                self.hold(robot.id, charger)
+                return charger, path
+        if blocked_lanes or blocked_vertices:
+            # Every charger is blocked right now: queue for the best one and wait it out
+            return self.reserve(robot)
+        return None, None
+
+    def hold(self, robot_id, charger):
+        """Reserve charger for robot_id, replacing any other reservation it has"""
+        self.release(robot_id, keep=charger)
+        if self.robot_chargers.get(robot_id) != charger:
+            self.queues[charger].append(robot_id)
+            self.robot_chargers[robot_id] = charger
+
+    def release(self, robot_id, keep=None):
+        """Drop a robot's reservation, unless it is for the charger keep"""
+        charger = self.robot_chargers.get(robot_id)
+        if charger is None or charger == keep:
+            return
+        del self.robot_chargers[robot_id]
+        self.queues[charger].remove(robot_id)
+
+    def emergency_charger(self, robot, blocked_lanes=None, blocked_vertices=None):
+        """Charger and path for a robot whose battery ran low (also when it reroutes)"""
+        rerouting = robot.id in self.robot_chargers
+        charger, path = self.reserve(robot, blocked_lanes, blocked_vertices)
+        if charger is not None and not rerouting:
+            self.emergency_charges += 1
+        return charger, path
+
+    def plan(self, dispatcher):
+        """Send available robots to charge when their forecast work or idleness calls for it"""
+        for robot_id in sorted(dispatcher.available):
+            robot = self.robots[robot_id]
+            if robot_id in self.robot_chargers or robot.status not in ("idle", "complete"):
+                continue
+            need = dispatcher.forecast_energy(robot_id)
+            if robot.battery >= CHARGE_COMPLETE_THRESHOLD:
+                continue  # As full as charging gets it
+            if robot.battery - need <= LOW_BATTERY_THRESHOLD:
+                ranked = self.rank_chargers(robot)
+                if ranked and self._send(robot, ranked[0][1]):
+                    self.planned_charges += 1
+            elif robot.battery < OPPORTUNISTIC_CHARGE_LEVEL and not dispatcher.has_work(robot_id) and \
+                    dispatcher.idle_for(robot_id) >= OPPORTUNISTIC_IDLE_TIME:
+                # Only top up where no one has to wait for it
+                free = [charger for _, charger in self.rank_chargers(robot)
+                        if self.ready_ticks(charger, robot_id) == 0]
+                if free and self._send(robot, free[0]):
+                    self.opportunistic_charges += 1
+
+    def _send(self, robot, charger):
+        if robot.current_vertex == charger:
+            robot.start_charging()
+            self.fleet_manager.wake_robot(robot.id)
+        else:
+            success, _ = self.fleet_manager.assign_task(robot.id, charger)
+            if not success:
+                return False
+        self.hold(robot.id, charger)
+        return True
+
+    def metrics(self):
+        return {
+            'emergency_charges': self.emergency_charges,
+            'planned_charges': self.planned_charges,
+            'opportunistic_charges': self.opportunistic_charges,
+            'charger_queue': sum(len(self._live_queue(charger)) for charger in self.queues),
+        }
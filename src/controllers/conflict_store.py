@@ -0,0 +1,34 @@
+from collections import Counter, deque
+
+CONFLICT_DISPLAY_TIME = 5  # seconds a conflict stays visible
+MAX_CONFLICTS = 256        # most recent conflicts kept for display
+
+
+class ConflictStore:
+    """Bounded, time-ordered store of recent conflicts.
+
+    Conflicts arrive in time order, so expired ones always sit at the left of
+    the ring buffer and are dropped with popleft(). Inserts are O(1) and
+    expiry is amortised O(1). Totals per conflict kind are kept for the whole
+    run, independent of the buffer.
+    """
+
+    def __init__(self, ttl=CONFLICT_DISPLAY_TIME, capacity=MAX_CONFLICTS):
+        self.ttl = ttl
+        self.entries = deque(maxlen=capacity)
+        self.counts = Counter()
+
+    def add(self, now, message, kind):
+        self.entries.append((now, message))
+        self.counts[kind] += 1
+
+    def expire(self, now):
+        while self.entries and now - self.entries[0][0] >= self.ttl:
+            self.entries.popleft()
+
+    def active(self, now):
+        self.expire(now)
+        return [message for _, message in self.entries]
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,238 @@
+import logging
+from collections import deque
+from src.models.robot import BATTERY_DRAIN_RATE
+
+MAX_TASK_ATTEMPTS = 3  # dispatch attempts before a task is dropped as failed
+TASK_ENERGY_SMOOTHING = 0.2  # weight of the latest task in the running mean of energy per task
+
+
+class Task:
+    __slots__ = ('id', 'target', 'robot_id', 'created_at', 'assigned_at', 'attempts', 'start_battery')
+
+    def __init__(self, task_id, target, robot_id, created_at):
+        self.id = task_id
+        self.target = target
+        self.robot_id = robot_id  # Robot the task was queued for, None for any robot
+        self.created_at = created_at
+        self.assigned_at = None
+        self.attempts = 0
+        self.start_battery = None
+
+
+class Dispatcher:
+    """Task queues and automatic hand-off for a FleetManager.
+
+    Tasks wait in a global pending queue or in a robot's own FIFO. Each tick
+    the fleet manager passes in the robots that parked, and the dispatcher
+    hands the next task to every robot that has nothing to do. A robot's own
+    queue comes first. Pending tasks are matched to the remaining free robots
+    oldest first, in batches, at minimum total travel (in lanes).
+    """
+
+    def __init__(self, fleet_manager):
+        self.fleet_manager = fleet_manager
+        self.clock = fleet_manager.clock
+        self.pending = deque()    # Tasks for any robot, oldest first
+        self.robot_queues = {}    # robot_id -> deque of tasks queued for that robot
+        self.current = {}         # robot_id -> task it is executing
+        self.available = set()    # Parked robots without a task
+        self.task_counter = 0
+
+        # Metrics
+        self.started_at = self.clock.time()
+        self.completed = 0
+        self.failed = 0
+        self.dispatched = 0
+        self.queue_latency_total = 0.0  # Seconds tasks waited before dispatch
+        self.spawned_at = {}      # robot_id -> spawn time
+        self.idle_since = {}      # robot_id -> time it became available
+        self.robot_time = 0.0     # Robot-seconds of despawned robots
+        self.idle_time = 0.0      # Idle robot-seconds of finished idle periods
+        self.task_energy = None   # Running mean of battery % used per completed task
+
+    def submit(self, target, robot_id=None):
+        """Queue a task for a specific robot or, by default, for whichever robot suits best"""
+        task = Task(self.task_counter, target, robot_id, self.clock.time())
+        self.task_counter += 1
+        if robot_id is None:
+            self.pending.append(task)
+        else:
+            self.robot_queues.setdefault(robot_id, deque()).append(task)
+        return task
+
+    def pending_count(self):
+        return len(self.pending) + sum(len(queue) for queue in self.robot_queues.values())
+
+    def has_work(self, robot_id):
+        """True if a task is waiting that robot_id could be given"""
+        return bool(self.pending or self.robot_queues.get(robot_id))
+
+    def idle_for(self, robot_id):
+        """Seconds robot_id has been available without a task, 0 if it is busy"""
+        since = self.idle_since.get(robot_id)
+        return 0.0 if since is None else self.clock.time() - since
+
+    def forecast_energy(self, robot_id):
+        """Battery % the work queued for a robot is expected to use.
+
+        The robot's own tasks are costed by lane hops along their route, and
+        the next pending task, if there is one, by the mean energy of past tasks.
+        """
+        robot = self.fleet_manager.robots[robot_id]
+        nav_graph = self.fleet_manager.nav_graph
+        energy = 0
+        vertex = robot.current_vertex
+        for task in self.robot_queues.get(robot_id, ()):
+            path = nav_graph.find_shortest_path(vertex, task.target)
+            if path:
+                energy += (len(path) - 1) * BATTERY_DRAIN_RATE
+                vertex = task.target
+        if self.pending and self.task_energy is not None:
+            energy += self.task_energy
+        return energy
+
+    def add_robot(self, robot_id):
+        now = self.clock.time()
+        self.spawned_at[robot_id] = now
+        self._set_available(robot_id, now)
+
+    def remove_robot(self, robot_id):
+        """Forget a despawned robot; its unfinished tasks go back to the pending queue"""
+        now = self.clock.time()
+        self._set_busy(robot_id, now)
+        tasks = list(self.robot_queues.pop(robot_id, ()))
+        if robot_id in self.current:
+            tasks.insert(0, self.current.pop(robot_id))
+        for task in reversed(tasks):
+            task.robot_id = None
+            self.pending.appendleft(task)
+        spawned_at = self.spawned_at.pop(robot_id, None)
+        if spawned_at is not None:
+            self.robot_time += now - spawned_at
+
+    def _set_available(self, robot_id, now):
+        if robot_id not in self.available:
+            self.available.add(robot_id)
+            self.idle_since[robot_id] = now
+
+    def _set_busy(self, robot_id, now):
+        if robot_id in self.available:
+            self.available.discard(robot_id)
+            self.idle_time += now - self.idle_since.pop(robot_id)
+
+    def dispatch(self, parked):
+        """Settle the tasks of robots that parked this tick and hand out new ones"""
+        now = self.clock.time()
+        robots = self.fleet_manager.robots
+        for robot in parked:
+            self._robot_parked(robot, now)
+
+        # Charge robots ahead of time before handing out work they could not finish
+        self.fleet_manager.charging_scheduler.plan(self)
+
+        # Robots given a task outside the dispatcher (e.g. by the operator or the
+        # charging scheduler) are busy
+        for robot_id in list(self.available):
+            if robots[robot_id].status not in ("idle", "complete"):
+                self._set_busy(robot_id, now)
+
+        for robot_id in sorted(robot_id for robot_id in self.available if self.robot_queues.get(robot_id)):
+            queue = self.robot_queues[robot_id]
+            task = queue.popleft()
+            if not queue:
+                del self.robot_queues[robot_id]
+            self._start(robot_id, task, now)
+
+        if self.pending and self.available:
+            self._dispatch_pending(now)
+
+    def _robot_parked(self, robot, now):
+        task = self.current.pop(robot.id, None)
+        if task is not None:
+            if robot.status == "complete" and robot.current_vertex == task.target:
+                self.completed += 1
+                self._record_energy(task.start_battery - robot.battery)
+            else:
+                # Diverted, e.g. to a charger: the task goes back to the front of its queue
+                self._requeue(task)
+        if robot.status in ("idle", "complete"):
+            self._set_available(robot.id, now)
+
+    def _record_energy(self, used):
+        if self.task_energy is None:
+            self.task_energy = used
+        else:
+            self.task_energy += TASK_ENERGY_SMOOTHING * (used - self.task_energy)
+
+    def _requeue(self, task):
+        if task.robot_id is None:
+            self.pending.appendleft(task)
+        else:
+            self.robot_queues.setdefault(task.robot_id, deque()).appendleft(task)
+
+    def _start(self, robot_id, task, now):
+        robot = self.fleet_manager.robots[robot_id]
+        if robot.current_vertex == task.target:
+            self.completed += 1  # Already there
+            return
+        success, message = self.fleet_manager.assign_task(robot_id, task.target)
+        if success:
+            self._started(robot_id, task, now)
+        else:
+            self._failed_attempt(task, message)
+
+    def _started(self, robot_id, task, now):
+        task.assigned_at = now
+        task.start_battery = self.fleet_manager.robots[robot_id].battery
+        self.current[robot_id] = task
+        self.dispatched += 1
+        self.queue_latency_total += now - task.created_at
+        self._set_busy(robot_id, now)
+
+    def _failed_attempt(self, task, message):
+        task.attempts += 1
+        if task.attempts < MAX_TASK_ATTEMPTS:
+            self._requeue(task)
+            return
+        self.failed += 1
+        self.fleet_manager.event_log.emit(self.clock.time(), task.robot_id,
+                                          "Dropped task %s to vertex %s: %s",
+                                          (task.id, task.target, message), logging.WARNING)
+
+    def _dispatch_pending(self, now):
+        # Oldest tasks first, as many as there are free robots
+        free = sorted(robot_id for robot_id in self.available if not self.robot_queues.get(robot_id))
+        batch = [self.pending.popleft() for _ in range(min(len(free), len(self.pending)))]
+        if not batch:
+            return
+        results = self.fleet_manager.assign_tasks([task.target for task in batch], free)
+        unassigned = []
+        for task, (_, robot_id, message) in zip(batch, results):
+            if robot_id is not None:
+                self._started(robot_id, task, now)
+            elif self._free_robot_at(task.target):
+                self.completed += 1  # A free robot is already there
+            else:
+                unassigned.append((task, message))
+        # Put the rest back in their original order
+        for task, message in reversed(unassigned):
+            self._failed_attempt(task, message)
+
+    def _free_robot_at(self, vertex):
+        robot = self.fleet_manager.robots.robot_at(vertex)
+        return robot is not None and robot.id in self.available and robot.current_lane is None
+
+    def metrics(self):
+        """Throughput since the dispatcher started"""
+        now = self.clock.time()
+        hours = max(now - self.started_at, 1e-9) / 3600
+        robot_time = self.robot_time + sum(now - spawned for spawned in self.spawned_at.values())
+        idle_time = self.idle_time + sum(now - since for since in self.idle_since.values())
+        return {
+            'tasks_completed': self.completed,
+            'tasks_failed': self.failed,
+            'tasks_pending': self.pending_count(),
+            'tasks_per_hour': self.completed / hours,
+            'mean_queue_latency': self.queue_latency_total / self.dispatched if self.dispatched else 0.0,
+            'idle_ratio': idle_time / robot_time if robot_time > 0 else 0.0,
+        }
@@ -0,0 +1,119 @@
+import math
+from src.controllers.charging_scheduler import TICKS_PER_LANE, charge_ticks
+from src.models.robot import (
+    BATTERY_DRAIN_RATE, LOW_BATTERY_THRESHOLD, CRITICAL_BATTERY, CHARGE_COMPLETE_THRESHOLD
+)
+
+
+def path_energy(path):
+    """Battery % a robot uses along path (waiting in place is free)"""
+    return sum(BATTERY_DRAIN_RATE for i in range(len(path) - 1) if path[i] != path[i + 1])
+
+
+class EnergyPlanner:
+    """Checks up front that a robot can afford a task and plans charging stops.
+
+    A route is feasible when the robot arrives with more than
+    LOW_BATTERY_THRESHOLD left, so it is never diverted mid-route, and can
+    still reach a charger from the target above CRITICAL_BATTERY. A route to
+    a charger only has to arrive above CRITICAL_BATTERY. An infeasible task
+    becomes a detour: drive to a charger, charge to
+    CHARGE_COMPLETE_THRESHOLD, then drive to the target. The charger
+    minimises total time (travel, queueing at the charger and charging)
+    subject to both legs being feasible, which is the resource-constrained
+    shortest path for a single stop.
+    """
+
+    def __init__(self, nav_graph, charging_scheduler):
+        self.nav_graph = nav_graph
+        self.charging_scheduler = charging_scheduler
+        self.nearest_charger_hops = None  # vertex -> lane hops to the closest charger
+
+        # Metrics
+        self.detours = 0
+        self.rejected = 0
+
+    def reserve_energy(self, vertex):
+        """Battery % needed to get from vertex to the closest charger (inf if none is reachable)"""
+        if self.nearest_charger_hops is None:
+            self.nearest_charger_hops = {}
+            for charger in self.nav_graph.chargers:
+                for v, hops in self.charging_scheduler.charger_hops(charger).items():
+                    if hops < self.nearest_charger_hops.get(v, math.inf):
+                        self.nearest_charger_hops[v] = hops
+        return self.nearest_charger_hops.get(vertex, math.inf) * BATTERY_DRAIN_RATE
+
+    def is_feasible(self, battery, path):
+        return self.is_energy_feasible(battery, path_energy(path), path[-1])
+
+    def is_booked_feasible(self, battery, start, path, target, hops_to_target):
+        """Whether the path a robot booked from start (path without start) is affordable.
+        
+        Waits along the path are free, detours are not. A cooperative plan covers
+        one planning window, so a path ending short of target is extended by
+        the fewest lanes from its end, read from hops_to_target.
+        """
+        energy = path_energy([start] + path)
+        if path[-1] != target:
+            energy += hops_to_target[path[-1]] * BATTERY_DRAIN_RATE
+        return self.is_energy_feasible(battery, energy, target)
+
+    def is_energy_feasible(self, battery, energy, target):
+        """Whether a trip using energy battery % may end at target"""
+        arrival = battery - energy
+        if self.nav_graph.is_charger(target):
+            return arrival > CRITICAL_BATTERY
+        return arrival > LOW_BATTERY_THRESHOLD and arrival - self.reserve_energy(target) > CRITICAL_BATTERY
+
+    def plan(self, robot, target, hops_to_target=None):
+        """Charging stop needed before target: (feasible, charger or None).
+
+        hops_to_target gives every vertex's lane hops to target (-1 if it cannot
+        get there) when the caller already has it, as the cooperative planner
+        does for its heuristic. Trips are then priced by hop counts, so no routes
+        are searched. Otherwise each trip is priced along its shortest route.
+        """
+        if hops_to_target is None:
+            route = self.nav_graph.find_shortest_path(robot.current_vertex, target)
+            energy = path_energy(route) if route else None
+        else:
+            hops = hops_to_target[robot.current_vertex]
+            energy = hops * BATTERY_DRAIN_RATE if hops >= 0 else None
+        if energy is None or self.is_energy_feasible(robot.battery, energy, target):
+            return True, None  # Unreachable targets are reported by the path planner
+        charger = self.charging_stop(robot, target, hops_to_target)
+        return charger is not None, charger
+
+    def charging_stop(self, robot, target, hops_to_target=None):
+        """Charger to stop at on the way to target, or None if no stop makes it feasible"""
+        best = None
+        for charger in self.nav_graph.chargers:
+            if hops_to_target is None:
+                to_charger = self.nav_graph.find_shortest_path(robot.current_vertex, charger)
+                to_target = self.nav_graph.find_shortest_path(charger, target)
+                if not to_charger or not to_target:
+                    continue
+                energy, target_energy = path_energy(to_charger), path_energy(to_target)
+            else:
+                hops = self.charging_scheduler.charger_hops(charger).get(robot.current_vertex)
+                if hops is None or hops_to_target[charger] < 0:
+                    continue
+                energy, target_energy = hops * BATTERY_DRAIN_RATE, hops_to_target[charger] * BATTERY_DRAIN_RATE
+            if robot.battery - energy <= CRITICAL_BATTERY or \
+                    not self.is_energy_feasible(CHARGE_COMPLETE_THRESHOLD, target_energy, target):
+                continue
+            travel = energy // BATTERY_DRAIN_RATE * TICKS_PER_LANE
+            start = max(travel, self.charging_scheduler.ready_ticks(charger, robot.id))
+            ticks = (start + charge_ticks(robot.battery - energy)
+                     + target_energy // BATTERY_DRAIN_RATE * TICKS_PER_LANE)
+            if best is None or ticks < best[0]:
+                best = (ticks, charger)
+
+        if best is None:
+            self.rejected += 1
+            return None
+        self.detours += 1
+        return best[1]
+
+    def metrics(self):
+        return {'charging_detours': self.detours, 'infeasible_tasks': self.rejected}
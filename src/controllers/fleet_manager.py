@@ -1,66 +1,206 @@
+import heapq
 import logging
+from types import MappingProxyType
+from src.controllers.charging_scheduler import ChargingScheduler
+from src.controllers.dispatcher import Dispatcher
+from src.controllers.energy_planner import EnergyPlanner
+from src.controllers.reservation_table import DEFAULT_TICK
 from src.controllers.traffic_manager import TrafficManager
-from src.models.robot import Robot
+from src.models.fleet_state import FleetState, STATUSES
+from src.models.fleet_snapshot import FleetSnapshot, RobotSnapshot
+from src.models.robot_registry import RobotRegistry
+from src.models.robot import (
+    Robot, ROBOT_SPEED, BATTERY_CHARGE_RATE, LOW_BATTERY_THRESHOLD, CRITICAL_BATTERY,
+    CHARGE_COMPLETE_THRESHOLD
+)
+from src.utils.clock import WallClock
+from src.utils.event_log import EventLog
+from src.utils.assignment import solve_assignment
+from src.utils.spatial_index import GridIndex
+
+PARKED_STATUSES = ("idle", "complete", "disabled")  # robots that need no per-tick update
 
 class FleetManager:
-    def __init__(self, nav_graph):
+    def __init__(self, nav_graph, clock=None, log_file="fleet_logs.jsonl", thread_safe=True, tick=DEFAULT_TICK,
+                 event_log=None):
         self.nav_graph = nav_graph
-        self.robots = []
-        self.traffic_manager = TrafficManager()
-        self.robot_counter = 0
-        self.log_file = "fleet_logs.txt"
-        
-        logging.basicConfig(
-            filename=self.log_file,
-            level=logging.INFO,
-            format='%(asctime)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
+        self.clock = clock or WallClock()
+        self.robots = RobotRegistry()  # Robots by ID, with a vertex -> robot index
+        self.state = FleetState()   # Struct-of-arrays robot state shared by all robots
+        self.slot_robots = {}       # FleetState slot -> robot
+        self.vertex_xs, self.vertex_ys = self._vertex_coordinates()
+        self.traffic_manager = TrafficManager(self.clock, thread_safe, tick)  # tick: seconds per update
+        self.log_file = log_file
+        self.event_log = event_log or EventLog(self.log_file)  # Shared by the floors of a site
+        
+        # Event-driven stepping: only active robots are updated each tick,
+        # waiting robots sleep in wake_queue until their wait expires
+        self.active = set()
+        self.wake_queue = []  # (wake time, robot_id) heap
+        
+        # Grid over robot positions, refreshed lazily when queried after a tick
+        self.robot_index = GridIndex(nav_graph.vertex_index().cell_size)
+        self.ticks = 0
+        self.robot_index_tick = 0
+        
+        self.dispatcher = Dispatcher(self)  # Task queues, handed out as robots park
+        self.charging_scheduler = ChargingScheduler(self)  # Charger reservations
+        self.energy_planner = EnergyPlanner(nav_graph, self.charging_scheduler)  # Charging stops in tasks
     
-    def spawn_robot(self, vertex_idx):
-        robot_id = self.robot_counter
-        self.robot_counter += 1
+    def spawn_robot(self, vertex_idx, robot_id=None):
+        """Add a robot at vertex_idx; robot_id keeps an ID handed out elsewhere (e.g. site-wide)"""
+        if robot_id is None:
+            robot_id = self.robots.new_id()
         
-        robot = Robot(robot_id, vertex_idx, self.nav_graph)
-        self.robots.append(robot)
+        robot = Robot(robot_id, vertex_idx, self.nav_graph, self.clock, self.event_log, self.state,
+                      self.robots, self.charging_scheduler, self.energy_planner)
+        self.robots.add(robot)
+        self.slot_robots[robot.slot] = robot
         self.traffic_manager.reserve_vertex(vertex_idx, robot_id)
+        self.active.add(robot_id)
+        x, y = self.nav_graph.vertices[vertex_idx]
+        self.robot_index.insert(robot_id, x, y)
+        self.dispatcher.add_robot(robot_id)
         
-        logging.info(f"Robot {robot_id} spawned at {self.nav_graph.get_vertex_name(vertex_idx)}")
         return robot
     
+    def despawn_robot(self, robot_id):
+        """Remove a robot, free everything it holds and make its ID reusable"""
+        if robot_id not in self.robots:
+            return False, "Invalid robot ID"
+        
+        robot = self.robots.remove(robot_id)
+        self.traffic_manager.release_robot(robot_id)
+        self.active.discard(robot_id)
+        self.robot_index.remove(robot_id)
+        self.dispatcher.remove_robot(robot_id)
+        self.charging_scheduler.release(robot_id)
+        del self.slot_robots[robot.slot]
+        self.state.free(robot.slot)
+        robot.log("Robot %s despawned", robot_id)
+        
+        return True, "Robot despawned"
+    
     def assign_task(self, robot_id, target_vertex):
-        if robot_id < 0 or robot_id >= len(self.robots):
+        if robot_id not in self.robots:
             return False, "Invalid robot ID"
         
         robot = self.robots[robot_id]
-        success, message = robot.assign_task(target_vertex)
+        success, message = robot.assign_task(target_vertex, self.traffic_manager)
+        self.wake_robot(robot_id)
         
-        if success:
-            logging.info(f"Robot {robot_id} assigned task to {self.nav_graph.get_vertex_name(target_vertex)}")
-        else:
-            logging.warning(f"Failed to assign task to Robot {robot_id}: {message}")
+        if not success:
+            self.event_log.emit(self.clock.time(), robot_id, "Failed to assign task: %s",
+                                (message,), logging.WARNING)
         
         return success, message
     
+    def assign_tasks(self, target_vertices, robot_ids=None):
+        """Assign a batch of targets to available robots with minimum total travel.
+        
+        Travel is counted in lanes: a robot crosses every lane in the same number
+        of updates and for the same battery, whatever its length. The costs come
+        from the traffic manager's hop table for each target, one breadth-first
+        search per target that the cooperative planner then reuses to plan the
+        trips it books. The robot-target matching is solved optimally with the
+        Hungarian algorithm. robot_ids limits the candidates to those robots; by
+        default every available robot is. Returns one (target, robot_id, message)
+        tuple per target, in order; robot_id is None for targets that could not
+        be assigned.
+        """
+        targets = list(target_vertices)
+        results = [(target, None, "No available robot") for target in targets]
+        candidates = self.robots if robot_ids is None else [self.robots[robot_id] for robot_id in robot_ids]
+        robots = [robot for robot in candidates
+                  if robot.status in ("idle", "complete") and robot.battery > CRITICAL_BATTERY]
+        if not robots or not targets:
+            return results
+        
+        hops = [self.traffic_manager.hops_to(self.nav_graph, target) for target in targets]
+        vertices = [robot.current_vertex for robot in robots]
+        # Unreachable pairs, and robots already standing on the target, get a
+        # cost above any real assignment so they are only chosen when nothing else is left
+        excluded = sum(max(table[vertex] for table in hops) for vertex in vertices) + 1
+        cost = [[table[vertex] if table[vertex] > 0 else excluded for table in hops] for vertex in vertices]
+        
+        for row, column in solve_assignment(cost):
+            if cost[row][column] >= excluded:
+                continue
+            robot_id = robots[row].id
+            success, message = self.assign_task(robot_id, targets[column])
+            results[column] = (targets[column], robot_id if success else None, message)
+        
+        return results
+    
+    def wake_robot(self, robot_id):
+        """Step a parked robot again, e.g. after its task or battery changed outside update"""
+        self.active.add(robot_id)
+    
     def update_robots(self):
-        for robot in self.robots:
-            robot.update(self.traffic_manager)
+        self.ticks += 1
+        now = self.clock.time()
+        while self.wake_queue and self.wake_queue[0][0] <= now:
+            robot_id = heapq.heappop(self.wake_queue)[1]
+            if robot_id in self.robots:  # Skip robots despawned while asleep
+                self.active.add(robot_id)
+        
+        # Robots whose blocking lane or vertex was released resume right away
+        for robot_id in self.traffic_manager.pop_woken_robots():
+            if robot_id in self.robots:
+                self.robots[robot_id].wake()
+                self.active.add(robot_id)
+        
+        # Batch steps: lane progress of robots mid-lane and charging of robots at
+        # chargers, for the whole fleet at once. Only the robots that arrive or
+        # finish charging need individual handling, which happens in robot ID
+        # order with the other updates, so a tick plays out exactly as if every
+        # robot had been updated in turn.
+        advanced, arrived = self.state.step_in_flight(ROBOT_SPEED, LOW_BATTERY_THRESHOLD)
+        charging, charged = self.state.step_charging(BATTERY_CHARGE_RATE, 100, CHARGE_COMPLETE_THRESHOLD)
+        arrived = {self.slot_robots[slot].id for slot in arrived}
+        charged = {self.slot_robots[slot].id for slot in charged}
+        stepped = {self.slot_robots[slot].id for slot in advanced}
+        stepped.update(self.slot_robots[slot].id for slot in charging)
+        
+        parked = []
+        for robot_id in sorted(self.active | arrived | charged):
+            robot = self.robots[robot_id]
+            if robot_id in arrived:
+                robot.finish_lane(self.traffic_manager)
+            elif robot_id in charged:
+                robot.finish_charging()
+            elif robot_id not in stepped:
+                robot.update(self.traffic_manager)
             
-            while robot.log_queue:
-                log_entry = robot.log_queue.pop(0)
-                logging.info(log_entry)
+            if robot.status in PARKED_STATUSES:
+                self.active.discard(robot_id)
+                parked.append(robot)
+            elif robot.status == "waiting":
+                self.active.discard(robot_id)
+                heapq.heappush(self.wake_queue, (robot.wait_until, robot_id))
+        
+        # Hand the next queued task to robots that finished or have nothing to do
+        self.dispatcher.dispatch(parked)
+    
+    def close(self):
+        """Flush and stop the background event log"""
+        self.event_log.close()
     
     def get_robot_status(self, robot_id):
-        if robot_id < 0 or robot_id >= len(self.robots):
-            return None
-        return self.robots[robot_id].status
+        robot = self.robots.get(robot_id)
+        return robot.status if robot is not None else None
+    
+    def _vertex_coordinates(self):
+        """Vertex x and y coordinates as flat arrays for batch interpolation"""
+        if self.nav_graph.csr is not None:
+            return self.nav_graph.csr.xs, self.nav_graph.csr.ys
+        return ([x for x, _ in self.nav_graph.vertices], [y for _, y in self.nav_graph.vertices])
     
     def get_robot_position(self, robot_id):
-        if robot_id < 0 or robot_id >= len(self.robots):
+        robot = self.robots.get(robot_id)
+        if robot is None:
             return None
         
-        robot = self.robots[robot_id]
-        
         if robot.current_lane is None:
             return self.nav_graph.vertices[robot.current_vertex]
         
@@ -71,4 +211,34 @@ class FleetManager:
         x = x1 + (x2 - x1) * robot.progress
         y = y1 + (y2 - y1) * robot.progress
         
-        return (x, y)
\ No newline at end of file
+        return (x, y)
+    
+    def get_robot_positions(self):
+        """Positions of all robots in one interpolation pass: {robot_id: (x, y)}"""
+        xs, ys = self.state.positions(self.vertex_xs, self.vertex_ys)
+        return {robot.id: (float(xs[slot]), float(ys[slot])) for slot, robot in self.slot_robots.items()}
+    
+    def robots_within(self, x, y, radius):
+        """IDs of robots within radius of map point (x, y), nearest first"""
+        if self.robot_index_tick != self.ticks:
+            for robot_id, (rx, ry) in self.get_robot_positions().items():
+                self.robot_index.move(robot_id, rx, ry)
+            self.robot_index_tick = self.ticks
+        return self.robot_index.within(x, y, radius)
+    
+    def snapshot(self, version=0):
+        """Immutable copy of the fleet state for readers on other threads"""
+        xs, ys = self.state.positions(self.vertex_xs, self.vertex_ys)
+        # Whole columns in one read each, rather than a property read per robot and field
+        statuses = self.state.values('status')
+        batteries = self.state.values('battery')
+        robots = {}
+        for slot, robot in self.slot_robots.items():
+            status, battery = STATUSES[statuses[slot]], batteries[slot]
+            charge_progress = battery / CHARGE_COMPLETE_THRESHOLD * 100 if status == "charging" else 0
+            robots[robot.id] = RobotSnapshot(
+                robot.id, robot.color, float(xs[slot]), float(ys[slot]), status, battery,
+                charge_progress, robot.path[-1] if robot.path else None
+            )
+        return FleetSnapshot(version, self.clock.time(), MappingProxyType(robots),
+                             tuple(self.traffic_manager.get_conflicts()))
\ No newline at end of file
@@ -0,0 +1,60 @@
+DEFAULT_TICK = 0.1  # seconds per fleet update, as in the GUI and simulate.py
+PLANNING_WINDOW = 16  # slots booked ahead by the cooperative planner
+
+
+def vertex_key(vertex):
+    return ('v', vertex)
+
+
+def lane_key(v1, v2):
+    # Undirected, so two robots can never book a head-on swap on one lane
+    return ('l', min(v1, v2), max(v1, v2))
+
+
+class ReservationTable:
+    """Space-time bookings of vertices and lanes, indexed by time slot"""
+
+    def __init__(self):
+        self.slots = {}     # slot -> {resource: robot_id}
+        self.by_robot = {}  # robot_id -> [(slot, resource), ...]
+        self.oldest_slot = None
+
+    def holder(self, resource, slot):
+        bookings = self.slots.get(slot)
+        return bookings.get(resource) if bookings else None
+
+    def is_free(self, resource, slot, robot_id):
+        holder = self.holder(resource, slot)
+        return holder is None or holder == robot_id
+
+    def reserve(self, resource, slot, robot_id):
+        self.slots.setdefault(slot, {})[resource] = robot_id
+        self.by_robot.setdefault(robot_id, []).append((slot, resource))
+        if self.oldest_slot is None or slot < self.oldest_slot:
+            self.oldest_slot = slot
+
+    def has_plan(self, robot_id):
+        return robot_id in self.by_robot
+
+    def release_robot(self, robot_id):
+        """Drop every booking a robot holds (on replan, completion or despawn)"""
+        for slot, resource in self.by_robot.pop(robot_id, ()):
+            bookings = self.slots.get(slot)
+            if bookings and bookings.get(resource) == robot_id:
+                del bookings[resource]
+                if not bookings:
+                    del self.slots[slot]
+
+    def prune(self, current_slot):
+        """Forget slots that are already in the past"""
+        if self.oldest_slot is None or self.oldest_slot >= current_slot:
+            return
+        for slot in [slot for slot in self.slots if slot < current_slot]:
+            del self.slots[slot]
+        self.oldest_slot = min(self.slots, default=None)
+        for robot_id in list(self.by_robot):
+            bookings = [(slot, resource) for slot, resource in self.by_robot[robot_id] if slot >= current_slot]
+            if bookings:
+                self.by_robot[robot_id] = bookings
+            else:
+                del self.by_robot[robot_id]
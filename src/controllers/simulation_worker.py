@@ -0,0 +1,66 @@
+import threading
+import time
+
+SIMULATION_INTERVAL = 0.1  # seconds between fleet updates (one robot movement step)
+
+
+class SimulationWorker:
+    """Steps a FleetManager on a background thread at a fixed rate.
+
+    After every step the worker publishes an immutable FleetSnapshot. The
+    snapshot is swapped in as a single reference, so readers always see
+    a complete step. A slow reader, such as the GUI drawing at its own
+    frame rate, simply skips the versions it missed. Code on other threads
+    that changes the fleet (spawning, assigning tasks, ...) must hold
+    `lock`.
+    """
+
+    def __init__(self, fleet_manager, interval=SIMULATION_INTERVAL):
+        self.fleet_manager = fleet_manager
+        self.interval = interval
+        self.lock = threading.RLock()
+        self.version = 0
+        self.snapshot = None
+        self.overruns = 0  # steps that took longer than the interval
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.publish()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="fleet-simulation", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop stepping and wait for the current step to finish"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def publish(self):
+        """Publish a fresh snapshot, e.g. right after a change made from another thread"""
+        with self.lock:
+            self.version += 1
+            self.snapshot = self.fleet_manager.snapshot(self.version)
+
+    def _run(self):
+        next_step = time.monotonic()
+        while not self.stop_event.is_set():
+            try:
+                with self.lock:
+                    self.fleet_manager.update_robots()
+                    self.publish()
+            except Exception as e:
+                print(f"Error in simulation step: {e}")
+                self.stop_event.set()
+                return
+
+            next_step += self.interval
+            delay = next_step - time.monotonic()
+            if delay < 0:
+                # Behind schedule: carry on from now rather than stepping in a burst
+                self.overruns += 1
+                next_step = time.monotonic()
+            else:
+                self.stop_event.wait(delay)
@@ -0,0 +1,200 @@
+import heapq
+import logging
+from collections import Counter
+from src.controllers.fleet_manager import FleetManager
+from src.controllers.reservation_table import DEFAULT_TICK
+from src.utils.clock import WallClock
+from src.utils.event_log import EventLog
+
+LIFT_RIDE_TIME = 10.0  # seconds a robot spends in a lift between two floors
+
+
+class SiteFleetManager:
+    """One fleet spread over the floors of a SiteGraph.
+
+    Each floor with robots on it runs its own FleetManager, so traffic,
+    charging and dispatch stay per floor. All floors share one clock and one
+    event log, and robot IDs are unique across the site. A floor's graph and
+    fleet manager are loaded when the first robot spawns on or rides to that
+    floor. They are unloaded again once its last robot has left.
+
+    A task on another floor follows the route SiteGraph.find_route picks. It
+    is split into one leg per floor. The robot drives to the lift stop that
+    ends a leg on its own floor, rides the lift for LIFT_RIDE_TIME and
+    reappears at the lift's stop on the next floor, where the next leg starts.
+    """
+
+    def __init__(self, site_graph, clock=None, log_file="fleet_logs.jsonl", thread_safe=True, tick=DEFAULT_TICK):
+        self.site_graph = site_graph
+        self.clock = clock or WallClock()
+        self.thread_safe = thread_safe
+        self.tick = tick
+        self.event_log = EventLog(log_file)
+        self.floors = {}        # level -> FleetManager for that floor
+        self.robot_levels = {}  # robot_id -> level it is on (None while riding a lift)
+        self.legs = {}          # robot_id -> [(level, target vertex), ...] left of its task
+        self.riding = []        # (arrival time, robot_id, level, vertex, battery) heap
+        self.next_id = 0
+
+        # Metrics
+        self.completed = 0
+        self.failed = 0
+        self.lift_rides = Counter()  # lift name -> rides
+
+    def floor(self, level):
+        """FleetManager for a floor, loading the floor on first use"""
+        if level not in self.floors:
+            self.floors[level] = FleetManager(self.site_graph.level(level), self.clock, thread_safe=self.thread_safe,
+                                              tick=self.tick, event_log=self.event_log)
+        return self.floors[level]
+
+    def is_vertex_free(self, level, vertex):
+        floor = self.floors.get(level)
+        return floor is None or (floor.robots.is_vertex_free(vertex)
+                                 and not floor.traffic_manager.is_vertex_occupied(vertex))
+
+    def spawn_robot(self, level, vertex_idx):
+        if not self.is_vertex_free(level, vertex_idx):
+            return None
+        robot_id = self.next_id
+        self.next_id += 1
+        self.robot_levels[robot_id] = level
+        return self.floor(level).spawn_robot(vertex_idx, robot_id)
+
+    def despawn_robot(self, robot_id):
+        if robot_id not in self.robot_levels:
+            return False, "Invalid robot ID"
+        level = self.robot_levels[robot_id]
+        if level is None:
+            return False, "Robot is riding a lift"
+        del self.robot_levels[robot_id]
+        self.legs.pop(robot_id, None)
+        result = self.floors[level].despawn_robot(robot_id)
+        self._unload_empty_levels()
+        return result
+
+    def get_robot(self, robot_id):
+        """(level, robot) for a robot on a floor, or None if it is riding a lift or unknown"""
+        level = self.robot_levels.get(robot_id)
+        if level is None:
+            return None
+        return level, self.floors[level].robots[robot_id]
+
+    def robots(self):
+        """(level, robot) for every robot on a floor"""
+        return [(level, robot) for level, floor in self.floors.items() for robot in floor.robots]
+
+    def assign_task(self, robot_id, level, target_vertex):
+        """Send a robot to a vertex on any floor, via lifts if needed"""
+        located = self.get_robot(robot_id)
+        if located is None:
+            return False, "Invalid robot ID"
+        start_level, robot = located
+        if robot.status not in ("idle", "complete"):
+            return False, f"Robot is {robot.status}"
+        if (start_level, robot.current_vertex) == (level, target_vertex):
+            return False, "Robot is already at target location"
+
+        route = self.site_graph.find_route(start_level, robot.current_vertex, level, target_vertex)
+        # The search loads every floor it crosses, keep only those with robots
+        self._unload_empty_levels()
+        if route is None:
+            self.event_log.emit(self.clock.time(), robot_id, "Failed to assign task: %s",
+                                ("No route between floors",), logging.WARNING)
+            return False, "No route found"
+
+        # One leg per floor: the last vertex of each run of the route on one level
+        legs = [node for node, following in zip(route, route[1:]) if node[0] != following[0]]
+        legs.append(route[-1])
+        self.legs[robot_id] = legs
+        return self._start_leg(robot_id, robot)
+
+    def _start_leg(self, robot_id, robot):
+        level, target = self.legs[robot_id][0]
+        if robot.current_vertex == target:
+            return True, "Task assigned"  # Already at the lift, it boards on the next update
+        success, message = self.floors[level].assign_task(robot_id, target)
+        if not success:
+            del self.legs[robot_id]
+        return success, message
+
+    def update_robots(self):
+        now = self.clock.time()
+        # Robots whose lift arrived step out once the stop is free. Robots on their way
+        # to board at that stop go first, otherwise arrivals could pack a floor so
+        # tightly that nobody gets back to the lift.
+        boarding = {legs[0] for robot_id, legs in self.legs.items()
+                    if len(legs) > 1 and self.robot_levels.get(robot_id) == legs[0][0]}
+        while self.riding and self.riding[0][0] <= now:
+            arrival = heapq.heappop(self.riding)
+            _, robot_id, level, vertex, battery = arrival
+            if (level, vertex) in boarding or not self.is_vertex_free(level, vertex):
+                heapq.heappush(self.riding, (now + self.tick, *arrival[1:]))
+                continue
+            robot = self.floor(level).spawn_robot(vertex, robot_id)
+            robot.battery = battery
+            self.robot_levels[robot_id] = level
+            if robot_id in self.legs:
+                self._start_leg(robot_id, robot)
+
+        for floor in list(self.floors.values()):
+            floor.update_robots()
+
+        # Follow robots with a task to the end of each leg
+        for robot_id, legs in list(self.legs.items()):
+            level = self.robot_levels.get(robot_id)
+            if level is None:
+                continue
+            robot = self.floors[level].robots[robot_id]
+            if robot.status not in ("idle", "complete", "disabled"):
+                continue
+            if robot.status == "disabled":
+                del self.legs[robot_id]
+                self.failed += 1
+            elif robot.current_vertex != legs[0][1]:
+                # Stopped short (e.g. the move failed), try the leg again
+                if not self._start_leg(robot_id, robot)[0]:
+                    self.failed += 1
+            elif len(legs) == 1:
+                del self.legs[robot_id]
+                self.completed += 1
+            else:
+                self._ride_lift(robot_id, robot, level, now)
+
+        self._unload_empty_levels()
+
+    def _ride_lift(self, robot_id, robot, level, now):
+        legs = self.legs[robot_id]
+        lift = self.site_graph.lift_vertices[level][robot.current_vertex]
+        legs.pop(0)
+        next_level = legs[0][0]
+        vertex = self.site_graph.lifts[lift][next_level]
+        battery = robot.battery
+        robot.log("Riding %s from %s to %s", lift, level, next_level)
+        self.floors[level].despawn_robot(robot_id)
+        self.robot_levels[robot_id] = None
+        self.lift_rides[lift] += 1
+        heapq.heappush(self.riding, (now + LIFT_RIDE_TIME, robot_id, next_level, vertex, battery))
+
+    def _unload_empty_levels(self):
+        """Drop the graphs and fleet managers of floors no robot is on or riding to"""
+        needed = {level for level in self.robot_levels.values() if level is not None}
+        needed.update(level for _, _, level, _, _ in self.riding)
+        for level in list(self.site_graph.loaded_levels):
+            if level not in needed:
+                self.floors.pop(level, None)
+                self.site_graph.unload_level(level)
+
+    def close(self):
+        """Flush and stop the shared event log"""
+        self.event_log.close()
+
+    def metrics(self):
+        return {
+            'tasks_completed': self.completed,
+            'tasks_failed': self.failed,
+            'tasks_active': len(self.legs),
+            'lift_rides': sum(self.lift_rides.values()),
+            'riding': len(self.riding),
+            'loaded_levels': sorted(self.site_graph.loaded_levels),
+        }
@@ -1,70 +1,585 @@
+import heapq
 import threading
-import time
+from array import array
+from collections import Counter, OrderedDict, deque
+from src.controllers.conflict_store import ConflictStore
+from src.controllers.reservation_table import (
+    ReservationTable, DEFAULT_TICK, PLANNING_WINDOW, vertex_key, lane_key
+)
+from src.models.robot import lane_updates
+from src.utils.clock import WallClock
+
+HEURISTIC_CACHE_ENTRIES = 1 << 22  # vertex distances kept across all cached goals (4 bytes each)
+LOCK_STRIPES = 64           # per-resource locks for lane and vertex occupancy
+
+def undirected(lane):
+    v1, v2 = lane
+    return (v1, v2) if v1 <= v2 else (v2, v1)
+
+class NullLock:
+    """Stand-in for threading.Lock when the fleet is driven from a single thread"""
+    
+    def acquire(self, blocking=True, timeout=-1):
+        return True
+    
+    def release(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+class BlockedVerticesView:
+    """Live view of the vertices occupied by robots other than one robot"""
+    
+    def __init__(self, traffic_manager, robot_id):
+        self.traffic_manager = traffic_manager
+        self.occupied_vertices = traffic_manager.occupied_vertices
+        self.robot_id = robot_id
+        self.excluded = ()
+        self.locked = traffic_manager.thread_safe  # Path searches test thousands of vertices
+    
+    def __contains__(self, vertex):
+        if self.locked:
+            with self.traffic_manager._vertex_lock(vertex):
+                occupier = self.occupied_vertices.get(vertex)
+        else:
+            occupier = self.occupied_vertices.get(vertex)
+        return occupier is not None and occupier != self.robot_id and vertex not in self.excluded
+    
+    def discard(self, vertex):
+        """Treat a vertex as free for this view only (e.g. the robot's own position)"""
+        if not self.excluded:
+            self.excluded = set()
+        self.excluded.add(vertex)
+    
+    def __iter__(self):
+        occupied = self.traffic_manager.occupancy_snapshot(self.occupied_vertices)
+        return (vertex for vertex, occupier in occupied.items()
+                if occupier != self.robot_id and vertex not in self.excluded)
+    
+    def __len__(self):
+        return sum(1 for _ in self)
+    
+    def __bool__(self):
+        return any(True for _ in self)
+
+class BlockedLanesView:
+    """Live view of the lanes occupied by robots other than one robot.
+    
+    A lane counts as blocked in both orientations, so `symmetric` tells the
+    path search that one membership test per edge is enough.
+    """
+    symmetric = True
+    
+    def __init__(self, traffic_manager, robot_id):
+        self.traffic_manager = traffic_manager
+        self.lane_holders = traffic_manager.lane_holders
+        self.robot_id = robot_id
+        self.locked = traffic_manager.thread_safe
+    
+    def __contains__(self, lane):
+        key = lane if lane[0] <= lane[1] else (lane[1], lane[0])
+        if self.locked:
+            with self.traffic_manager._lane_lock(key):
+                holders = self.lane_holders.get(key)
+                return bool(holders) and any(holder != self.robot_id for holder in holders)
+        holders = self.lane_holders.get(key)
+        return bool(holders) and any(holder != self.robot_id for holder in holders)
+    
+    def __iter__(self):
+        for lane, holders in self.traffic_manager.occupancy_snapshot(self.lane_holders).items():
+            if any(holder != self.robot_id for holder in holders):
+                yield lane
+                yield (lane[1], lane[0])
+    
+    def __len__(self):
+        return sum(1 for _ in self)
+    
+    def __bool__(self):
+        return any(True for _ in self)
 
 class TrafficManager:
-    def __init__(self):
+    def __init__(self, clock=None, thread_safe=True, tick=DEFAULT_TICK):
+        self.clock = clock or WallClock()
+        # A planning slot is one lane step: lane_updates() updates of `tick` seconds
+        self.tick = tick
+        self.slot_updates = lane_updates()
+        self.epoch = self.clock.time()
+        self.thread_safe = thread_safe
+        make_lock = threading.Lock if thread_safe else NullLock
         self.occupied_lanes = {}
+        self.lane_holders = {}       # Undirected lane -> {robot_id: directions held}
         self.occupied_vertices = {}  # Track vertex occupancy
-        self.waiting_robots = {}     # Robots waiting at vertices
-        self.lock = threading.Lock()
-        self.conflicts = []          # Track current conflicts
+        self.waiting_robots = {}     # Robots waiting at vertices (vertex -> set of robot ids)
+        self.waiters = {}            # Resource a robot waits for -> ids of robots waiting on it
+        self.blocked_on = {}         # robot_id -> resource it waits for
+        self.woken = set()           # Robots whose resource was released since the last drain
+        self.lock = make_lock()      # Waiting robots, conflicts and reservations
+        # Occupancy is striped by resource so robots on different lanes do not contend
+        self.stripes = [make_lock() for _ in range(LOCK_STRIPES)]
+        self.conflicts = ConflictStore()  # Recent conflicts and totals per kind
         self.blocked_paths = {}      # Track blocked paths for robots
+        self.reservations = ReservationTable()  # Space-time bookings for cooperative planning
+        self.hop_distances = OrderedDict()  # (graph id, goal) -> hops from every vertex to goal, LRU
+        self.hop_distance_entries = 0
+        # Deadlock handling: blocked_on is the wait-for graph (each waiting robot points at
+        # the holders of the resource it waits for), checked for a cycle on every new wait
+        self.deadlock_victims = {}   # robot_id picked to break a cycle -> (cycle edges, other members, deferred)
+        self.stuck_cycles = set()    # Edges of cycles nobody could break yet, retried without recounting
+        self.deadlock_counts = Counter()
+        self.yields = Counter()      # robot_id -> deadlocks it broke by giving way
+    
+    def _lane_lock(self, lane):
+        # Both orientations share a stripe, they share an entry in lane_holders
+        return self.stripes[hash(undirected(lane)) % LOCK_STRIPES]
+    
+    def _vertex_lock(self, vertex_id):
+        return self.stripes[hash(('v', vertex_id)) % LOCK_STRIPES]
+    
+    def _acquire_stripes(self, locks):
+        # Fixed acquisition order keeps two threads from deadlocking on the stripes
+        locks = sorted(set(locks), key=id)
+        for lock in locks:
+            lock.acquire()
+        return locks
+    
+    def _release_stripes(self, locks):
+        for lock in reversed(locks):
+            lock.release()
+    
+    def occupancy_snapshot(self, occupancy):
+        """Consistent copy of occupied_vertices, occupied_lanes or lane_holders (with holder tuples)"""
+        locks = self._acquire_stripes(self.stripes)
+        try:
+            if occupancy is self.lane_holders:
+                return {lane: tuple(holders) for lane, holders in occupancy.items()}
+            return dict(occupancy)
+        finally:
+            self._release_stripes(locks)
     
     def is_lane_occupied(self, lane, requesting_robot=None):
-        with self.lock:
+        with self._lane_lock(lane):
             if lane in self.occupied_lanes:
                 return self.occupied_lanes[lane] != requesting_robot
             return False
     
     def is_vertex_occupied(self, vertex_id, requesting_robot=None):
-        with self.lock:
+        with self._vertex_lock(vertex_id):
             if vertex_id in self.occupied_vertices:
                 return self.occupied_vertices[vertex_id] != requesting_robot
             return False
     
     def reserve_lane(self, lane, robot_id):
-        with self.lock:
-            self.occupied_lanes[lane] = robot_id
+        with self._lane_lock(lane):
+            self._reserve_lane(lane, robot_id)
+    
+    def _reserve_lane(self, lane, robot_id):
+        previous = self.occupied_lanes.get(lane)
+        if previous == robot_id:
+            return
+        if previous is not None:
+            self._unindex_lane(lane, previous)
+        self.occupied_lanes[lane] = robot_id
+        holders = self.lane_holders.setdefault(undirected(lane), {})
+        holders[robot_id] = holders.get(robot_id, 0) + 1
+    
+    def _unindex_lane(self, lane, robot_id):
+        key = undirected(lane)
+        holders = self.lane_holders[key]
+        holders[robot_id] -= 1
+        if not holders[robot_id]:
+            del holders[robot_id]
+            if not holders:
+                del self.lane_holders[key]
     
     def reserve_vertex(self, vertex_id, robot_id):
-        with self.lock:
+        with self._vertex_lock(vertex_id):
+            self.occupied_vertices[vertex_id] = robot_id
+    
+    def try_reserve_move(self, lane, vertex_id, robot_id):
+        """Atomically check that a lane and its end vertex are free and reserve both.
+        
+        Returns (True, None) on success, or (False, "vertex"/"lane") naming the
+        resource held by another robot, in which case nothing is reserved.
+        """
+        locks = self._acquire_stripes([self._vertex_lock(vertex_id), self._lane_lock(lane)])
+        try:
+            vertex_holder = self.occupied_vertices.get(vertex_id)
+            if vertex_holder is not None and vertex_holder != robot_id:
+                return False, "vertex"
+            lane_holder = self.occupied_lanes.get(lane)
+            if lane_holder is not None and lane_holder != robot_id:
+                return False, "lane"
+            self._reserve_lane(lane, robot_id)
             self.occupied_vertices[vertex_id] = robot_id
+            return True, None
+        finally:
+            self._release_stripes(locks)
     
     def release_lane(self, lane, robot_id):
-        with self.lock:
+        with self._lane_lock(lane):
             if lane in self.occupied_lanes and self.occupied_lanes[lane] == robot_id:
                 del self.occupied_lanes[lane]
+                self._unindex_lane(lane, robot_id)
+            else:
+                return
+        self._notify_release(lane_key(*lane))
     
     def release_vertex(self, vertex_id, robot_id):
-        with self.lock:
+        with self._vertex_lock(vertex_id):
             if vertex_id in self.occupied_vertices and self.occupied_vertices[vertex_id] == robot_id:
                 del self.occupied_vertices[vertex_id]
+            else:
+                return
+        self._notify_release(vertex_key(vertex_id))
+    
+    def _notify_release(self, resource):
+        """Mark the robots waiting on a freed resource as woken"""
+        if resource not in self.waiters and not self.stuck_cycles:
+            return
+        with self.lock:
+            if self.stuck_cycles:
+                # A cycle member moved, so the stuck cycle is gone
+                self.stuck_cycles = {edges for edges in self.stuck_cycles
+                                     if all(waited != resource for _, waited in edges)}
+            robot_ids = self.waiters.pop(resource, ())
+            for robot_id in robot_ids:
+                self.blocked_on.pop(robot_id, None)
+            self.woken.update(robot_ids)
+    
+    def wake_robot(self, robot_id):
+        """Have a parked or waiting robot stepped again, e.g. after it was told to make way"""
+        with self.lock:
+            self.woken.add(robot_id)
     
-    def add_waiting_robot(self, vertex_id, robot_id):
+    def pop_woken_robots(self):
+        """Robots whose blocking resource was released since the last call"""
+        with self.lock:
+            woken, self.woken = self.woken, set()
+            return woken
+    
+    def add_waiting_robot(self, vertex_id, robot_id, blocked_vertex=None, blocked_lane=None):
         with self.lock:
             if vertex_id not in self.waiting_robots:
-                self.waiting_robots[vertex_id] = []
-            self.waiting_robots[vertex_id].append(robot_id)
+                self.waiting_robots[vertex_id] = set()
+            self.waiting_robots[vertex_id].add(robot_id)
+            
+            # Remember what the robot waits for so its release can wake it early
+            if blocked_lane is not None:
+                self._wait_for(robot_id, lane_key(*blocked_lane))
+            elif blocked_vertex is not None:
+                self._wait_for(robot_id, vertex_key(blocked_vertex))
+    
+    def wait_for(self, robot_id, vertex_id):
+        """Record what a robot holding its position under a plan waits for (None for nothing).
+        
+        Planned waits in place are waits too, so they belong in the wait-for graph.
+        """
+        if vertex_id is None:
+            if robot_id in self.blocked_on:
+                with self.lock:
+                    self._clear_blocked_on(robot_id)
+            return
+        resource = vertex_key(vertex_id)
+        if self.blocked_on.get(robot_id) == resource:
+            return
+        with self.lock:
+            self._wait_for(robot_id, resource)
+    
+    def _wait_for(self, robot_id, resource):
+        self._clear_blocked_on(robot_id)
+        self.waiters.setdefault(resource, set()).add(robot_id)
+        self.blocked_on[robot_id] = resource
+        
+        # Only this new edge can have closed a cycle
+        cycle = self._find_cycle(robot_id)
+        if cycle is not None and not any(member in self.deadlock_victims for member in cycle):
+            self._break_cycle(cycle)
+    
+    def _holders(self, resource):
+        """Robots currently holding a vertex or lane resource"""
+        if resource[0] == 'v':
+            with self._vertex_lock(resource[1]):
+                holder = self.occupied_vertices.get(resource[1])
+            return () if holder is None else (holder,)
+        with self._lane_lock(resource[1:]):
+            return tuple(self.lane_holders.get(resource[1:], ()))
+    
+    def _find_cycle(self, robot_id):
+        """Robots on a wait-for cycle through robot_id, starting with it, or None"""
+        stack = [(robot_id, [robot_id])]
+        visited = {robot_id}
+        while stack:
+            current, chain = stack.pop()
+            resource = self.blocked_on.get(current)
+            if resource is None:
+                continue  # Not waiting, so the chain moves on eventually
+            for holder in self._holders(resource):
+                if holder == current:
+                    continue
+                if holder == robot_id:
+                    return chain
+                if holder not in visited:
+                    visited.add(holder)
+                    stack.append((holder, chain + [holder]))
+        return None
+    
+    def _break_cycle(self, cycle):
+        """Pick a victim to back off or reroute, and wake it so it acts on its next update"""
+        # The robot that gave way least often yields (highest ID on ties), so a robot that
+        # turned away is not sent back the way it came by the next cycle it meets
+        candidates = sorted(cycle, key=lambda robot_id: (self.yields[robot_id], -robot_id))
+        victim = candidates.pop(0)
+        edges = frozenset((member, self.blocked_on[member]) for member in cycle)
+        self.deadlock_victims[victim] = (edges, candidates, set())
+        self.woken.add(victim)
+        if edges in self.stuck_cycles:
+            return  # Seen before and still stuck: try again, but it is the same deadlock
+        self.deadlock_counts['detected'] += 1
+        self.conflicts.add(self.clock.time(), "Deadlock: robots " + " -> ".join(map(str, cycle + cycle[:1])) +
+                           f", robot {victim} yields", "deadlock")
+    
+    def has_waiters(self, vertex_id):
+        """True if some robot waits for vertex_id to be freed"""
+        return vertex_key(vertex_id) in self.waiters
+    
+    def is_deadlock_victim(self, robot_id):
+        return robot_id in self.deadlock_victims
+    
+    def report_deadlock_resolution(self, robot_id, resolution):
+        """Record how a victim broke its cycle ("reroute" or "backoff"), or None if it could not"""
+        with self.lock:
+            entry = self.deadlock_victims.pop(robot_id, None)
+            if entry is None:
+                return
+            edges, candidates, deferred = entry
+            if resolution is not None:
+                self.deadlock_counts[resolution] += 1
+                self.yields[robot_id] += 1
+                if edges in self.stuck_cycles:
+                    # Broken on a retry after all
+                    self.stuck_cycles.discard(edges)
+                    self.deadlock_counts['unresolved'] -= 1
+                return
+            # Hand the cycle to the next member that is still waiting
+            while candidates:
+                victim = candidates.pop(0)
+                if victim in self.blocked_on:
+                    self.deadlock_victims[victim] = (edges, candidates, deferred)
+                    self.woken.add(victim)
+                    return
+            if edges not in self.stuck_cycles:
+                self.stuck_cycles.add(edges)
+                self.deadlock_counts['unresolved'] += 1
+    
+    def defer_deadlock(self, robot_id):
+        """Let the other cycle members try first, e.g. for a victim short of battery.
+        
+        The robot is asked again if none of them can break the cycle. Returns
+        False if it already deferred once, or no one is left to ask.
+        """
+        with self.lock:
+            entry = self.deadlock_victims.get(robot_id)
+            if entry is None:
+                return False
+            edges, candidates, deferred = entry
+            if robot_id in deferred or not any(member in self.blocked_on for member in candidates):
+                return False
+            deferred.add(robot_id)
+            candidates.append(robot_id)
+        self.report_deadlock_resolution(robot_id, None)
+        return True
+    
+    def get_deadlock_counts(self):
+        """Deadlocks detected and how they were resolved, since start"""
+        with self.lock:
+            return dict(self.deadlock_counts)
+    
+    def _clear_blocked_on(self, robot_id):
+        resource = self.blocked_on.pop(robot_id, None)
+        if resource is not None:
+            waiters = self.waiters.get(resource)
+            if waiters:
+                waiters.discard(robot_id)
+                if not waiters:
+                    del self.waiters[resource]
     
     def remove_waiting_robot(self, vertex_id, robot_id):
         with self.lock:
-            if vertex_id in self.waiting_robots and robot_id in self.waiting_robots[vertex_id]:
-                self.waiting_robots[vertex_id].remove(robot_id)
+            self._clear_blocked_on(robot_id)
+            waiting = self.waiting_robots.get(vertex_id)
+            if waiting and robot_id in waiting:
+                waiting.discard(robot_id)
+                if not waiting:
+                    del self.waiting_robots[vertex_id]
     
-    def add_conflict(self, message):
+    def release_robot(self, robot_id):
+        """Free everything a robot holds, e.g. when it is despawned"""
+        for lane, holder in self.occupancy_snapshot(self.occupied_lanes).items():
+            if holder == robot_id:
+                self.release_lane(lane, robot_id)
+        for vertex_id, holder in self.occupancy_snapshot(self.occupied_vertices).items():
+            if holder == robot_id:
+                self.release_vertex(vertex_id, robot_id)
         with self.lock:
-            self.conflicts.append((time.time(), message))
+            self._clear_blocked_on(robot_id)
+            for vertex_id, waiting in list(self.waiting_robots.items()):
+                waiting.discard(robot_id)
+                if not waiting:
+                    del self.waiting_robots[vertex_id]
+            self.woken.discard(robot_id)
+            self.deadlock_victims.pop(robot_id, None)
+            self.stuck_cycles = {edges for edges in self.stuck_cycles
+                                 if all(member != robot_id for member, _ in edges)}
+            self.yields.pop(robot_id, None)
+            self.reservations.release_robot(robot_id)
+    
+    def add_conflict(self, message, kind="other"):
+        with self.lock:
+            self.conflicts.add(self.clock.time(), message, kind)
     
     def get_conflicts(self):
         with self.lock:
-            return [msg for (t, msg) in self.conflicts if time.time() - t < 5]  # Show conflicts for 5 seconds
+            return self.conflicts.active(self.clock.time())  # Show conflicts for CONFLICT_DISPLAY_TIME seconds
     
-    def get_blocked_lanes_for_robot(self, robot_id):
-        """Get all lanes blocked by other robots"""
+    def get_conflict_counts(self):
+        """Total conflicts per kind since start"""
         with self.lock:
-            return {lane for lane, occupier in self.occupied_lanes.items() if occupier != robot_id}
+            return dict(self.conflicts.counts)
+    
+    def get_blocked_lanes_for_robot(self, robot_id):
+        """Get a live view of all lanes blocked by other robots"""
+        return BlockedLanesView(self, robot_id)
     
     def get_blocked_vertices_for_robot(self, robot_id):
-        """Get all vertices blocked by other robots"""
+        """Get a live view of all vertices blocked by other robots"""
+        return BlockedVerticesView(self, robot_id)
+    
+    def current_slot(self):
+        # Counted in whole updates, so float drift in the clock never splits a lane step
+        return round((self.clock.time() - self.epoch) / self.tick) // self.slot_updates
+    
+    def release_reservations(self, robot_id):
+        """Drop a robot's space-time bookings, and with its plan what it waited for"""
+        with self.lock:
+            self.reservations.release_robot(robot_id)
+            self._clear_blocked_on(robot_id)
+    
+    def _hop_distances(self, nav_graph, goal):
+        """Lane hops from every vertex to goal (-1 if unreachable), the planner's heuristic.
+        
+        Tables are kept least recently used first, so every robot's current goal stays
+        cached while it plans window after window towards it.
+        """
+        key = (id(nav_graph), goal)
+        distances = self.hop_distances.get(key)
+        if distances is not None:
+            self.hop_distances.move_to_end(key)
+            return distances
+        
+        distances = array('i', [-1]) * len(nav_graph.vertices)
+        distances[goal] = 0
+        queue = deque([goal])
+        while queue:
+            current = queue.popleft()
+            hops = distances[current] + 1
+            for neighbor in nav_graph.adjacency[current]:
+                if distances[neighbor] < 0:
+                    distances[neighbor] = hops
+                    queue.append(neighbor)
+        
+        self.hop_distances[key] = distances
+        self.hop_distance_entries += len(distances)
+        while self.hop_distance_entries > HEURISTIC_CACHE_ENTRIES and len(self.hop_distances) > 1:
+            _, evicted = self.hop_distances.popitem(last=False)
+            self.hop_distance_entries -= len(evicted)
+        return distances
+    
+    def hops_to(self, nav_graph, goal):
+        """The planner's table of lane hops from every vertex to goal (-1 if unreachable)"""
+        with self.lock:
+            return self._hop_distances(nav_graph, goal)
+    
+    def plan_cooperative_path(self, nav_graph, robot_id, start, goal, window=PLANNING_WINDOW):
+        """Windowed cooperative A* over (vertex, slot) that books the result.
+        
+        Every step takes one slot and is either a move along a lane or a wait
+        in place (a repeated vertex in the returned path). Vertices and lanes
+        booked by other robots are avoided, and so are vertices held by parked
+        robots that have no plan (looked up live, so parking and unparking
+        need no bookkeeping). The search covers `window` slots. If the goal
+        is further away, the path ends at the most promising vertex in the
+        window and the robot plans again from there.
+        Returns the path without the start vertex, or None if no move is possible.
+        """
         with self.lock:
-            return {vertex for vertex, occupier in self.occupied_vertices.items() if occupier != robot_id}
\ No newline at end of file
+            hops = self._hop_distances(nav_graph, goal)
+            if hops[start] < 0:
+                return None
+            
+            start_slot = self.current_slot()
+            self.reservations.prune(start_slot)
+            self.reservations.release_robot(robot_id)
+            
+            occupied_vertices = self.occupied_vertices
+            has_plan = self.reservations.has_plan
+            
+            def is_free(vertex, lane, t):
+                slot = start_slot + t
+                # Robots standing still without a plan block their vertex for the whole window
+                with self._vertex_lock(vertex):
+                    occupier = occupied_vertices.get(vertex)
+                if occupier is not None and occupier != robot_id and not has_plan(occupier):
+                    return False
+                if not self.reservations.is_free(vertex_key(vertex), slot, robot_id):
+                    return False
+                return lane is None or self.reservations.is_free(lane, slot, robot_id)
+            
+            parents = {(start, 0): None}
+            heap = [(hops[start], 0, start)]
+            best = None
+            
+            while heap:
+                _, t, vertex = heapq.heappop(heap)
+                if vertex == goal:
+                    best = (vertex, t)
+                    break
+                if t == window:
+                    # Window exhausted. The estimate never drops along a step, so states
+                    # leave the heap in estimate order and the first one at the window
+                    # edge is the closest to the goal that any trajectory reaches.
+                    best = (vertex, t)
+                    break
+                
+                for neighbor in [vertex, *nav_graph.adjacency[vertex]]:
+                    state = (neighbor, t + 1)
+                    if state in parents or hops[neighbor] < 0:
+                        continue
+                    lane = None if neighbor == vertex else lane_key(vertex, neighbor)
+                    if not is_free(neighbor, lane, t + 1):
+                        continue
+                    parents[state] = (vertex, t)
+                    heapq.heappush(heap, (t + 1 + hops[neighbor], t + 1, neighbor))
+            
+            if best is None or best == (start, 0):
+                return None
+            
+            states = [best]
+            while parents[states[-1]] is not None:
+                states.append(parents[states[-1]])
+            states.reverse()
+            
+            # Book the trajectory, and the goal for the rest of the window once reached
+            for (v1, t1), (v2, t2) in zip(states, states[1:]):
+                self.reservations.reserve(vertex_key(v2), start_slot + t2, robot_id)
+                if v1 != v2:
+                    self.reservations.reserve(lane_key(v1, v2), start_slot + t2, robot_id)
+            last_vertex, last_t = states[-1]
+            if last_vertex == goal:
+                for t in range(last_t + 1, window + 1):
+                    self.reservations.reserve(vertex_key(goal), start_slot + t, robot_id)
+            
+            return [vertex for vertex, _ in states[1:]]
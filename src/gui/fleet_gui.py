@@ -1,33 +1,31 @@
 from src.models.nav_graph import NavGraph
 from src.controllers.fleet_manager import FleetManager
-from src.controllers.traffic_manager import TrafficManager
-LOW_BATTERY_THRESHOLD = 20
-CRITICAL_BATTERY = 5
+from src.controllers.simulation_worker import SimulationWorker
+from src.gui.raster_renderer import RasterRenderer, FrameThread
+from src.gui.style import (
+    ROBOT_RADIUS, VERTEX_RADIUS, LANE_WIDTH, LABEL_SCALE, COLORS, ROBOT_STATUS_COLORS, battery_color
+)
 
+import math
 import tkinter as tk
+from collections import Counter
 from tkinter import messagebox, ttk
 from PIL import Image, ImageTk
 import os
 
 # Constants
-ROBOT_RADIUS = 10
-VERTEX_RADIUS = 8
-LANE_WIDTH = 2
-UPDATE_INTERVAL = 100  # ms
+UPDATE_INTERVAL = 100  # ms between simulation steps
+FRAME_INTERVAL = 50    # ms between redraws
 
-# Color scheme
-COLORS = {
-    'background': '#2D3748',
-    'primary': '#4299E1',
-    'secondary': '#2C5282',
-    'accent': '#38B2AC',
-    'text': '#E2E8F0',
-    'error': '#F56565',
-    'success': '#48BB78',
-    'warning': '#ED8936',
-    'dark_bg': '#1A202C',
-    'light_bg': '#4A5568'
-}
+# Zoom (pixels per map unit) and level-of-detail thresholds
+DEFAULT_SCALE = 40
+MIN_SCALE = 0.5
+MAX_SCALE = 200
+ZOOM_STEP = 1.2
+VERTEX_SCALE = 16     # below this, only charger vertices are drawn
+BLOB_SCALE = 8        # below this, robots are drawn as density blobs
+BLOB_CELL = 40        # blob and map footprint grid cell size in pixels
+MAX_LANE_ITEMS = 20000  # beyond this many lanes in view the map is drawn as a footprint
 
 class FleetGUI:
     def __init__(self, master, nav_graph_file=None):
@@ -49,8 +47,12 @@ class FleetGUI:
             widget.destroy()
         
         try:
-            self.nav_graph = NavGraph(self.nav_graph_file)
-            self.fleet_manager = FleetManager(self.nav_graph)
+            self.close_fleet_manager()
+            # Streamed on first use, memory-mapped from the map cache afterwards
+            self.nav_graph = NavGraph(self.nav_graph_file, compact=True)
+            self.fleet_manager = FleetManager(self.nav_graph, tick=UPDATE_INTERVAL / 1000)
+            # The fleet steps on its own thread, the GUI draws its snapshots
+            self.worker = SimulationWorker(self.fleet_manager, UPDATE_INTERVAL / 1000)
             
             # Main container
             self.main_container = tk.Frame(self.master, bg=COLORS['background'])
@@ -175,17 +177,35 @@ class FleetGUI:
             # State variables
             self.selected_robot = None
             self.selected_vertex = None
-            self.scale_factor = 40
+            self.pending_targets = []  # Vertices queued for batch assignment
+            self.scale_factor = DEFAULT_SCALE
             self.offset_x = 100
             self.offset_y = 100
+            self.frame_thread = None  # Raster renderer thread while raster mode is on
+            self.reset_canvas()
             
             # Setup display
             self.setup_display()
             
             # Bind events
             self.canvas.bind("<Button-1>", self.on_canvas_click)
+            # Shift+click queues vertices (on the selected robot's task list, or as a
+            # batch that Enter hands to the dispatcher)
+            self.canvas.bind("<Shift-Button-1>", self.on_canvas_shift_click)
+            self.master.bind('<Return>', self.assign_pending_targets)
+            # Mouse wheel zooms around the pointer, right or middle drag pans
+            self.canvas.bind("<MouseWheel>", self.on_zoom)
+            self.canvas.bind("<Button-4>", self.on_zoom)
+            self.canvas.bind("<Button-5>", self.on_zoom)
+            for button in (2, 3):
+                self.canvas.bind(f"<ButtonPress-{button}>", self.on_pan_start)
+                self.canvas.bind(f"<B{button}-Motion>", self.on_pan_move)
             # Bind keyboard shortcut (Ctrl+D) to decrease battery
             self.master.bind('<Control-d>', self.decrease_selected_robot_battery)
+            # Delete removes the selected robot from the fleet
+            self.master.bind('<Delete>', self.despawn_selected_robot)
+            # Ctrl+R switches between canvas items and one rasterized frame image
+            self.master.bind('<Control-r>', self.toggle_raster_mode)
             # Start update loop
             self.start_update_loop()
             
@@ -198,6 +218,7 @@ class FleetGUI:
         if self.update_id:
             self.master.after_cancel(self.update_id)
         self.running = True
+        self.worker.start()
         self.update()
     
     def stop_update_loop(self):
@@ -207,10 +228,23 @@ class FleetGUI:
             self.master.after_cancel(self.update_id)
             self.update_id = None
     
+    def close_fleet_manager(self):
+        """Flush the event log of the previous simulation, if any"""
+        if getattr(self, 'frame_thread', None) is not None:
+            self.frame_thread.stop()
+            self.frame_thread = None
+        if getattr(self, 'worker', None) is not None:
+            self.worker.stop()
+            self.worker = None
+        if getattr(self, 'fleet_manager', None) is not None:
+            self.fleet_manager.close()
+            self.fleet_manager = None
+    
     def show_home_screen(self):
         """Show the home screen with dataset selection"""
         # Stop any running simulation updates
         self.stop_update_loop()
+        self.close_fleet_manager()
         
         # Clear any existing widgets
         for widget in self.master.winfo_children():
@@ -354,227 +388,473 @@ class FleetGUI:
     def decrease_selected_robot_battery(self, event=None):
         """Decrease selected robot's battery by 10%"""
         if self.selected_robot is not None:
-            robot = self.fleet_manager.robots[self.selected_robot]
-            robot.decrease_battery(10)  # Decrease by 10%
+            with self.worker.lock:
+                robot = self.fleet_manager.robots[self.selected_robot]
+                robot.decrease_battery(10)  # Decrease by 10%
+                self.fleet_manager.wake_robot(robot.id)
+                self.worker.publish()
             self.update_status(f"Robot {robot.id} battery decreased to {robot.battery}%")
             self.draw_graph()
     
+    def despawn_selected_robot(self, event=None):
+        """Remove the selected robot from the fleet"""
+        if self.selected_robot is not None:
+            robot_id = self.selected_robot
+            with self.worker.lock:
+                self.fleet_manager.despawn_robot(robot_id)
+                self.worker.publish()
+            self.selected_robot = None
+            self.update_status(f"Robot {robot_id} removed")
+            self.draw_graph()
+    
     def setup_display(self):
+        self.update_scrollregion()
+        
+        self.canvas.xview_moveto(0.5)
+        self.canvas.yview_moveto(0.5)
+    
+    def update_scrollregion(self):
         graph_width = self.nav_graph.max_x - self.nav_graph.min_x
         graph_height = self.nav_graph.max_y - self.nav_graph.min_y
         
         scaled_width = graph_width * self.scale_factor + 2 * self.offset_x
         scaled_height = graph_height * self.scale_factor + 2 * self.offset_y
-        self.canvas.config(scrollregion=(-self.offset_x, -self.offset_y, scaled_width, scaled_height))
+        self.scrollregion = (-self.offset_x, -self.offset_y, scaled_width, scaled_height)
+        self.canvas.config(scrollregion=self.scrollregion)
+    
+    def on_zoom(self, event):
+        """Zoom in or out, keeping the map point under the pointer in place"""
+        zoom_in = event.num == 4 or getattr(event, 'delta', 0) > 0
+        scale = self.scale_factor * (ZOOM_STEP if zoom_in else 1 / ZOOM_STEP)
+        scale = min(MAX_SCALE, max(MIN_SCALE, scale))
+        if scale == self.scale_factor:
+            return
         
-        self.canvas.xview_moveto(0.5)
-        self.canvas.yview_moveto(0.5)
+        x, y = self.unscale_point(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        self.scale_factor = scale
+        self.update_scrollregion()
+        
+        # Scroll so (x, y) lands under the pointer again
+        canvas_x, canvas_y = self.scale_point(x, y)
+        left, top, right, bottom = self.scrollregion
+        self.canvas.xview_moveto((canvas_x - event.x - left) / (right - left))
+        self.canvas.yview_moveto((canvas_y - event.y - top) / (bottom - top))
+        
+        self.reset_canvas()
+        self.draw_graph()
+    
+    def on_pan_start(self, event):
+        self.canvas.scan_mark(event.x, event.y)
+    
+    def on_pan_move(self, event):
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self.draw_graph()
+    
+    def visible_region(self):
+        """Canvas coordinates (x0, y0, x1, y1) of the scrolled-in part of the canvas"""
+        return (self.canvas.canvasx(0), self.canvas.canvasy(0),
+                self.canvas.canvasx(self.canvas.winfo_width()),
+                self.canvas.canvasy(self.canvas.winfo_height()))
     
     def scale_point(self, x, y):
         canvas_x = (x - self.nav_graph.min_x) * self.scale_factor + self.offset_x
         canvas_y = (y - self.nav_graph.min_y) * self.scale_factor + self.offset_y
         return canvas_x, canvas_y
     
+    def unscale_point(self, canvas_x, canvas_y):
+        """Map coordinates of a canvas point (inverse of scale_point)"""
+        x = (canvas_x - self.offset_x) / self.scale_factor + self.nav_graph.min_x
+        y = (canvas_y - self.offset_y) / self.scale_factor + self.nav_graph.min_y
+        return x, y
+    
+    def reset_canvas(self):
+        """Forget all canvas items so the next draw rebuilds both layers (new map or zoom)"""
+        if hasattr(self, 'canvas'):
+            self.canvas.delete("all")
+        self.drawn_region = None      # Canvas area the static layer and robots cover
+        self.vertex_items = {}        # vertex -> oval item
+        self.drawn_selected_vertex = None
+        self.robot_items = {}         # robot_id -> {part: item}
+        self.robot_render_keys = {}   # robot_id -> state the robot's items were last drawn with
+        self.drawn_conflicts = None
+        self.drawn_version = None     # Snapshot version and selection last drawn
+        self.drawn_selected_robot = None
+        self.raster_item = None       # Image item and photo of the raster frame shown
+        self.raster_photo = None
+        self.drawn_frame = None
+    
+    def toggle_raster_mode(self, event=None):
+        """Render the fleet into one image on a background thread instead of canvas items"""
+        if self.frame_thread is None:
+            renderer = RasterRenderer(self.nav_graph, self.canvas.winfo_width(),
+                                      self.canvas.winfo_height(), self.scale_factor)
+            self.frame_thread = FrameThread(self.worker, renderer, FRAME_INTERVAL / 1000)
+            self.update_status("Raster rendering on")
+        else:
+            self.frame_thread.stop()
+            self.frame_thread = None
+            self.update_status("Raster rendering off")
+        self.reset_canvas()
+        self.draw_graph()
+    
     def draw_graph(self):
+        """Bring the canvas up to date, touching only what changed since the last draw"""
         if not hasattr(self, 'canvas'):
             return
             
         try:
-            self.canvas.delete("all")
-            
-            # Draw lanes
-            for v1, v2 in self.nav_graph.lanes:
-                x1, y1 = self.nav_graph.vertices[v1]
-                x2, y2 = self.nav_graph.vertices[v2]
-                
-                canvas_x1, canvas_y1 = self.scale_point(x1, y1)
-                canvas_x2, canvas_y2 = self.scale_point(x2, y2)
-                
-                self.canvas.create_line(
-                    canvas_x1, canvas_y1, canvas_x2, canvas_y2,
-                    fill='#718096', width=LANE_WIDTH, tags="lane"
-                )
+            # Only the visible area (plus half a screen around it) is drawn. It is
+            # rebuilt once scrolling or panning moves the view outside of it.
+            x0, y0, x1, y1 = self.visible_region()
+            # Latest published step; versions published since the last frame are skipped
+            snapshot = self.worker.snapshot
             
-            # Draw vertices
-            for idx, (x, y) in enumerate(self.nav_graph.vertices):
-                canvas_x, canvas_y = self.scale_point(x, y)
-                vertex_data = self.nav_graph.vertex_data[idx]
-                
-                fill_color = '#38B2AC' if vertex_data['is_charger'] else '#4A5568'
-                outline_color = '#F56565' if idx == self.selected_vertex else '#E2E8F0'
-                outline_width = 3 if idx == self.selected_vertex else 2
-                
-                self.canvas.create_oval(
-                    canvas_x - VERTEX_RADIUS, canvas_y - VERTEX_RADIUS,
-                    canvas_x + VERTEX_RADIUS, canvas_y + VERTEX_RADIUS,
-                    fill=fill_color, outline=outline_color, width=outline_width,
-                    tags=f"vertex_{idx}"
-                )
-                
-                display_text = vertex_data.get('name', str(idx))
-                self.canvas.create_text(
-                    canvas_x, canvas_y - VERTEX_RADIUS - 15,
-                    text=display_text,
-                    fill=COLORS['text'], font=('Arial', 9, 'bold'),
-                    tags=f"vertex_label_{idx}"
-                )
-            
-            # Draw robots
-            for robot in self.fleet_manager.robots:
-                pos = self.fleet_manager.get_robot_position(robot.id)
-                if pos is None:
-                    continue
-                    
-                x, y = pos
-                canvas_x, canvas_y = self.scale_point(x, y)
-                
-                # Robot body
-                outline_color = '#F6E05E' if robot.id == self.selected_robot else robot.color
-                outline_width = 3 if robot.id == self.selected_robot else 1
-                
-                self.canvas.create_oval(
-                    canvas_x - ROBOT_RADIUS, canvas_y - ROBOT_RADIUS,
-                    canvas_x + ROBOT_RADIUS, canvas_y + ROBOT_RADIUS,
-                    fill=robot.color, outline=outline_color, width=outline_width,
-                    tags=f"robot_{robot.id}"
-                )
-                
-                # Robot ID
-                self.canvas.create_text(
-                    canvas_x, canvas_y,
-                    text=str(robot.id),
-                    fill='white', font=('Arial', 8, 'bold'), 
-                    tags=f"robot_label_{robot.id}"
-                )
-                
-                # Status indicator
-                status_x = canvas_x
-                status_y = canvas_y + ROBOT_RADIUS + 15
-                
-                status_color = {
-                    'idle': '#A0AEC0',
-                    'moving': '#48BB78',
-                    'waiting': '#ED8936',
-                    'charging': '#4299E1',
-                    'complete': '#9F7AEA',
-                    'disabled': '#F56565'
-                }.get(robot.status, '#000000')
-                
-                self.canvas.create_oval(
-                    status_x - 5, status_y - 5,
-                    status_x + 5, status_y + 5,
-                    fill=status_color, outline='white', width=1,
-                    tags=f"robot_status_{robot.id}"
-                )
-                
-                # Battery status
-                battery_text = f"{robot.battery}%"
-                battery_color = ("#48BB78" if robot.battery > LOW_BATTERY_THRESHOLD 
-                                else "#ED8936" if robot.battery > CRITICAL_BATTERY 
-                                else "#F56565")
-                
-                self.canvas.create_text(
-                    canvas_x, canvas_y + ROBOT_RADIUS + 30,
-                    text=battery_text,
-                    fill=battery_color,
-                    font=('Arial', 8, 'bold'),
-                    tags=f"robot_battery_{robot.id}"
-                )
-                
-                # Waiting text (if waiting)
-                if robot.status == "waiting":
-                    self.canvas.create_text(
-                        canvas_x, canvas_y + ROBOT_RADIUS + 50,
-                        text="Waiting",
-                        fill='white',
-                        font=('Arial', 7),
-                        tags=f"robot_waiting_{robot.id}"
-                    )
+            if self.frame_thread is not None:
+                self.draw_raster_frame(x0, y0, x1, y1)
+            else:
+                region = self.drawn_region
+                if region is None or x0 < region[0] or y0 < region[1] or x1 > region[2] or y1 > region[3]:
+                    margin_x, margin_y = (x1 - x0) / 2, (y1 - y0) / 2
+                    self.draw_static_layer((x0 - margin_x, y0 - margin_y, x1 + margin_x, y1 + margin_y))
+                self.update_selected_vertex()
                 
-                # Charging progress (if charging)
-                if robot.status == "charging":
-                    self.canvas.create_rectangle(
-                        canvas_x - ROBOT_RADIUS, canvas_y + ROBOT_RADIUS + 40,
-                        canvas_x - ROBOT_RADIUS + (2 * ROBOT_RADIUS * robot.charge_progress/100), 
-                        canvas_y + ROBOT_RADIUS + 45,
-                        fill='#4299E1',
-                        outline='#2C5282',
-                        tags=f"robot_charge_{robot.id}"
-                    )
+                if (snapshot.version != self.drawn_version or
+                        self.selected_robot != self.drawn_selected_robot):
+                    self.update_robot_items(snapshot)
+                    self.drawn_version = snapshot.version
+                    self.drawn_selected_robot = self.selected_robot
             
             # Draw conflict notifications
-            conflicts = self.fleet_manager.traffic_manager.get_conflicts()
-            if conflicts:
-                self.conflict_var.set(" | ".join(conflicts))
-            else:
-                self.conflict_var.set("")
+            conflicts = " | ".join(snapshot.conflicts)
+            if conflicts != self.drawn_conflicts:
+                self.conflict_var.set(conflicts)
+                self.drawn_conflicts = conflicts
         except Exception as e:
             print(f"Error drawing graph: {e}")
     
+    def draw_raster_frame(self, x0, y0, x1, y1):
+        """Blit the raster thread's latest frame of the visible area as a single image"""
+        origin_x, origin_y = self.unscale_point(x0, y0)
+        self.frame_thread.view = (origin_x, origin_y, self.scale_factor, x1 - x0, y1 - y0)
+        self.frame_thread.selected_robot = self.selected_robot
+        
+        frame = self.frame_thread.frame
+        if frame is None or frame is self.drawn_frame:
+            return
+        _, (origin_x, origin_y, scale, _, _), image = frame
+        if scale != self.scale_factor:
+            return  # Rendered before the last zoom
+        
+        self.raster_photo = ImageTk.PhotoImage(image)  # Tk needs the reference kept alive
+        canvas_x, canvas_y = self.scale_point(origin_x, origin_y)
+        if self.raster_item is None:
+            self.raster_item = self.canvas.create_image(canvas_x, canvas_y, anchor='nw',
+                                                        image=self.raster_photo)
+        else:
+            self.canvas.coords(self.raster_item, canvas_x, canvas_y)
+            self.canvas.itemconfig(self.raster_item, image=self.raster_photo)
+        self.drawn_frame = frame
+    
+    def draw_static_layer(self, region):
+        """Lanes, vertices and labels inside a canvas region, drawn once per view and zoom"""
+        self.canvas.delete("static")
+        self.vertex_items = {}
+        
+        min_x, min_y = self.unscale_point(region[0], region[1])
+        max_x, max_y = self.unscale_point(region[2], region[3])
+        # Lanes crossing the region can have both ends outside it, up to a lane length away
+        reach = self.nav_graph.longest_lane()
+        nearby = set(self.nav_graph.vertices_in_box(min_x - reach, min_y - reach,
+                                                    max_x + reach, max_y + reach))
+        
+        # Draw lanes, or only the map's footprint when there are too many to tell apart
+        lane_count = sum(len(self.nav_graph.adjacency[v]) for v in nearby) // 2
+        if lane_count > MAX_LANE_ITEMS:
+            self.draw_footprint(nearby, region)
+        else:
+            for v1 in nearby:
+                for v2 in self.nav_graph.adjacency[v1]:
+                    if v2 < v1 and v2 in nearby:
+                        continue  # Each lane is stored in both directions, draw it once
+                    self.draw_lane(v1, v2)
+        
+        # Draw vertices, fewer of them the further out we zoom
+        show_labels = self.scale_factor >= LABEL_SCALE
+        for idx in self.nav_graph.vertices_in_box(min_x, min_y, max_x, max_y):
+            if self.scale_factor >= VERTEX_SCALE or self.nav_graph.is_charger(idx):
+                self.draw_vertex(idx, show_labels)
+        
+        # Robots are redrawn on top of the new static layer
+        self.canvas.tag_lower("static")
+        self.drawn_region = region
+        self.drawn_selected_vertex = None
+        self.drawn_version = None
+    
+    def draw_lane(self, v1, v2):
+        x1, y1 = self.nav_graph.vertices[v1]
+        x2, y2 = self.nav_graph.vertices[v2]
+        
+        canvas_x1, canvas_y1 = self.scale_point(x1, y1)
+        canvas_x2, canvas_y2 = self.scale_point(x2, y2)
+        
+        self.canvas.create_line(
+            canvas_x1, canvas_y1, canvas_x2, canvas_y2,
+            fill='#718096', width=LANE_WIDTH, tags=("static", "lane")
+        )
+    
+    def draw_footprint(self, vertices, region):
+        """One square per screen cell that holds vertices, in place of thousands of lanes"""
+        left, top, right, bottom = region
+        cells = set()
+        for idx in vertices:
+            canvas_x, canvas_y = self.scale_point(*self.nav_graph.vertices[idx])
+            if left <= canvas_x <= right and top <= canvas_y <= bottom:
+                cells.add((int(canvas_x // BLOB_CELL), int(canvas_y // BLOB_CELL)))
+        for col, row in cells:
+            self.canvas.create_rectangle(
+                col * BLOB_CELL, row * BLOB_CELL, (col + 1) * BLOB_CELL, (row + 1) * BLOB_CELL,
+                fill='#718096', outline='', tags=("static", "footprint")
+            )
+    
+    def draw_vertex(self, idx, show_label):
+        x, y = self.nav_graph.vertices[idx]
+        canvas_x, canvas_y = self.scale_point(x, y)
+        vertex_data = self.nav_graph.vertex_data[idx]
+        
+        fill_color = '#38B2AC' if vertex_data['is_charger'] else '#4A5568'
+        
+        self.vertex_items[idx] = self.canvas.create_oval(
+            canvas_x - VERTEX_RADIUS, canvas_y - VERTEX_RADIUS,
+            canvas_x + VERTEX_RADIUS, canvas_y + VERTEX_RADIUS,
+            fill=fill_color, outline='#E2E8F0', width=2,
+            tags=("static", f"vertex_{idx}")
+        )
+        
+        if show_label:
+            display_text = vertex_data.get('name', str(idx))
+            self.canvas.create_text(
+                canvas_x, canvas_y - VERTEX_RADIUS - 15,
+                text=display_text,
+                fill=COLORS['text'], font=('Arial', 9, 'bold'),
+                tags=("static", f"vertex_label_{idx}")
+            )
+    
+    def update_selected_vertex(self):
+        """Move the selection outline when the selected vertex changed"""
+        if self.selected_vertex == self.drawn_selected_vertex:
+            return
+        if self.drawn_selected_vertex in self.vertex_items:
+            self.canvas.itemconfig(self.vertex_items[self.drawn_selected_vertex], outline='#E2E8F0', width=2)
+        if self.selected_vertex in self.vertex_items:
+            self.canvas.itemconfig(self.vertex_items[self.selected_vertex], outline='#F56565', width=3)
+        self.drawn_selected_vertex = self.selected_vertex
+    
+    def update_robot_items(self, snapshot):
+        """Create, move, restyle or delete robot items for robots whose state changed"""
+        if self.scale_factor < BLOB_SCALE:
+            self.draw_density_blobs(snapshot)
+            return
+        
+        # Despawned robots lose their items
+        for robot_id in list(self.robot_items):
+            if robot_id not in snapshot.robots:
+                self.delete_robot_items(robot_id)
+        
+        left, top, right, bottom = self.drawn_region
+        for robot in snapshot.robots.values():
+            # Robots outside the drawn region have no items at all
+            canvas_x, canvas_y = self.scale_point(robot.x, robot.y)
+            if not (left <= canvas_x <= right and top <= canvas_y <= bottom):
+                if robot.id in self.robot_items:
+                    self.delete_robot_items(robot.id)
+                continue
+            
+            key = (robot.x, robot.y, robot.status, robot.battery, robot.id == self.selected_robot)
+            if self.robot_render_keys.get(robot.id) == key:
+                continue
+            
+            if robot.id not in self.robot_items:
+                self.robot_items[robot.id] = self.create_robot_items(robot)
+            self.place_robot_items(robot, self.robot_items[robot.id], robot.x, robot.y)
+            self.robot_render_keys[robot.id] = key
+    
+    def delete_robot_items(self, robot_id):
+        self.canvas.delete(f"robot_items_{robot_id}")
+        del self.robot_items[robot_id]
+        self.robot_render_keys.pop(robot_id, None)
+    
+    def draw_density_blobs(self, snapshot):
+        """Zoomed far out: one blob per screen cell holding robots, sized by their number"""
+        self.canvas.delete("blob")
+        left, top, right, bottom = self.drawn_region
+        cells = Counter()
+        for robot in snapshot.robots.values():
+            canvas_x, canvas_y = self.scale_point(robot.x, robot.y)
+            if left <= canvas_x <= right and top <= canvas_y <= bottom:
+                cells[(int(canvas_x // BLOB_CELL), int(canvas_y // BLOB_CELL))] += 1
+        
+        for (col, row), count in cells.items():
+            center_x = (col + 0.5) * BLOB_CELL
+            center_y = (row + 0.5) * BLOB_CELL
+            radius = min(BLOB_CELL / 2, 3 + 2 * math.sqrt(count))
+            self.canvas.create_oval(
+                center_x - radius, center_y - radius, center_x + radius, center_y + radius,
+                fill=COLORS['primary'], outline=COLORS['text'], width=1, tags="blob"
+            )
+    
+    def create_robot_items(self, robot):
+        """Canvas items of one robot, positioned later by place_robot_items"""
+        group = f"robot_items_{robot.id}"
+        body = self.canvas.create_oval(
+            0, 0, 0, 0, fill=robot.color, tags=(group, f"robot_{robot.id}")
+        )
+        if self.scale_factor < LABEL_SCALE:
+            return {'body': body}  # Too small for readable decorations
+        
+        return {
+            # Robot body
+            'body': body,
+            # Robot ID
+            'label': self.canvas.create_text(
+                0, 0, text=str(robot.id),
+                fill='white', font=('Arial', 8, 'bold'),
+                tags=(group, f"robot_label_{robot.id}")
+            ),
+            # Status indicator
+            'status': self.canvas.create_oval(
+                0, 0, 0, 0, outline='white', width=1,
+                tags=(group, f"robot_status_{robot.id}")
+            ),
+            # Battery status
+            'battery': self.canvas.create_text(
+                0, 0, font=('Arial', 8, 'bold'),
+                tags=(group, f"robot_battery_{robot.id}")
+            ),
+            # Waiting text (shown while waiting)
+            'waiting': self.canvas.create_text(
+                0, 0, text="Waiting", fill='white', font=('Arial', 7), state='hidden',
+                tags=(group, f"robot_waiting_{robot.id}")
+            ),
+            # Charging progress (shown while charging)
+            'charge': self.canvas.create_rectangle(
+                0, 0, 0, 0, fill='#4299E1', outline='#2C5282', state='hidden',
+                tags=(group, f"robot_charge_{robot.id}")
+            ),
+        }
+    
+    def place_robot_items(self, robot, items, x, y):
+        """Update a robot's items in place from its current position and state"""
+        canvas_x, canvas_y = self.scale_point(x, y)
+        selected = robot.id == self.selected_robot
+        
+        self.canvas.coords(items['body'],
+                           canvas_x - ROBOT_RADIUS, canvas_y - ROBOT_RADIUS,
+                           canvas_x + ROBOT_RADIUS, canvas_y + ROBOT_RADIUS)
+        self.canvas.itemconfig(items['body'],
+                               outline='#F6E05E' if selected else robot.color,
+                               width=3 if selected else 1)
+        if 'label' not in items:
+            return
+        self.canvas.coords(items['label'], canvas_x, canvas_y)
+        
+        status_y = canvas_y + ROBOT_RADIUS + 15
+        self.canvas.coords(items['status'], canvas_x - 5, status_y - 5, canvas_x + 5, status_y + 5)
+        self.canvas.itemconfig(items['status'], fill=ROBOT_STATUS_COLORS.get(robot.status, '#000000'))
+        
+        self.canvas.coords(items['battery'], canvas_x, canvas_y + ROBOT_RADIUS + 30)
+        self.canvas.itemconfig(items['battery'], text=f"{robot.battery}%", fill=battery_color(robot.battery))
+        
+        self.canvas.coords(items['waiting'], canvas_x, canvas_y + ROBOT_RADIUS + 50)
+        self.canvas.itemconfig(items['waiting'], state='normal' if robot.status == "waiting" else 'hidden')
+        
+        self.canvas.coords(items['charge'],
+                           canvas_x - ROBOT_RADIUS, canvas_y + ROBOT_RADIUS + 40,
+                           canvas_x - ROBOT_RADIUS + (2 * ROBOT_RADIUS * robot.charge_progress/100),
+                           canvas_y + ROBOT_RADIUS + 45)
+        self.canvas.itemconfig(items['charge'], state='normal' if robot.status == "charging" else 'hidden')
+    
     def on_canvas_click(self, event):
         # Get the actual canvas coordinates of the click
         canvas_x = self.canvas.canvasx(event.x)
         canvas_y = self.canvas.canvasy(event.y)
         
+        # Hit-test in map coordinates against the spatial indexes
+        x, y = self.unscale_point(canvas_x, canvas_y)
+        
         # First check if we're clicking on an existing robot
-        for robot in self.fleet_manager.robots:
-            pos = self.fleet_manager.get_robot_position(robot.id)
-            if pos:
-                robot_x, robot_y = self.scale_point(pos[0], pos[1])
-                distance = ((canvas_x - robot_x)**2 + (canvas_y - robot_y)**2)**0.5
-                
-                if distance <= ROBOT_RADIUS:
-                    # Select this robot (unless we already have one selected)
-                    if self.selected_robot != robot.id:
-                        self.selected_robot = robot.id
-                        self.selected_vertex = None
-                        self.update_status(f"Selected Robot {robot.id}")
-                        self.draw_graph()
-                    return
+        with self.worker.lock:
+            robot_ids = self.fleet_manager.robots_within(x, y, ROBOT_RADIUS / self.scale_factor)
+        if robot_ids:
+            robot_id = robot_ids[0]
+            # Select this robot (unless we already have one selected)
+            if self.selected_robot != robot_id:
+                self.selected_robot = robot_id
+                self.selected_vertex = None
+                self.update_status(f"Selected Robot {robot_id}")
+                self.draw_graph()
+            return
         
         # Then check for vertex clicks
-        for vertex_id, (x, y) in enumerate(self.nav_graph.vertices):
-            # Convert to canvas coordinates
-            vertex_x, vertex_y = self.scale_point(x, y)
-            
-            # Calculate distance from click to vertex center
-            distance = ((canvas_x - vertex_x)**2 + (canvas_y - vertex_y)**2)**0.5
-            
-            # If click is within the vertex circle
-            if distance <= VERTEX_RADIUS:
-                if self.selected_robot is not None:
-                    # Move selected robot to this vertex
-                    robot = self.fleet_manager.robots[self.selected_robot]
-                    success, message = robot.assign_task(vertex_id)
-                    
-                    if success:
-                        self.update_status(f"Robot {robot.id} moving to vertex {vertex_id}")
-                    else:
-                        messagebox.showwarning("Movement Failed", message)
-                    
-                    self.selected_robot = None
+        vertex_id = self.nav_graph.nearest_vertex(x, y, VERTEX_RADIUS / self.scale_factor)
+        if vertex_id is not None:
+            if self.selected_robot is not None:
+                # Move selected robot to this vertex
+                robot_id = self.selected_robot
+                with self.worker.lock:
+                    success, message = self.fleet_manager.assign_task(robot_id, vertex_id)
+                    self.worker.publish()
+                
+                if success:
+                    self.update_status(f"Robot {robot_id} moving to vertex {vertex_id}")
                 else:
-                    # Check if vertex is empty before spawning
-                    vertex_empty = True
-                    for r in self.fleet_manager.robots:
-                        if r.current_vertex == vertex_id and r.current_lane is None:
-                            vertex_empty = False
-                            break
-                    
-                    if vertex_empty:
+                    messagebox.showwarning("Movement Failed", message)
+                
+                self.selected_robot = None
+            else:
+                # Check if vertex is empty before spawning
+                with self.worker.lock:
+                    robot = None
+                    if self.fleet_manager.robots.is_vertex_free(vertex_id):
                         # Spawn new robot only if vertex is empty
                         robot = self.fleet_manager.spawn_robot(vertex_id)
-                        self.selected_vertex = vertex_id
-                        self.update_status(f"Spawned Robot {robot.id} at vertex {vertex_id}")
-                    else:
-                        self.update_status(f"Vertex {vertex_id} already occupied")
-                
-                self.draw_graph()
-                return
+                        self.worker.publish()
+                if robot is not None:
+                    self.selected_vertex = vertex_id
+                    self.update_status(f"Spawned Robot {robot.id} at vertex {vertex_id}")
+                else:
+                    self.update_status(f"Vertex {vertex_id} already occupied")
+            
+            self.draw_graph()
+            return
         
         # If we got here, click wasn't on any node or robot
         self.clear_selection()
 
+    def on_canvas_shift_click(self, event):
+        """Queue the clicked vertex: on the selected robot's task list, or for the next batch"""
+        x, y = self.unscale_point(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        vertex_id = self.nav_graph.nearest_vertex(x, y, VERTEX_RADIUS / self.scale_factor)
+        if vertex_id is None:
+            return
+        if self.selected_robot is not None:
+            with self.worker.lock:
+                self.fleet_manager.dispatcher.submit(vertex_id, self.selected_robot)
+            self.update_status(f"Queued {self.nav_graph.get_vertex_name(vertex_id)} for robot {self.selected_robot}")
+        else:
+            self.pending_targets.append(vertex_id)
+            self.update_status(f"{len(self.pending_targets)} targets queued, press Enter to dispatch")
+    
+    def assign_pending_targets(self, event=None):
+        """Hand the queued targets to the dispatcher, which assigns them as robots free up"""
+        if not self.pending_targets:
+            return
+        with self.worker.lock:
+            for vertex_id in self.pending_targets:
+                self.fleet_manager.dispatcher.submit(vertex_id)
+            pending = self.fleet_manager.dispatcher.pending_count()
+        self.update_status(f"Dispatched {len(self.pending_targets)} targets, {pending} tasks pending")
+        self.pending_targets = []
+    
     def clear_selection(self):
         self.selected_robot = None
         self.selected_vertex = None
@@ -584,11 +864,13 @@ class FleetGUI:
     def update_status(self, message):
         self.status_label.config(text=message)
         
+        robot = None
         if self.selected_robot is not None:
-            robot = self.fleet_manager.robots[self.selected_robot]
+            robot = self.worker.snapshot.robots.get(self.selected_robot)
+        if robot is not None:
             status_text = f"Robot {robot.id} - Status: {robot.status}"
-            if robot.status == "moving" and robot.path:
-                dest = self.nav_graph.get_vertex_name(robot.path[-1])
+            if robot.status == "moving" and robot.destination is not None:
+                dest = self.nav_graph.get_vertex_name(robot.destination)
                 status_text += f" (to {dest})"
             if robot.status == "charging":
                 status_text += f" ({robot.battery}%)"
@@ -601,9 +883,9 @@ class FleetGUI:
             return
             
         try:
-            self.fleet_manager.update_robots()
+            # Drawing only; the worker thread steps the fleet at its own rate
             self.draw_graph()
-            self.update_id = self.master.after(UPDATE_INTERVAL, self.update)
+            self.update_id = self.master.after(FRAME_INTERVAL, self.update)
         except Exception as e:
             print(f"Error in update loop: {e}")
             self.running = False
\ No newline at end of file
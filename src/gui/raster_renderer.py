@@ -0,0 +1,144 @@
+import threading
+from PIL import Image, ImageDraw
+from src.gui.style import (
+    ROBOT_RADIUS, VERTEX_RADIUS, LANE_WIDTH, LABEL_SCALE, COLORS, ROBOT_STATUS_COLORS, battery_color
+)
+
+FIT_MARGIN = 60  # pixels kept free around the map when fitting it into the image
+
+
+class RasterRenderer:
+    """Draws fleet snapshots into a single Pillow image.
+
+    The map (lanes, vertices and labels) is drawn once per view into a
+    background image, and each frame copies it and draws the robots on
+    top. Nothing here touches Tk, so frames can be rendered off the Tk
+    thread or without a display at all.
+    """
+
+    def __init__(self, nav_graph, width, height, scale=None):
+        self.nav_graph = nav_graph
+        self.background = None
+        self.view = None
+        if scale is None:
+            # Fit the whole map into the image
+            map_width = max(nav_graph.max_x - nav_graph.min_x, 1e-9)
+            map_height = max(nav_graph.max_y - nav_graph.min_y, 1e-9)
+            scale = min((width - 2 * FIT_MARGIN) / map_width, (height - 2 * FIT_MARGIN) / map_height)
+        self.set_view(nav_graph.min_x - FIT_MARGIN / scale, nav_graph.min_y - FIT_MARGIN / scale,
+                      scale, width, height)
+
+    def set_view(self, origin_x, origin_y, scale, width, height):
+        """Show the map from map point (origin_x, origin_y) at scale pixels per unit"""
+        view = (origin_x, origin_y, scale, int(width), int(height))
+        if view != self.view:
+            self.view = view
+            self.background = None
+
+    def to_pixel(self, x, y):
+        origin_x, origin_y, scale, _, _ = self.view
+        return (x - origin_x) * scale, (y - origin_y) * scale
+
+    def draw_background(self):
+        origin_x, origin_y, scale, width, height = self.view
+        image = Image.new('RGB', (width, height), COLORS['light_bg'])
+        draw = ImageDraw.Draw(image)
+
+        max_x = origin_x + width / scale
+        max_y = origin_y + height / scale
+        reach = self.nav_graph.longest_lane()
+        nearby = set(self.nav_graph.vertices_in_box(origin_x - reach, origin_y - reach,
+                                                    max_x + reach, max_y + reach))
+        for v1 in nearby:
+            for v2 in self.nav_graph.adjacency[v1]:
+                if v2 < v1 and v2 in nearby:
+                    continue  # Each lane is stored in both directions, draw it once
+                draw.line([self.to_pixel(*self.nav_graph.vertices[v1]),
+                           self.to_pixel(*self.nav_graph.vertices[v2])],
+                          fill='#718096', width=LANE_WIDTH)
+
+        show_labels = scale >= LABEL_SCALE
+        for idx in self.nav_graph.vertices_in_box(origin_x, origin_y, max_x, max_y):
+            x, y = self.to_pixel(*self.nav_graph.vertices[idx])
+            fill_color = '#38B2AC' if self.nav_graph.is_charger(idx) else '#4A5568'
+            draw.ellipse([x - VERTEX_RADIUS, y - VERTEX_RADIUS, x + VERTEX_RADIUS, y + VERTEX_RADIUS],
+                         fill=fill_color, outline='#E2E8F0', width=2)
+            if show_labels:
+                draw.text((x, y - VERTEX_RADIUS - 15), self.nav_graph.get_vertex_name(idx),
+                          fill=COLORS['text'], anchor='mm')
+        self.background = image
+
+    def render(self, snapshot, selected_robot=None, caption=None):
+        """Image of the map with every robot of a FleetSnapshot drawn on it"""
+        if self.background is None:
+            self.draw_background()
+        _, _, scale, width, height = self.view
+        image = self.background.copy()
+        draw = ImageDraw.Draw(image)
+        show_details = scale >= LABEL_SCALE
+
+        for robot in snapshot.robots.values():
+            x, y = self.to_pixel(robot.x, robot.y)
+            if not (-ROBOT_RADIUS <= x <= width + ROBOT_RADIUS and -ROBOT_RADIUS <= y <= height + ROBOT_RADIUS):
+                continue
+            selected = robot.id == selected_robot
+            draw.ellipse([x - ROBOT_RADIUS, y - ROBOT_RADIUS, x + ROBOT_RADIUS, y + ROBOT_RADIUS],
+                         fill=robot.color, outline='#F6E05E' if selected else robot.color,
+                         width=3 if selected else 1)
+            if not show_details:
+                continue
+            draw.text((x, y), str(robot.id), fill='white', anchor='mm')
+            status_y = y + ROBOT_RADIUS + 15
+            draw.ellipse([x - 5, status_y - 5, x + 5, status_y + 5],
+                         fill=ROBOT_STATUS_COLORS.get(robot.status, '#000000'), outline='white')
+            draw.text((x, y + ROBOT_RADIUS + 30), f"{robot.battery}%",
+                      fill=battery_color(robot.battery), anchor='mm')
+            if robot.status == "charging":
+                draw.rectangle([x - ROBOT_RADIUS, y + ROBOT_RADIUS + 40,
+                                x - ROBOT_RADIUS + (2 * ROBOT_RADIUS * robot.charge_progress / 100),
+                                y + ROBOT_RADIUS + 45],
+                               fill='#4299E1', outline='#2C5282')
+            elif robot.status == "waiting":
+                draw.text((x, y + ROBOT_RADIUS + 50), "Waiting", fill='white', anchor='mm')
+
+        if caption:
+            draw.text((10, 10), caption, fill=COLORS['text'])
+        return image
+
+
+class FrameThread:
+    """Renders the latest snapshot of a SimulationWorker on a background thread.
+
+    The Tk thread sets `view` and `selected_robot` and picks up `frame`,
+    a (snapshot version, view, image) tuple, to blit it as one PhotoImage.
+    """
+
+    def __init__(self, worker, renderer, interval):
+        self.worker = worker
+        self.renderer = renderer
+        self.interval = interval
+        self.view = renderer.view
+        self.selected_robot = None
+        self.frame = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="fleet-raster", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def _run(self):
+        drawn = None
+        while not self.stop_event.is_set():
+            snapshot = self.worker.snapshot
+            view = self.view
+            state = (snapshot.version, view, self.selected_robot)
+            if state != drawn:
+                try:
+                    self.renderer.set_view(*view)
+                    self.frame = (snapshot.version, view, self.renderer.render(snapshot, self.selected_robot))
+                    drawn = state
+                except Exception as e:
+                    print(f"Error rendering frame: {e}")
+            self.stop_event.wait(self.interval)
@@ -0,0 +1,38 @@
+from src.models.robot import LOW_BATTERY_THRESHOLD, CRITICAL_BATTERY
+
+# Sizes in pixels, shared by the canvas and the raster renderer
+ROBOT_RADIUS = 10
+VERTEX_RADIUS = 8
+LANE_WIDTH = 2
+LABEL_SCALE = 20      # below this zoom, vertex labels and robot decorations are hidden
+
+# Color scheme
+COLORS = {
+    'background': '#2D3748',
+    'primary': '#4299E1',
+    'secondary': '#2C5282',
+    'accent': '#38B2AC',
+    'text': '#E2E8F0',
+    'error': '#F56565',
+    'success': '#48BB78',
+    'warning': '#ED8936',
+    'dark_bg': '#1A202C',
+    'light_bg': '#4A5568'
+}
+
+# Status indicator colour per robot status
+ROBOT_STATUS_COLORS = {
+    'idle': '#A0AEC0',
+    'moving': '#48BB78',
+    'waiting': '#ED8936',
+    'charging': '#4299E1',
+    'complete': '#9F7AEA',
+    'disabled': '#F56565'
+}
+
+def battery_color(battery):
+    if battery > LOW_BATTERY_THRESHOLD:
+        return "#48BB78"
+    if battery > CRITICAL_BATTERY:
+        return "#ED8936"
+    return "#F56565"
@@ -0,0 +1,224 @@
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+
+
+def charger_field(count, chargers, weighted_adjacency):
+    """Multi-source Dijkstra from all chargers.
+
+    Lanes are bidirectional, so searching outwards over the forward
+    adjacency gives the distance from every vertex to its nearest charger.
+    Returns the nearest charger, distance and next hop arrays, -1 marking
+    "no charger reachable" / "already at the charger".
+    """
+    nearest_charger = array('i', [-1]) * count
+    charger_distance = array('d', [math.inf]) * count
+    charger_next_hop = array('i', [-1]) * count
+
+    heap = []
+    for charger in chargers:
+        nearest_charger[charger] = charger
+        charger_distance[charger] = 0.0
+        heap.append((0.0, charger))
+    heapq.heapify(heap)
+
+    while heap:
+        cost, current = heapq.heappop(heap)
+        if cost > charger_distance[current]:
+            continue  # Stale heap entry
+        for previous, weight in weighted_adjacency[current]:
+            new_cost = cost + weight
+            if new_cost < charger_distance[previous]:
+                charger_distance[previous] = new_cost
+                nearest_charger[previous] = nearest_charger[current]
+                charger_next_hop[previous] = current
+                heapq.heappush(heap, (new_cost, previous))
+    return nearest_charger, charger_distance, charger_next_hop
+
+
+class CSRGraph:
+    """Compressed-sparse-row storage for one nav graph level.
+
+    Coordinates, lane targets and lane lengths live in flat typed arrays, so a
+    vertex costs a few machine words instead of a tuple, a dict and a list.
+    The neighbours of vertex v are targets[offsets[v]:offsets[v + 1]].
+    The charger field is computed on first use, or read from the map cache.
+    """
+
+    def __init__(self, xs, ys, offsets, targets, weights, charger_mask, name_offsets, name_blob,
+                 charger_field=None):
+        self.xs = xs
+        self.ys = ys
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.charger_mask = charger_mask
+        self.name_offsets = name_offsets
+        self.name_blob = name_blob
+        self.charger_field = charger_field  # (nearest charger, distance, next hop) arrays
+
+    @classmethod
+    def from_level(cls, vertices, lanes):
+        """Build from the raw `vertices` and `lanes` entries of a level"""
+        builder = CSRBuilder()
+        for x, y, attributes in vertices:
+            builder.add_vertex(x, y, attributes)
+        for lane in lanes:
+            builder.add_lane(lane[0], lane[1])
+        return builder.build()
+
+    @property
+    def vertex_count(self):
+        return len(self.xs)
+
+    def is_charger(self, idx):
+        return bool(self.charger_mask[idx >> 3] & (1 << (idx & 7)))
+
+    def chargers(self):
+        return [idx for idx in range(self.vertex_count) if self.is_charger(idx)]
+
+    def build_charger_field(self):
+        """Nearest charger, distance and next hop arrays for every vertex"""
+        if self.charger_field is None:
+            self.charger_field = charger_field(self.vertex_count, self.chargers(), AdjacencyView(self, weighted=True))
+        return self.charger_field
+
+    def get_name(self, idx):
+        return bytes(self.name_blob[self.name_offsets[idx]:self.name_offsets[idx + 1]]).decode('utf-8')
+
+    def neighbors(self, v):
+        return self.targets[self.offsets[v]:self.offsets[v + 1]]
+
+    def weighted_neighbors(self, v):
+        start, end = self.offsets[v], self.offsets[v + 1]
+        return zip(self.targets[start:end], self.weights[start:end])
+
+
+class CSRBuilder:
+    """Accumulates vertices and lanes in any order, e.g. from a streaming parser"""
+
+    def __init__(self):
+        self.xs = array('d')
+        self.ys = array('d')
+        self.names = []
+        self.chargers = []
+        self.edges = set()
+
+    def add_vertex(self, x, y, attributes):
+        idx = len(self.xs)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.names.append(attributes.get('name', f'V{idx}'))
+        if attributes.get('is_charger', False):
+            self.chargers.append(idx)
+
+    def add_lane(self, v1, v2):
+        # Lanes are bidirectional, store each direction once
+        self.edges.add((v1, v2))
+        self.edges.add((v2, v1))
+
+    def build(self):
+        xs, ys = self.xs, self.ys
+        count = len(xs)
+        offsets = array('q', [0] * (count + 1))
+        targets = array('i')
+        weights = array('d')
+        # Sorted, so every vertex's neighbours are in ascending order for LaneView lookups
+        for v1, v2 in sorted(self.edges):
+            offsets[v1 + 1] += 1
+            targets.append(v2)
+            weights.append(math.hypot(xs[v2] - xs[v1], ys[v2] - ys[v1]))
+        for v in range(count):
+            offsets[v + 1] += offsets[v]
+
+        charger_mask = bytearray((count + 7) // 8)
+        for idx in self.chargers:
+            charger_mask[idx >> 3] |= 1 << (idx & 7)
+
+        name_offsets = array('q', [0])
+        encoded = bytearray()
+        for name in self.names:
+            encoded += name.encode('utf-8')
+            name_offsets.append(len(encoded))
+
+        return CSRGraph(xs, ys, offsets, targets, weights, charger_mask, name_offsets, bytes(encoded))
+
+
+class CoordinateView:
+    """Sequence of (x, y) tuples over the CSR coordinate arrays"""
+
+    def __init__(self, csr):
+        self.csr = csr
+
+    def __len__(self):
+        return self.csr.vertex_count
+
+    def __getitem__(self, idx):
+        return (self.csr.xs[idx], self.csr.ys[idx])
+
+    def __iter__(self):
+        return zip(self.csr.xs, self.csr.ys)
+
+
+class VertexDataView:
+    """Sequence of vertex attribute dicts, built on access"""
+
+    def __init__(self, csr):
+        self.csr = csr
+
+    def __len__(self):
+        return self.csr.vertex_count
+
+    def __getitem__(self, idx):
+        return {
+            'name': self.csr.get_name(idx),
+            'is_charger': self.csr.is_charger(idx),
+            'index': idx
+        }
+
+    def __iter__(self):
+        return (self[idx] for idx in range(len(self)))
+
+
+class AdjacencyView:
+    """Mapping of vertex -> neighbours (or (neighbour, length) pairs)"""
+
+    def __init__(self, csr, weighted=False):
+        self.csr = csr
+        self.weighted = weighted
+
+    def __len__(self):
+        return self.csr.vertex_count
+
+    def __getitem__(self, v):
+        if self.weighted:
+            return self.csr.weighted_neighbors(v)
+        return self.csr.neighbors(v)
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+
+class LaneView:
+    """Set-like view of directed lanes (v1, v2)"""
+
+    def __init__(self, csr):
+        self.csr = csr
+
+    def __len__(self):
+        return len(self.csr.targets)
+
+    def __contains__(self, lane):
+        v1, v2 = lane
+        if not 0 <= v1 < self.csr.vertex_count:
+            return False
+        # Each vertex's neighbours are stored sorted (see CSRBuilder.build)
+        start, end = self.csr.offsets[v1], self.csr.offsets[v1 + 1]
+        idx = bisect_left(self.csr.targets, v2, start, end)
+        return idx < end and self.csr.targets[idx] == v2
+
+    def __iter__(self):
+        for v1 in range(self.csr.vertex_count):
+            for v2 in self.csr.neighbors(v1):
+                yield (v1, v2)
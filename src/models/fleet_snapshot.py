@@ -0,0 +1,11 @@
+from collections import namedtuple
+
+# What the GUI needs to draw one robot
+RobotSnapshot = namedtuple(
+    'RobotSnapshot', 'id color x y status battery charge_progress destination'
+)
+
+# Immutable picture of the whole fleet after one simulation step. robots is a
+# read-only mapping robot_id -> RobotSnapshot, conflicts a tuple of messages,
+# and version increases with every snapshot published.
+FleetSnapshot = namedtuple('FleetSnapshot', 'version time robots conflicts')
@@ -0,0 +1,172 @@
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, plain typed arrays are the fallback
+    np = None
+
+STATUSES = ["idle", "moving", "waiting", "charging", "complete", "disabled"]
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+MOVING = STATUS_CODES["moving"]
+CHARGING = STATUS_CODES["charging"]
+
+INITIAL_CAPACITY = 64
+NUMPY_MIN_SLOTS = 64  # below this a plain loop beats the fixed cost of the NumPy calls
+
+# name -> (array typecode, numpy dtype, value of an empty slot)
+FIELDS = {
+    'progress': ('d', 'float64', 0.0),
+    'battery': ('i', 'int32', 100),
+    'status': ('b', 'int8', 0),
+    'current_vertex': ('i', 'int32', -1),
+    'lane_from': ('i', 'int32', -1),
+    'lane_to': ('i', 'int32', -1),
+    'in_flight': ('b', 'int8', 0),   # lane and next vertex are reserved, only progress changes
+    'emergency': ('b', 'int8', 0),   # emergency charge already requested
+}
+
+
+class FleetState:
+    """Struct-of-arrays store for the per-tick robot state.
+
+    Each robot owns one slot, and Robot reads and writes its progress,
+    battery, status, position and lane through the arrays. This lets the
+    whole fleet's lane progress, charging and position interpolation run as
+    single array operations. NumPy is used when it is installed and the fleet
+    has at least NUMPY_MIN_SLOTS slots. Otherwise the same operations run as
+    loops over the arrays.
+
+    The per-field attributes (state.battery and so on) are what single slots
+    are read and written through. With NumPy they are memoryviews of the
+    NumPy columns, so a read returns a plain Python number instead of a
+    NumPy scalar; the batch steps work on the columns themselves.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.capacity = 0
+        self.size = 0
+        self.free_slots = []
+        self.columns = {}  # name -> NumPy array, only with NumPy
+        for name, (typecode, dtype, empty) in FIELDS.items():
+            if np is not None:
+                self.columns[name] = np.empty(0, dtype=dtype)
+            else:
+                setattr(self, name, array(typecode))
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        extra = capacity - self.capacity
+        for name, (typecode, dtype, empty) in FIELDS.items():
+            if np is not None:
+                column = np.concatenate([self.columns[name], np.full(extra, empty, dtype=dtype)])
+                self.columns[name] = column
+                setattr(self, name, memoryview(column))
+            else:
+                getattr(self, name).extend([empty] * extra)
+        self.capacity = capacity
+
+    def values(self, name):
+        """Values of one field for slots 0 to size - 1, as a list"""
+        return getattr(self, name)[:self.size].tolist()
+
+    def allocate(self):
+        """Reserve a slot for a new robot and reset it"""
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            if self.size == self.capacity:
+                self._grow(max(INITIAL_CAPACITY, self.capacity * 2))
+            slot = self.size
+            self.size += 1
+        for name, (_, _, empty) in FIELDS.items():
+            getattr(self, name)[slot] = empty
+        return slot
+
+    def free(self, slot):
+        """Return a slot for reuse; an idle, lane-less slot is ignored by the batch steps"""
+        self.status[slot] = STATUS_CODES["idle"]
+        self.lane_from[slot] = -1
+        self.lane_to[slot] = -1
+        self.in_flight[slot] = 0
+        self.current_vertex[slot] = -1
+        self.free_slots.append(slot)
+
+    def step_in_flight(self, speed, low_battery):
+        """Advance every robot that is mid-lane with its resources reserved.
+
+        Robots low on battery that have not requested a charge yet are left
+        out, so their own update can divert them. Returns (advanced, arrived)
+        slot lists, where arrived robots reached the end of their lane.
+        """
+        n = self.size
+        if np is not None and n >= NUMPY_MIN_SLOTS:
+            columns = self.columns
+            mask = ((columns['status'][:n] == MOVING) & (columns['in_flight'][:n] == 1) &
+                    ((columns['battery'][:n] > low_battery) | (columns['emergency'][:n] == 1)))
+            advanced = np.flatnonzero(mask)
+            progress = columns['progress']
+            progress[advanced] += speed
+            arrived = advanced[progress[advanced] >= 1]
+            return advanced.tolist(), arrived.tolist()
+
+        advanced, arrived = [], []
+        status, in_flight, battery, emergency, progress = \
+            self.status, self.in_flight, self.battery, self.emergency, self.progress
+        for slot in range(n):
+            if status[slot] == MOVING and in_flight[slot] and (battery[slot] > low_battery or emergency[slot]):
+                progress[slot] += speed
+                advanced.append(slot)
+                if progress[slot] >= 1:
+                    arrived.append(slot)
+        return advanced, arrived
+
+    def step_charging(self, rate, full, threshold):
+        """Charge every charging robot; returns (charging, finished) slot lists"""
+        n = self.size
+        if np is not None and n >= NUMPY_MIN_SLOTS:
+            battery = self.columns['battery']
+            charging = np.flatnonzero(self.columns['status'][:n] == CHARGING)
+            battery[charging] = np.minimum(full, battery[charging] + rate)
+            finished = charging[battery[charging] >= threshold]
+            return charging.tolist(), finished.tolist()
+
+        charging, finished = [], []
+        status, battery = self.status, self.battery
+        for slot in range(n):
+            if status[slot] == CHARGING:
+                battery[slot] = min(full, battery[slot] + rate)
+                charging.append(slot)
+                if battery[slot] >= threshold:
+                    finished.append(slot)
+        return charging, finished
+
+    def positions(self, xs, ys):
+        """(x, y) of every slot, interpolated along lanes.
+
+        xs and ys hold the vertex coordinates. Returns two sequences indexed by
+        slot. Free slots get meaningless values.
+        """
+        n = self.size
+        if np is not None and n >= NUMPY_MIN_SLOTS:
+            columns = self.columns
+            xs = np.asarray(xs, dtype='float64')
+            ys = np.asarray(ys, dtype='float64')
+            vertex = np.maximum(columns['current_vertex'][:n], 0)
+            lane_from = columns['lane_from'][:n]
+            on_lane = lane_from >= 0
+            start = np.where(on_lane, lane_from, vertex)
+            end = np.where(on_lane, columns['lane_to'][:n], vertex)
+            t = np.where(on_lane, columns['progress'][:n], 0.0)
+            return xs[start] + (xs[end] - xs[start]) * t, ys[start] + (ys[end] - ys[start]) * t
+
+        out_x = array('d', bytes(8 * n))
+        out_y = array('d', bytes(8 * n))
+        for slot in range(n):
+            if self.lane_from[slot] >= 0:
+                v1, v2, t = self.lane_from[slot], self.lane_to[slot], self.progress[slot]
+                out_x[slot] = xs[v1] + (xs[v2] - xs[v1]) * t
+                out_y[slot] = ys[v1] + (ys[v2] - ys[v1]) * t
+            elif self.current_vertex[slot] >= 0:
+                out_x[slot] = xs[self.current_vertex[slot]]
+                out_y[slot] = ys[self.current_vertex[slot]]
+        return out_x, out_y
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import warnings
+from array import array
+from src.models.csr_graph import CSRGraph, CSRBuilder
+
+CACHE_MAGIC = b'NAVCSR02'
+CACHE_ENV_VAR = 'FLEET_NAV_CACHE'  # overrides the cache directory
+CACHE_DIR_NAME = '.navcache'       # default: next to the source JSON
+BYTE_ORDER_MARK = 0x0102030405060708
+READ_CHUNK_SIZE = 1 << 16
+
+# magic, byte order mark, vertex count, directed lane count, name blob length, source SHA-256
+HEADER = struct.Struct('=8sqqqq32s')
+
+
+class JsonStream:
+    """Incremental reader for the nav graph JSON.
+
+    Walks objects and arrays token by token and decodes only the leaf items
+    (single vertices and lanes), so a map never has to be held as one big
+    Python structure.
+    """
+
+    def __init__(self, fp, chunk_size=READ_CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed nav graph JSON: expected '{char}', found '{found}'")
+        self.pos += 1
+
+    def read_value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number ending exactly at the buffer edge may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _next_item(self, closing):
+        char = self.peek()
+        self.pos += 1
+        if char == closing:
+            return False
+        if char != ',':
+            raise ValueError(f"Malformed nav graph JSON: expected ',' or '{closing}', found '{char}'")
+        return True
+
+    def iter_array(self):
+        """Yield the decoded items of an array"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.read_value()
+            if not self._next_item(']'):
+                return
+
+    def iter_object(self):
+        """Yield the keys of an object; the caller must consume each value"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            if not self._next_item('}'):
+                return
+
+
+class LevelCollector:
+    """Builder that keeps a streamed level as raw vertex and lane entries"""
+
+    def __init__(self):
+        self.vertices = []
+        self.lanes = []
+
+    def add_vertex(self, x, y, attributes):
+        self.vertices.append((x, y, attributes))
+
+    def add_lane(self, v1, v2):
+        self.lanes.append((v1, v2, {}))
+
+    def level_data(self):
+        return {'vertices': self.vertices, 'lanes': self.lanes}
+
+
+def stream_level(json_file, builder, level=None):
+    """Stream one level (the first one by default) into builder, return its name"""
+    found = None
+    with open(json_file, encoding='utf-8') as f:
+        stream = JsonStream(f)
+        for key in stream.iter_object():
+            if key != 'levels':
+                stream.read_value()
+                continue
+            for name in stream.iter_object():
+                if found is not None or (level is not None and name != level):
+                    stream.read_value()
+                    continue
+                found = name
+                for section in stream.iter_object():
+                    if section == 'vertices':
+                        for x, y, attributes in stream.iter_array():
+                            builder.add_vertex(x, y, attributes)
+                    elif section == 'lanes':
+                        for lane in stream.iter_array():
+                            builder.add_lane(lane[0], lane[1])
+                    else:
+                        stream.read_value()
+    if found is None:
+        raise ValueError(f"Level {level!r} not found in {json_file}" if level else f"No levels in {json_file}")
+    return found
+
+
+def scan_levels(json_file):
+    """List the level names, vertex counts and lift vertices of a map without building any level.
+
+    Returns (level_names, vertex_counts, lifts) where vertex_counts maps a
+    level name to its number of vertices and lifts maps a lift name to
+    {level_name: vertex_index} for every vertex carrying a 'lift' attribute.
+    """
+    level_names = []
+    vertex_counts = {}
+    lifts = {}
+    with open(json_file, encoding='utf-8') as f:
+        stream = JsonStream(f)
+        for key in stream.iter_object():
+            if key != 'levels':
+                stream.read_value()
+                continue
+            for name in stream.iter_object():
+                level_names.append(name)
+                vertex_counts[name] = 0
+                for section in stream.iter_object():
+                    if section != 'vertices':
+                        stream.read_value()
+                        continue
+                    for idx, (_, _, attributes) in enumerate(stream.iter_array()):
+                        vertex_counts[name] = idx + 1
+                        lift = attributes.get('lift')
+                        if lift:
+                            lifts.setdefault(lift, {})[name] = idx
+    return level_names, vertex_counts, lifts
+
+
+def file_digest(json_file):
+    """SHA-256 of the file contents"""
+    digest = hashlib.sha256()
+    with open(json_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def cache_path(json_file, level=None):
+    """Cache file for a level, keyed on the source's path, size and modification time"""
+    source = os.path.abspath(json_file)
+    stat = os.stat(source)
+    cache_dir = os.environ.get(CACHE_ENV_VAR) or os.path.join(os.path.dirname(source), CACHE_DIR_NAME)
+    key = f"{source}:{stat.st_size}:{stat.st_mtime_ns}:{level or ''}"
+    return os.path.join(cache_dir, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}.navbin")
+
+
+def _pad(f):
+    """Keep every section 8-byte aligned for the memoryview casts"""
+    f.write(b'\0' * (-f.tell() % 8))
+
+
+def write_cache(path, csr, digest):
+    """Write a CSR graph and its charger field as a flat binary file (atomically)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    nearest_charger, charger_distance, charger_next_hop = csr.build_charger_field()
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(CACHE_MAGIC, BYTE_ORDER_MARK, csr.vertex_count,
+                            len(csr.targets), len(csr.name_blob), digest))
+        for section in (csr.xs, csr.ys, csr.offsets, csr.weights, csr.name_offsets, charger_distance,
+                        csr.targets, nearest_charger, charger_next_hop):
+            f.write(section.tobytes() if isinstance(section, array) else bytes(section))
+            _pad(f)
+        f.write(bytes(csr.charger_mask))
+        _pad(f)
+        f.write(bytes(csr.name_blob))
+    os.replace(tmp_path, path)
+
+
+def read_cache(path, digest=None):
+    """Map a cached CSR graph into memory without parsing, None if unusable.
+
+    With digest, a cache built from a source with another SHA-256 is unusable too.
+    """
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None  # Empty file
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        return None
+    magic, order, vertex_count, lane_count, name_length, source_digest = HEADER.unpack_from(view)
+    if magic != CACHE_MAGIC or order != BYTE_ORDER_MARK:
+        return None
+    if digest is not None and digest != source_digest:
+        return None
+
+    position = HEADER.size
+    def take(fmt, count, itemsize):
+        nonlocal position
+        if position + count * itemsize > len(view):
+            raise ValueError("Truncated nav graph cache")
+        section = view[position:position + count * itemsize]
+        position += count * itemsize
+        position += -position % 8
+        return section.cast(fmt) if fmt != 'B' else section
+
+    try:
+        xs = take('d', vertex_count, 8)
+        ys = take('d', vertex_count, 8)
+        offsets = take('q', vertex_count + 1, 8)
+        weights = take('d', lane_count, 8)
+        name_offsets = take('q', vertex_count + 1, 8)
+        charger_distance = take('d', vertex_count, 8)
+        targets = take('i', lane_count, 4)
+        nearest_charger = take('i', vertex_count, 4)
+        charger_next_hop = take('i', vertex_count, 4)
+        charger_mask = take('B', (vertex_count + 7) // 8, 1)
+        name_blob = take('B', name_length, 1)
+    except ValueError:
+        return None
+    return CSRGraph(xs, ys, offsets, targets, weights, charger_mask, name_offsets, name_blob,
+                    (nearest_charger, charger_distance, charger_next_hop))
+
+
+def load_csr(json_file, level=None, use_cache=True, verify=False):
+    """Load a level as a CSRGraph, from the binary cache when the source is unchanged.
+
+    The source counts as unchanged while its size and modification time are.
+    verify also hashes the whole source and checks it against the hash the
+    cache was built from, for sources edited without a new modification time.
+    """
+    if not use_cache:
+        builder = CSRBuilder()
+        stream_level(json_file, builder, level)
+        return builder.build()
+
+    path = cache_path(json_file, level)
+    digest = file_digest(json_file) if verify else None
+    if os.path.exists(path):
+        csr = read_cache(path, digest)
+        if csr is not None:
+            return csr
+
+    builder = CSRBuilder()
+    stream_level(json_file, builder, level)
+    csr = builder.build()
+    try:
+        write_cache(path, csr, digest or file_digest(json_file))
+    except OSError as e:
+        warnings.warn(f"Could not write nav graph cache {path}: {e}", stacklevel=2)
+    return csr
@@ -1,14 +1,51 @@
-import json
-from queue import Queue
+import heapq
+import math
+from collections import OrderedDict, deque
+from src.models.csr_graph import CoordinateView, VertexDataView, AdjacencyView, LaneView, charger_field
+from src.models.map_loader import LevelCollector, load_csr, stream_level
+from src.utils.spatial_index import GridIndex
+
+ROUTE_CACHE_SIZE = 1024  # (start, end) pairs kept in the route cache
 
 class NavGraph:
-    def __init__(self, json_file):
-        with open(json_file) as f:
-            data = json.load(f)
+    def __init__(self, json_file, compact=False, use_cache=True, level=None, verify_cache=False):
+        # level selects one level of the file by name, the first level by default
+        self.level_name = level
+        if compact:
+            # Streamed from the JSON, or memory-mapped from the compiled cache
+            # (verify_cache also checks the cached source hash, see load_csr)
+            self.load_csr(load_csr(json_file, level, use_cache=use_cache, verify=verify_cache))
+        else:
+            # Only the chosen level is decoded, never the whole file
+            collector = LevelCollector()
+            self.level_name = stream_level(json_file, collector, level)
+            self.load_level(collector.level_data())
+        
+        # Nearest charger, distance and next hop for every vertex
+        self.build_charger_field()
+        
+        # LRU cache of unconstrained routes keyed on (start, end)
+        self.route_cache = OrderedDict()
+        self.route_cache_hits = 0
+        self.route_cache_misses = 0
         
-        level_name = next(iter(data['levels']))
-        level_data = data['levels'][level_name]
+        # Charger lookups answered by the charger field vs. searched around a blockage
+        self.charger_field_hits = 0
+        self.charger_field_fallbacks = 0
         
+        # Calculate bounds for scaling
+        self.min_x = min(v[0] for v in self.vertices)
+        self.max_x = max(v[0] for v in self.vertices)
+        self.min_y = min(v[1] for v in self.vertices)
+        self.max_y = max(v[1] for v in self.vertices)
+        
+        # Grid over vertex coordinates for point queries, built on first use
+        self.spatial_index = None
+        self.longest_lane_length = None
+    
+    def load_level(self, level_data):
+        """Build the list/dict representation used for small maps"""
+        self.csr = None
         self.vertices = []
         self.vertex_data = []
         self.chargers = []
@@ -37,76 +74,261 @@ class NavGraph:
         for v1, v2 in self.lanes:
             self.adjacency[v1].append(v2)
         
-        # Calculate bounds for scaling
-        self.min_x = min(v[0] for v in self.vertices)
-        self.max_x = max(v[0] for v in self.vertices)
-        self.min_y = min(v[1] for v in self.vertices)
-        self.max_y = max(v[1] for v in self.vertices)
+        # Neighbours paired with lane lengths for the weighted searches
+        self.weighted_adjacency = {
+            v: [(n, self.distance(v, n)) for n in neighbors]
+            for v, neighbors in self.adjacency.items()
+        }
+    
+    def load_csr(self, csr):
+        """Expose a compressed-sparse-row graph through the usual attributes"""
+        self.csr = csr
+        self.vertices = CoordinateView(csr)
+        self.vertex_data = VertexDataView(csr)
+        self.chargers = csr.chargers()
+        self.lanes = LaneView(csr)
+        self.adjacency = AdjacencyView(csr)
+        self.weighted_adjacency = AdjacencyView(csr, weighted=True)
     
     def get_vertex_name(self, idx):
+        if self.csr is not None:
+            return self.csr.get_name(idx)
         return self.vertex_data[idx]['name']
     
     def is_charger(self, idx):
+        if self.csr is not None:
+            return self.csr.is_charger(idx)
         return self.vertex_data[idx]['is_charger']
     
+    def distance(self, v1, v2):
+        """Euclidean distance between two vertices"""
+        x1, y1 = self.vertices[v1]
+        x2, y2 = self.vertices[v2]
+        return math.hypot(x2 - x1, y2 - y1)
+    
+    def vertex_index(self):
+        """Spatial grid index of the vertices (keys are vertex indices)"""
+        if self.spatial_index is None:
+            self.spatial_index = GridIndex.from_points(self.vertices)
+        return self.spatial_index
+    
+    def nearest_vertex(self, x, y, max_distance=None):
+        """Vertex closest to map point (x, y), or None if none is within max_distance"""
+        return self.vertex_index().nearest(x, y, max_distance)
+    
+    def vertices_within(self, x, y, radius):
+        """Vertices within radius of map point (x, y), nearest first"""
+        return self.vertex_index().within(x, y, radius)
+    
+    def vertices_in_box(self, min_x, min_y, max_x, max_y):
+        """Vertices inside an axis-aligned map rectangle, e.g. the visible part of the map"""
+        return self.vertex_index().in_box(min_x, min_y, max_x, max_y)
+    
+    def longest_lane(self):
+        """Length of the longest lane (cached)"""
+        if self.longest_lane_length is None:
+            self.longest_lane_length = max(
+                (self.distance(v1, v2) for v1, v2 in self.lanes if v1 < v2), default=0.0
+            )
+        return self.longest_lane_length
+    
+    def path_length(self, path):
+        """Total lane length along a path"""
+        return sum(self.distance(path[i], path[i+1]) for i in range(len(path) - 1))
+    
+    def _build_path(self, parents, end):
+        """Walk parent pointers back from end to the search root"""
+        path = [end]
+        while parents[path[-1]] is not None:
+            path.append(parents[path[-1]])
+        path.reverse()
+        return path
+    
+    def route_cache_info(self):
+        """Hit/miss counters and size of the route cache"""
+        return {
+            'hits': self.route_cache_hits,
+            'misses': self.route_cache_misses,
+            'size': len(self.route_cache),
+            'max_size': ROUTE_CACHE_SIZE
+        }
+    
+    def is_path_blocked(self, path, blocked_lanes=None, blocked_vertices=None):
+        """Check whether a path enters a blocked vertex or uses a blocked lane"""
+        if blocked_vertices is not None:
+            for vertex in path[1:]:
+                if vertex in blocked_vertices:
+                    return True
+        if blocked_lanes is not None:
+            symmetric = getattr(blocked_lanes, 'symmetric', False)
+            for i in range(len(path) - 1):
+                if (path[i], path[i+1]) in blocked_lanes or \
+                        (not symmetric and (path[i+1], path[i]) in blocked_lanes):
+                    return True
+        return False
+    
     def find_shortest_path(self, start, end, blocked_lanes=None, blocked_vertices=None):
-        """Find shortest path using BFS, avoiding blocked lanes and vertices"""
+        """Find shortest path, serving it from the route cache when nothing on it is blocked"""
         if start == end:
             return [start]
         
-        blocked_lanes = blocked_lanes or set()
-        blocked_vertices = blocked_vertices or set()
+        key = (start, end)
+        if key in self.route_cache:
+            self.route_cache.move_to_end(key)
+            path = self.route_cache[key]
+        else:
+            path = self._a_star(start, end)
+            self.route_cache[key] = path
+            if len(self.route_cache) > ROUTE_CACHE_SIZE:
+                self.route_cache.popitem(last=False)
+            self.route_cache_misses += 1
+            if path is None or not self.is_path_blocked(path, blocked_lanes, blocked_vertices):
+                return list(path) if path else None
+            return self._a_star(start, end, blocked_lanes, blocked_vertices)
+        
+        # Blocking only removes options, so an unreachable target stays unreachable
+        if path is None:
+            self.route_cache_hits += 1
+            return None
+        if not self.is_path_blocked(path, blocked_lanes, blocked_vertices):
+            self.route_cache_hits += 1
+            return list(path)  # Robots consume their path, so hand out a copy
+        
+        self.route_cache_misses += 1
+        return self._a_star(start, end, blocked_lanes, blocked_vertices)
+    
+    def _a_star(self, start, end, blocked_lanes=None, blocked_vertices=None):
+        """Find shortest path using A*, avoiding blocked lanes and vertices"""
+        if start == end:
+            return [start]
+        
+        blocked_lanes = blocked_lanes if blocked_lanes is not None else set()
+        blocked_vertices = blocked_vertices if blocked_vertices is not None else set()
+        # Occupancy views answer for both lane orientations in one lookup
+        symmetric = getattr(blocked_lanes, 'symmetric', False)
+        # Nothing can reach a blocked target, so spare the search of everything reachable
+        if end in blocked_vertices:
+            return None
+        
+        goal_x, goal_y = self.vertices[end]
+        def heuristic(v):
+            x, y = self.vertices[v]
+            return math.hypot(goal_x - x, goal_y - y)
         
-        visited = {start}
-        queue = Queue()
-        queue.put((start, [start]))
+        parents = {start: None}
+        costs = {start: 0.0}
+        heap = [(heuristic(start), 0.0, start)]
         
-        while not queue.empty():
-            current, path = queue.get()
+        while heap:
+            _, cost, current = heapq.heappop(heap)
+            if current == end:
+                return self._build_path(parents, end)
+            if cost > costs[current]:
+                continue  # Stale heap entry
             
-            for neighbor in self.adjacency[current]:
+            for neighbor, weight in self.weighted_adjacency[current]:
                 # Skip blocked lanes and vertices
-                if (current, neighbor) in blocked_lanes or (neighbor, current) in blocked_lanes:
+                if (current, neighbor) in blocked_lanes or \
+                        (not symmetric and (neighbor, current) in blocked_lanes):
                     continue
                 if neighbor in blocked_vertices:
                     continue
                 
-                if neighbor == end:
-                    return path + [neighbor]
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    queue.put((neighbor, path + [neighbor]))
+                new_cost = cost + weight
+                if new_cost < costs.get(neighbor, math.inf):
+                    costs[neighbor] = new_cost
+                    parents[neighbor] = current
+                    heapq.heappush(heap, (new_cost + heuristic(neighbor), new_cost, neighbor))
         
         return None  # No path found
     
+    def hop_counts(self, source):
+        """Breadth-first lane hops from source: {vertex: hops} for every reachable vertex"""
+        hops = {source: 0}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            for neighbor in self.adjacency[current]:
+                if neighbor not in hops:
+                    hops[neighbor] = hops[current] + 1
+                    queue.append(neighbor)
+        return hops
+    
+    def build_charger_field(self):
+        """Nearest charger, distance and next hop for every vertex (see charger_field)"""
+        if self.csr is not None:
+            # Read from the map cache when the level came from it
+            field = self.csr.build_charger_field()
+        else:
+            field = charger_field(len(self.vertices), self.chargers, self.weighted_adjacency)
+        self.nearest_charger, self.charger_distance, self.charger_next_hop = field
+    
+    def charger_route(self, start):
+        """Precomputed route from start to its nearest charger (None if unreachable)"""
+        if self.nearest_charger[start] < 0:
+            return None
+        path = [start]
+        while self.charger_next_hop[path[-1]] >= 0:
+            path.append(self.charger_next_hop[path[-1]])
+        return path
+    
     def find_nearest_charger(self, start, blocked_lanes=None, blocked_vertices=None):
-        """Find the nearest charger with a valid path"""
-        blocked_lanes = blocked_lanes or set()
-        blocked_vertices = blocked_vertices or set()
+        """Find the nearest charger with a valid path, using the charger field when it is clear.
         
-        # BFS to find nearest charger
-        visited = {start}
-        queue = Queue()
-        queue.put((start, [start]))
+        The field is built once for the empty map and is not updated as lanes
+        block and free up: blocked sets are per robot (another robot's
+        occupancy), not a property of the map. A blocked stored route falls
+        back to a Dijkstra search around the blockage. Fleet robots find
+        chargers through the ChargingScheduler instead, so the fallback
+        only serves robots running without one; charger_field_fallbacks
+        counts it.
+        """
+        path = self.charger_route(start)
+        if path is None:
+            return None, None
         
-        while not queue.empty():
-            current, path = queue.get()
+        charger = path[-1]
+        if not (blocked_vertices is not None and charger in blocked_vertices) and \
+                not self.is_path_blocked(path, blocked_lanes, blocked_vertices):
+            self.charger_field_hits += 1
+            return charger, path
+        
+        # Stored route is blocked, search around the blockage
+        self.charger_field_fallbacks += 1
+        return self._dijkstra_nearest_charger(start, blocked_lanes, blocked_vertices)
+    
+    def _dijkstra_nearest_charger(self, start, blocked_lanes=None, blocked_vertices=None):
+        """Find the nearest charger with a valid path using Dijkstra"""
+        blocked_lanes = blocked_lanes if blocked_lanes is not None else set()
+        blocked_vertices = blocked_vertices if blocked_vertices is not None else set()
+        # Occupancy views answer for both lane orientations in one lookup
+        symmetric = getattr(blocked_lanes, 'symmetric', False)
+        
+        parents = {start: None}
+        costs = {start: 0.0}
+        heap = [(0.0, start)]
+        
+        while heap:
+            cost, current = heapq.heappop(heap)
+            if cost > costs[current]:
+                continue  # Stale heap entry
             
-            # Check if current vertex is a charger (and not blocked)
-            if (self.is_charger(current) and 
-                current not in blocked_vertices and
-                not any((path[i], path[i+1]) in blocked_lanes for i in range(len(path)-1))):
-                return current, path
+            # Lanes are checked on expansion, so the first charger popped has a clear path
+            if self.is_charger(current) and current not in blocked_vertices:
+                return current, self._build_path(parents, current)
             
-            for neighbor in self.adjacency[current]:
+            for neighbor, weight in self.weighted_adjacency[current]:
                 # Skip blocked lanes and vertices
-                if (current, neighbor) in blocked_lanes or (neighbor, current) in blocked_lanes:
+                if (current, neighbor) in blocked_lanes or \
+                        (not symmetric and (neighbor, current) in blocked_lanes):
                     continue
                 if neighbor in blocked_vertices:
                     continue
                 
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    queue.put((neighbor, path + [neighbor]))
+                new_cost = cost + weight
+                if new_cost < costs.get(neighbor, math.inf):
+                    costs[neighbor] = new_cost
+                    parents[neighbor] = current
+                    heapq.heappush(heap, (new_cost, neighbor))
         
-        return None, None  # No charger found
\ No newline at end of file
+        return None, None  # No charger found
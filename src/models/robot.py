@@ -1,5 +1,6 @@
-import time
-from datetime import datetime
+from collections import deque
+from src.models.fleet_state import FleetState, STATUSES, STATUS_CODES
+from src.utils.clock import WallClock
 
 # Constants
 ROBOT_COLORS = ['red', 'blue', 'green', 'purple', 'orange', 'cyan', 'magenta', 'yellow']
@@ -12,40 +13,130 @@ CRITICAL_BATTERY = 5
 CHARGE_COMPLETE_THRESHOLD = 95
 MAX_PATH_RETRIES = 3  # Maximum attempts to find an alternative path
 EMERGENCY_PATH_ATTEMPTS = 5  # Attempts to find path to any charger
+MAX_BACKOFF_CHAIN = 8  # Robots a deadlocked robot may push back to reach a free vertex
+
+def lane_updates(speed=ROBOT_SPEED):
+    """Updates a robot spends crossing one lane.
+    
+    Progress is summed in floating point, so this can be one more than 1 / speed
+    (ten steps of 0.1 add up to just under 1).
+    """
+    progress, updates = 0, 0
+    while progress < 1:
+        progress += speed
+        updates += 1
+    return updates
+
+def _state_field(name, convert=None):
+    """Robot attribute stored in the robot's FleetState slot"""
+    def getter(self):
+        value = getattr(self.state, name)[self.slot]
+        return value if convert is None else convert(value)
+    def setter(self, value):
+        getattr(self.state, name)[self.slot] = value
+    return property(getter, setter)
 
 class Robot:
-    def __init__(self, robot_id, start_vertex, nav_graph):
+    # Fixed attribute set keeps each of thousands of robot records small
+    __slots__ = (
+        'state', 'slot', 'registry', 'charging_scheduler', 'energy_planner', 'id', 'clock', 'event_log',
+        'color', 'nav_graph', 'target_vertex', 'resume_target', 'path', 'wait_until', 'log_queue',
+        'waiting_reason', 'path_attempts', 'emergency_path_attempts'
+    )
+    
+    progress = _state_field('progress')
+    battery = _state_field('battery')
+    emergency_charge_requested = _state_field('emergency', bool)
+    in_flight = _state_field('in_flight', bool)  # Lane and next vertex reserved, only progress changes
+    
+    def __init__(self, robot_id, start_vertex, nav_graph, clock=None, event_log=None, state=None,
+                 registry=None, charging_scheduler=None, energy_planner=None):
+        # Per-tick state lives in a (usually fleet-wide) struct-of-arrays store
+        self.state = state if state is not None else FleetState(1)
+        self.slot = self.state.allocate()
+        self.registry = registry  # Kept informed of vertex changes for its vertex index
+        self.charging_scheduler = charging_scheduler  # Picks and reserves chargers when set
+        self.energy_planner = energy_planner  # Adds charging stops to tasks the battery cannot cover
         self.id = robot_id
+        self.clock = clock or WallClock()
+        self.event_log = event_log
         self.color = ROBOT_COLORS[robot_id % len(ROBOT_COLORS)]
         self.nav_graph = nav_graph
         self.current_vertex = start_vertex
         self.target_vertex = None
+        self.resume_target = None  # Task target to continue to after a charging stop
         self.path = []
         self.status = "idle"
         self.progress = 0
         self.current_lane = None
         self.wait_until = 0
-        self.log_queue = []
+        self.log_queue = deque()  # Raw records, only used when there is no event log
         self.battery = 100  # Start with full battery
         self.emergency_charge_requested = False
-        self.charge_progress = 0  # For charging animation
         self.waiting_reason = ""  # Track why robot is waiting
         self.path_attempts = 0    # Track attempts to find alternative paths
         self.emergency_path_attempts = 0  # Track attempts to find emergency paths
         
-        self.log(f"Robot {self.id} spawned at {self.nav_graph.get_vertex_name(start_vertex)}")
+        self.log("Robot %s spawned at %s", self.id, self.nav_graph.get_vertex_name(start_vertex))
 
+    @property
+    def status(self):
+        return STATUSES[self.state.status[self.slot]]
+    
+    @status.setter
+    def status(self, value):
+        self.state.status[self.slot] = STATUS_CODES[value]
+    
+    @property
+    def current_vertex(self):
+        return self.state.current_vertex[self.slot]
+    
+    @current_vertex.setter
+    def current_vertex(self, vertex):
+        if self.registry is not None:
+            self.registry.move(self, vertex)
+        self.state.current_vertex[self.slot] = vertex
+    
+    @property
+    def current_lane(self):
+        v1 = self.state.lane_from[self.slot]
+        if v1 < 0:
+            return None
+        return (v1, self.state.lane_to[self.slot])
+    
+    @current_lane.setter
+    def current_lane(self, lane):
+        v1, v2 = lane if lane is not None else (-1, -1)
+        self.state.lane_from[self.slot] = v1
+        self.state.lane_to[self.slot] = v2
+        self.state.in_flight[self.slot] = 0
+    
+    @property
+    def charge_progress(self):
+        """Charging animation progress in %"""
+        if self.status != "charging":
+            return 0
+        return (self.battery / CHARGE_COMPLETE_THRESHOLD) * 100
+    
     def decrease_battery(self, amount):
         """Manually reduce battery level for testing"""
         self.battery = max(0, self.battery - amount)
         if self.battery <= LOW_BATTERY_THRESHOLD and not self.emergency_charge_requested:
-            self.log(f"Battery manually reduced to {self.battery}%")
+            self.log("Battery manually reduced to %s%%", self.battery)
+    
+    def wake(self):
+        """End a wait early because the resource the robot waited for was released"""
+        if self.status == "waiting":
+            self.wait_until = 0
     
-    def log(self, message):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.log_queue.append(f"{timestamp} - {message}")
+    def log(self, message, *args):
+        # Formatting is deferred to the event log writer
+        if self.event_log is not None:
+            self.event_log.emit(self.clock.time(), self.id, message, args)
+        else:
+            self.log_queue.append((self.clock.time(), message, args))
     
-    def assign_task(self, target_vertex):
+    def assign_task(self, target_vertex, traffic_manager=None):
         if self.status == "charging":
             return False, "Robot is currently charging"
         if self.battery <= CRITICAL_BATTERY:
@@ -53,23 +144,94 @@ class Robot:
             
         if target_vertex == self.current_vertex:
             return False, "Robot is already at target location"
+        
+        # Check the battery covers the trip, or stop at a charger on the way
+        resume_target = None
+        hops = None
+        if self.energy_planner is not None:
+            # The cooperative planner's hop table prices the trip without route searches
+            hops = None if traffic_manager is None else traffic_manager.hops_to(self.nav_graph, target_vertex)
+            feasible, charger = self.energy_planner.plan(self, target_vertex, hops)
+            if not feasible:
+                return False, f"Not enough battery ({self.battery}%) to reach target, even via a charger"
+            if charger is not None:
+                resume_target, target_vertex = target_vertex, charger
+                if charger == self.current_vertex:
+                    return self.charge_before(resume_target)
             
-        path = self.nav_graph.find_shortest_path(self.current_vertex, target_vertex)
-        if not path:
-            return False, "No valid path to target"
+        path, message = self.book_path(target_vertex, traffic_manager)
+        if path is None and resume_target is None and message != "No valid path to target":
+            # The plan priced the fewest lanes, but every route booked was longer: charge first
+            charger = self.energy_planner.charging_stop(self, target_vertex, hops)
+            if charger is not None:
+                resume_target, target_vertex = target_vertex, charger
+                if charger == self.current_vertex:
+                    return self.charge_before(resume_target)
+                path, message = self.book_path(target_vertex, traffic_manager)
+        if path is None:
+            return False, message
             
         self.target_vertex = target_vertex
+        self.resume_target = resume_target
         self.path = path
         self.status = "moving"
         self.progress = 0
         self.current_lane = None
-        self.emergency_charge_requested = False
+        # A charging stop is a planned charge, so low battery on the way needs no emergency
+        self.emergency_charge_requested = resume_target is not None
         self.path_attempts = 0
         self.emergency_path_attempts = 0
+        if self.charging_scheduler is not None:
+            if resume_target is not None:
+                self.charging_scheduler.hold(self.id, target_vertex)
+            else:
+                self.charging_scheduler.release(self.id, keep=target_vertex)
         
-        self.log(f"Assigned task: move to {self.nav_graph.get_vertex_name(target_vertex)}")
+        if resume_target is not None:
+            self.log("Assigned task: move to %s, charging at %s on the way",
+                     self.nav_graph.get_vertex_name(resume_target), self.nav_graph.get_vertex_name(target_vertex))
+            return True, "Task assigned with a charging stop"
+        self.log("Assigned task: move to %s", self.nav_graph.get_vertex_name(target_vertex))
         return True, "Task assigned successfully"
 
+    def book_path(self, target_vertex, traffic_manager=None):
+        """Path to target_vertex the battery covers: (path, message), path None if there is none.
+        
+        A booked cooperative plan comes first. Its waits are free but its detours
+        around other robots are not, so if the battery cannot cover it the
+        shortest route is tried instead.
+        """
+        if traffic_manager is not None:
+            path = traffic_manager.plan_cooperative_path(
+                self.nav_graph, self.id, self.current_vertex, target_vertex
+            )
+            if path and self.can_afford(path, target_vertex, traffic_manager):
+                return path, None
+            if path:
+                traffic_manager.release_reservations(self.id)
+        route = self.nav_graph.find_shortest_path(self.current_vertex, target_vertex)
+        if not route:
+            return None, "No valid path to target"
+        # Routes start at the current vertex, robot paths (like cooperative plans) do not
+        if not self.can_afford(route[1:], target_vertex, traffic_manager):
+            return None, f"Not enough battery ({self.battery}%) for the route to target"
+        return route[1:], None
+    
+    def can_afford(self, path, target_vertex, traffic_manager=None):
+        """Whether the battery covers path and the rest of the way to target_vertex"""
+        if self.energy_planner is None:
+            return True
+        hops = None if traffic_manager is None else traffic_manager.hops_to(self.nav_graph, target_vertex)
+        return self.energy_planner.is_booked_feasible(self.battery, self.current_vertex, path, target_vertex, hops)
+    
+    def charge_before(self, resume_target):
+        """Charge at the charger the robot is standing on, then carry on to resume_target"""
+        self.resume_target = resume_target
+        if self.charging_scheduler is not None:
+            self.charging_scheduler.hold(self.id, self.current_vertex)
+        self.start_charging()
+        return True, "Charging before the task"
+
     def find_alternative_path(self, traffic_manager):
         """Find an alternative path avoiding blocked lanes and vertices"""
         blocked_lanes = traffic_manager.get_blocked_lanes_for_robot(self.id)
@@ -85,11 +247,16 @@ class Robot:
             blocked_lanes,
             blocked_vertices
         )
+        # A detour the battery cannot cover is worse than waiting
+        if new_path and self.energy_planner is not None and \
+                not self.energy_planner.is_feasible(self.battery, new_path):
+            new_path = None
         
         if new_path:
-            self.path = new_path
+            traffic_manager.release_reservations(self.id)
+            self.path = new_path[1:]
             self.path_attempts += 1
-            self.log(f"Found alternative path (attempt {self.path_attempts}) to {self.nav_graph.get_vertex_name(self.target_vertex)}")
+            self.log("Found alternative path (attempt %s) to %s", self.path_attempts, self.nav_graph.get_vertex_name(self.target_vertex))
             return True
         return False
 
@@ -101,19 +268,14 @@ class Robot:
             self.nav_graph.is_charger(self.current_vertex)):
             
             self.status = "charging"
-            self.charge_progress = 0
-            self.log(f"Started charging at {self.nav_graph.get_vertex_name(self.current_vertex)}")
+            self.log("Started charging at %s", self.nav_graph.get_vertex_name(self.current_vertex))
             return
 
         # Handle ongoing charging process
         if self.status == "charging":
             self.battery = min(100, self.battery + BATTERY_CHARGE_RATE)
-            self.charge_progress = (self.battery / CHARGE_COMPLETE_THRESHOLD) * 100
-            
             if self.battery >= CHARGE_COMPLETE_THRESHOLD:
-                self.status = "idle"
-                self.charge_progress = 0
-                self.log(f"Charging complete at {self.nav_graph.get_vertex_name(self.current_vertex)} (Battery: {self.battery}%)")
+                self.finish_charging()
             return
 
         # Automatic emergency charging for low battery
@@ -124,7 +286,7 @@ class Robot:
         # Safety check for critical battery
         if self.battery <= CRITICAL_BATTERY and self.status != "disabled":
             self.status = "disabled"
-            self.log(f"Robot disabled due to critical battery ({self.battery}%)")
+            self.log("Robot disabled due to critical battery (%s%%)", self.battery)
             return
 
         # State checks for non-moving robots
@@ -133,23 +295,34 @@ class Robot:
 
         # Handle waiting state
         if self.status == "waiting":
-            if time.time() > self.wait_until:
+            if traffic_manager.is_deadlock_victim(self.id):
+                self.resolve_deadlock(traffic_manager)
+            elif self.clock.time() > self.wait_until:
                 self.status = "moving"
                 traffic_manager.remove_waiting_robot(self.current_vertex, self.id)
-                self.log(f"Resumed moving after waiting at {self.nav_graph.get_vertex_name(self.current_vertex)}")
+                self.log("Resumed moving after waiting at %s", self.nav_graph.get_vertex_name(self.current_vertex))
             return
 
         # Handle path completion
         if not self.path:
             if self.current_vertex == self.target_vertex:
-                self.status = "complete"
-                self.log(f"Task completed at {self.nav_graph.get_vertex_name(self.current_vertex)}")
+                self.arrive(traffic_manager)
+            elif self.target_vertex is not None and self.plan_next_window(traffic_manager):
+                return
             else:
                 self.status = "idle"
             return
 
         # Normal movement processing
         next_vertex = self.path[0]
+        if self.current_lane is None:
+            if traffic_manager.is_deadlock_victim(self.id):
+                self.resolve_deadlock(traffic_manager)
+                return
+            # A planned wait in place is still a wait on whoever holds the way ahead
+            traffic_manager.wait_for(
+                self.id, self.blocking_vertex(traffic_manager) if next_vertex == self.current_vertex else None
+            )
         
         # Check vertex occupancy before moving
         if traffic_manager.is_vertex_occupied(next_vertex, self.id):
@@ -164,26 +337,28 @@ class Robot:
             
             # If no alternative path found, wait
             self.status = "waiting"
-            self.wait_until = time.time() + ROBOT_WAIT_TIME
-            traffic_manager.add_waiting_robot(self.current_vertex, self.id)
-            traffic_manager.add_conflict(f"Robot {self.id} waiting at vertex {self.current_vertex}")
-            self.log(f"Waiting at {self.nav_graph.get_vertex_name(self.current_vertex)} due to vertex conflict")
+            self.wait_until = self.clock.time() + ROBOT_WAIT_TIME
+            traffic_manager.add_waiting_robot(self.current_vertex, self.id, blocked_vertex=next_vertex)
+            traffic_manager.add_conflict(f"Robot {self.id} waiting at vertex {self.current_vertex}", "vertex_wait")
+            self.log("Waiting at %s due to vertex conflict", self.nav_graph.get_vertex_name(self.current_vertex))
             return
             
         if self.current_lane is None:
             self.current_lane = (self.current_vertex, next_vertex)
-            # Battery drain only when starting new movement segment
-            self.battery = max(0, self.battery - BATTERY_DRAIN_RATE)
+            # Battery drain only when starting new movement segment (waiting in place is free)
+            if next_vertex != self.current_vertex:
+                self.battery = max(0, self.battery - BATTERY_DRAIN_RATE)
             if self.battery <= LOW_BATTERY_THRESHOLD and not self.emergency_charge_requested:
-                traffic_manager.add_conflict(f"Robot {self.id} low battery! ({self.battery}%)")
+                traffic_manager.add_conflict(f"Robot {self.id} low battery! ({self.battery}%)", "low_battery")
             if self.battery <= CRITICAL_BATTERY:
                 self.status = "disabled"
-                self.log(f"Robot disabled due to critical battery ({self.battery}%)")
+                self.log("Robot disabled due to critical battery (%s%%)", self.battery)
                 return
-            self.log(f"Started moving from {self.nav_graph.get_vertex_name(self.current_vertex)} to {self.nav_graph.get_vertex_name(next_vertex)} (Battery: {self.battery}%)")
+            self.log("Started moving from %s to %s (Battery: %s%%)", self.nav_graph.get_vertex_name(self.current_vertex), self.nav_graph.get_vertex_name(next_vertex), self.battery)
         
-        # Handle lane occupancy
-        if traffic_manager.is_lane_occupied(self.current_lane, self.id):
+        # Check and reserve the lane and the next vertex in one atomic step
+        reserved, blocked_by = traffic_manager.try_reserve_move(self.current_lane, next_vertex, self.id)
+        if not reserved:
             # For emergency charging, try harder to find alternative paths
             if self.emergency_charge_requested and self.emergency_path_attempts < EMERGENCY_PATH_ATTEMPTS:
                 if self.find_alternative_emergency_path(traffic_manager):
@@ -195,32 +370,194 @@ class Robot:
             
             # If no alternative path found, wait
             self.status = "waiting"
-            self.wait_until = time.time() + ROBOT_WAIT_TIME
-            traffic_manager.add_waiting_robot(self.current_vertex, self.id)
-            traffic_manager.add_conflict(f"Robot {self.id} waiting on lane {self.current_lane}")
-            self.log(f"Waiting at {self.nav_graph.get_vertex_name(self.current_vertex)} due to lane conflict")
+            self.wait_until = self.clock.time() + ROBOT_WAIT_TIME
+            if blocked_by == "lane":
+                traffic_manager.add_waiting_robot(self.current_vertex, self.id, blocked_lane=self.current_lane)
+                traffic_manager.add_conflict(f"Robot {self.id} waiting on lane {self.current_lane}", "lane_wait")
+            else:
+                traffic_manager.add_waiting_robot(self.current_vertex, self.id, blocked_vertex=next_vertex)
+                traffic_manager.add_conflict(f"Robot {self.id} waiting at vertex {self.current_vertex}", "vertex_wait")
+            self.log("Waiting at %s due to %s conflict", self.nav_graph.get_vertex_name(self.current_vertex), blocked_by)
             return
         
-        # Reserve resources and move
-        traffic_manager.reserve_lane(self.current_lane, self.id)
-        traffic_manager.reserve_vertex(next_vertex, self.id)
-        
+        self.in_flight = True
         self.progress += ROBOT_SPEED
         if self.progress >= 1:
-            self.progress = 0
+            self.finish_lane(traffic_manager)
+
+    def blocking_vertex(self, traffic_manager):
+        """Next vertex towards the target, if another robot is standing on it"""
+        ahead = next((vertex for vertex in self.path if vertex != self.current_vertex), None)
+        if ahead is None and self.target_vertex is not None:
+            route = self.nav_graph.find_shortest_path(self.current_vertex, self.target_vertex)
+            ahead = route[1] if route and len(route) > 1 else None
+        if ahead is not None and traffic_manager.is_vertex_occupied(ahead, self.id):
+            return ahead
+        return None
+
+    def resolve_deadlock(self, traffic_manager):
+        """Break a wait-for cycle this robot was picked for: turn away, or back off"""
+        if self.battery <= LOW_BATTERY_THRESHOLD and traffic_manager.defer_deadlock(self.id):
+            return  # Every % is needed to reach a charger, let the others give way first
+        wanted = next((vertex for vertex in self.path if vertex != self.current_vertex), None)
+        traffic_manager.remove_waiting_robot(self.current_vertex, self.id)
+        # The lane chosen before waiting is abandoned either way
+        self.current_lane = None
+        
+        # Route around every robot in the way, and only if the first step can be taken now
+        if self.target_vertex is not None and wanted is not None:
+            blocked_lanes = traffic_manager.get_blocked_lanes_for_robot(self.id)
+            blocked_vertices = set(traffic_manager.get_blocked_vertices_for_robot(self.id))
+            blocked_vertices.add(wanted)
+            path = self.nav_graph.find_shortest_path(self.current_vertex, self.target_vertex,
+                                                     blocked_lanes, blocked_vertices)
+            if path and len(path) > 1 and (self.current_vertex, path[1]) not in blocked_lanes and \
+                    not traffic_manager.is_vertex_occupied(path[1], self.id) and \
+                    (self.energy_planner is None or self.energy_planner.is_feasible(self.battery, path)):
+                traffic_manager.release_reservations(self.id)
+                self.path = path[1:]
+                self.status = "moving"
+                traffic_manager.report_deadlock_resolution(self.id, "reroute")
+                self.log("Rerouted around %s to break a deadlock", self.nav_graph.get_vertex_name(wanted))
+                return
+        
+        # Back off towards the nearest free vertex, pushing the robots in between
+        # back with it, and plan again from there
+        chain = self.backoff_chain(traffic_manager, wanted)
+        if chain:
+            traffic_manager.release_reservations(self.id)
+            # The robot next to the free vertex goes first, the others follow as vertices free up
+            for i in range(len(chain) - 2, 0, -1):
+                self.registry.robot_at(chain[i]).make_way(chain[i + 1], traffic_manager)
+            self.path = [chain[1]]
+            self.status = "moving"
+            traffic_manager.report_deadlock_resolution(self.id, "backoff")
+            self.log("Backing off to %s to break a deadlock (%s robots pushed back)",
+                     self.nav_graph.get_vertex_name(chain[1]), len(chain) - 2)
+            return
+        
+        # Stay put; another robot of the cycle gets its turn
+        if self.status == "waiting":
+            self.wait_until = self.clock.time() + ROBOT_WAIT_TIME
+            traffic_manager.add_waiting_robot(self.current_vertex, self.id,
+                                              blocked_vertex=self.path[0] if self.path else None)
+        traffic_manager.report_deadlock_resolution(self.id, None)
+
+    def backoff_chain(self, traffic_manager, wanted):
+        """Vertices from here to the nearest free vertex, away from wanted, or None.
+        
+        The vertices in between hold robots standing still that can step one
+        vertex further along (see make_way), at most MAX_BACKOFF_CHAIN of them.
+        """
+        if self.battery - BATTERY_DRAIN_RATE <= CRITICAL_BATTERY:
+            return None
+        blocked_lanes = traffic_manager.get_blocked_lanes_for_robot(self.id)
+        parents = {self.current_vertex: None}
+        depth = {self.current_vertex: 0}
+        queue = deque([self.current_vertex])
+        while queue:
+            current = queue.popleft()
+            # Free vertices nobody is waiting for first
+            neighbors = sorted(self.nav_graph.adjacency[current], key=traffic_manager.has_waiters)
+            for neighbor in neighbors:
+                if neighbor in parents or neighbor == wanted or (current, neighbor) in blocked_lanes:
+                    continue
+                parents[neighbor] = current
+                if not traffic_manager.is_vertex_occupied(neighbor, self.id):
+                    chain = [neighbor]
+                    while parents[chain[-1]] is not None:
+                        chain.append(parents[chain[-1]])
+                    chain.reverse()
+                    return chain
+                if depth[current] < MAX_BACKOFF_CHAIN and self.registry is not None:
+                    robot = self.registry.robot_at(neighbor)
+                    if robot is not None and robot.can_make_way():
+                        depth[neighbor] = depth[current] + 1
+                        queue.append(neighbor)
+        return None
+
+    def can_make_way(self):
+        """True if the robot stands still and can step aside for a deadlocked robot"""
+        return self.status in ("idle", "complete", "moving", "waiting") and not self.in_flight and \
+            self.battery > LOW_BATTERY_THRESHOLD
+
+    def make_way(self, vertex, traffic_manager):
+        """Step to the neighbouring vertex so a deadlocked robot can back off, then carry on"""
+        traffic_manager.remove_waiting_robot(self.current_vertex, self.id)
+        traffic_manager.release_reservations(self.id)
+        self.current_lane = None
+        if self.status in ("idle", "complete") or self.target_vertex is None:
+            self.target_vertex = vertex  # Park there
+        self.path = [vertex]
+        self.status = "moving"
+        traffic_manager.wake_robot(self.id)
+        self.log("Making way to %s for a deadlocked robot", self.nav_graph.get_vertex_name(vertex))
+
+    def finish_lane(self, traffic_manager):
+        """Arrive at the end of the current lane"""
+        next_vertex = self.path[0]
+        self.progress = 0
+        if next_vertex != self.current_vertex:  # A wait in place keeps its vertex
             traffic_manager.release_vertex(self.current_vertex, self.id)
-            self.current_vertex = next_vertex
-            self.path.pop(0)
-            traffic_manager.release_lane(self.current_lane, self.id)
-            self.current_lane = None
-            self.waiting_reason = ""
-            self.path_attempts = 0  # Reset attempts when we successfully move
-            self.emergency_path_attempts = 0
-            
-            # Final destination check
-            if not self.path and self.current_vertex == self.target_vertex:
-                self.status = "complete"
-                self.log(f"Task completed at {self.nav_graph.get_vertex_name(self.current_vertex)}")
+        self.current_vertex = next_vertex
+        self.path.pop(0)
+        traffic_manager.release_lane(self.current_lane, self.id)
+        self.current_lane = None
+        self.waiting_reason = ""
+        self.path_attempts = 0  # Reset attempts when we successfully move
+        self.emergency_path_attempts = 0
+        
+        # Final destination check
+        if not self.path and self.current_vertex == self.target_vertex:
+            self.arrive(traffic_manager)
+
+    def arrive(self, traffic_manager):
+        """End the trip at target_vertex: charge at a charger the robot reserved, else complete"""
+        traffic_manager.release_reservations(self.id)
+        if self.charging_scheduler is not None and \
+                self.charging_scheduler.robot_chargers.get(self.id) == self.current_vertex:
+            self.start_charging()
+            return
+        self.status = "complete"
+        self.log("Task completed at %s", self.nav_graph.get_vertex_name(self.current_vertex))
+
+    def start_charging(self):
+        """Charge at the charger the robot is standing on"""
+        self.target_vertex = self.current_vertex
+        self.path = []
+        self.status = "charging"
+        self.log("Started charging at %s", self.nav_graph.get_vertex_name(self.current_vertex))
+    
+    def finish_charging(self):
+        if self.charging_scheduler is not None:
+            self.charging_scheduler.release(self.id)
+        if self.resume_target is None:
+            self.status = "idle"
+            self.log("Charging complete at %s (Battery: %s%%)", self.nav_graph.get_vertex_name(self.current_vertex), self.battery)
+            return
+        
+        # Continue the interrupted task; the next update plans the route
+        self.target_vertex = self.resume_target
+        self.resume_target = None
+        self.path = []
+        self.status = "moving"
+        self.emergency_charge_requested = False
+        self.log("Charging complete at %s (Battery: %s%%), resuming task to %s",
+                 self.nav_graph.get_vertex_name(self.current_vertex), self.battery,
+                 self.nav_graph.get_vertex_name(self.target_vertex))
+
+    def plan_next_window(self, traffic_manager):
+        """Book the next window of a cooperative path that ended short of the target"""
+        path = traffic_manager.plan_cooperative_path(
+            self.nav_graph, self.id, self.current_vertex, self.target_vertex
+        )
+        if not path:
+            route = self.nav_graph.find_shortest_path(self.current_vertex, self.target_vertex)
+            path = route[1:] if route else None
+        if not path:
+            return False
+        self.path = path
+        return True
 
     def find_alternative_emergency_path(self, traffic_manager):
         """Special path finding for emergency charging that tries all chargers"""
@@ -231,53 +568,67 @@ class Robot:
         blocked_vertices.discard(self.current_vertex)
         
         # Try to find path to any charger
-        nearest_charger, path = self.nav_graph.find_nearest_charger(
-            self.current_vertex,
-            blocked_lanes,
-            blocked_vertices
-        )
+        nearest_charger, path = self._find_charger(blocked_lanes, blocked_vertices)
+        if path and self.energy_planner is not None and not self.energy_planner.is_feasible(self.battery, path):
+            path = None  # Would run flat on the way, keep the current route and wait
         
         if path:
+            traffic_manager.release_reservations(self.id)
             self.target_vertex = nearest_charger
-            self.path = path
+            self.path = path[1:]
             self.emergency_path_attempts += 1
-            self.log(f"Found emergency path (attempt {self.emergency_path_attempts}) to charger at {self.nav_graph.get_vertex_name(nearest_charger)}")
+            self.log("Found emergency path (attempt %s) to charger at %s", self.emergency_path_attempts, self.nav_graph.get_vertex_name(nearest_charger))
             return True
         
         return False
 
+    def _find_charger(self, blocked_lanes, blocked_vertices):
+        """Charger to head for and the route to it (from the current vertex): scheduled when possible, else the nearest"""
+        if self.charging_scheduler is not None:
+            return self.charging_scheduler.emergency_charger(self, blocked_lanes, blocked_vertices)
+        return self.nav_graph.find_nearest_charger(self.current_vertex, blocked_lanes, blocked_vertices)
+
     def request_emergency_charge(self, traffic_manager):
         """Find nearest charger and navigate to it"""
         self.emergency_charge_requested = True
+        # Come back to an unfinished task once charged
+        if self.resume_target is None and self.status in ("moving", "waiting") and \
+                self.target_vertex is not None and self.target_vertex != self.current_vertex and \
+                not self.nav_graph.is_charger(self.target_vertex):
+            self.resume_target = self.target_vertex
+        
+        # Abandon the lane the robot set off on; it turns back from where it started
+        if self.current_lane is not None:
+            if self.in_flight:
+                traffic_manager.release_lane(self.current_lane, self.id)
+                if self.path and self.path[0] != self.current_vertex:
+                    traffic_manager.release_vertex(self.path[0], self.id)
+            self.progress = 0
+            self.current_lane = None
         
         # Check if we're already at a charger
         if self.nav_graph.is_charger(self.current_vertex):
+            traffic_manager.release_reservations(self.id)
             self.status = "charging"
-            self.charge_progress = 0
-            self.log(f"Low battery! Started charging at {self.nav_graph.get_vertex_name(self.current_vertex)}")
+            self.log("Low battery! Started charging at %s", self.nav_graph.get_vertex_name(self.current_vertex))
             return
 
         # Find nearest charger with path
         blocked_lanes = traffic_manager.get_blocked_lanes_for_robot(self.id)
         blocked_vertices = traffic_manager.get_blocked_vertices_for_robot(self.id)
         
-        nearest_charger, path = self.nav_graph.find_nearest_charger(
-            self.current_vertex,
-            blocked_lanes,
-            blocked_vertices
-        )
+        nearest_charger, path = self._find_charger(blocked_lanes, blocked_vertices)
 
         if nearest_charger is not None:
+            traffic_manager.release_reservations(self.id)
             self.target_vertex = nearest_charger
-            self.path = path
+            self.path = path[1:] if path else []
             self.status = "moving"
-            self.progress = 0
-            self.current_lane = None
             self.path_attempts = 0
             self.emergency_path_attempts = 0
-            traffic_manager.add_conflict(f"Robot {self.id} emergency routing to charger (Battery: {self.battery}%)")
-            self.log(f"Low battery! Redirecting to charger at {self.nav_graph.get_vertex_name(nearest_charger)}")
+            traffic_manager.add_conflict(f"Robot {self.id} emergency routing to charger (Battery: {self.battery}%)", "emergency_charge")
+            self.log("Low battery! Redirecting to charger at %s", self.nav_graph.get_vertex_name(nearest_charger))
         else:
             self.status = "disabled"
-            traffic_manager.add_conflict(f"Robot {self.id} disabled - no charger available!")
-            self.log(f"Critical battery! No charger available (Battery: {self.battery}%)")
\ No newline at end of file
+            traffic_manager.add_conflict(f"Robot {self.id} disabled - no charger available!", "no_charger")
+            self.log("Critical battery! No charger available (Battery: %s%%)", self.battery)
\ No newline at end of file
@@ -0,0 +1,69 @@
+import heapq
+
+
+class RobotRegistry:
+    """Live robots by ID, plus an index of which robot stands at each vertex.
+
+    Despawned IDs are reused, lowest first. Robots report their vertex
+    changes through move(), so looking up the robot at a vertex and
+    checking whether a vertex is free are dictionary lookups rather than
+    scans of the fleet.
+    """
+
+    def __init__(self):
+        self.robots = {}        # robot_id -> robot
+        self.vertex_index = {}  # vertex -> robot whose current_vertex it is
+        self.free_ids = []      # heap of despawned IDs
+        self.next_id = 0
+
+    def new_id(self):
+        """ID for the next robot to be added"""
+        if self.free_ids:
+            return heapq.heappop(self.free_ids)
+        robot_id = self.next_id
+        self.next_id += 1
+        return robot_id
+
+    def add(self, robot):
+        self.robots[robot.id] = robot
+        if robot.current_vertex >= 0:
+            self.vertex_index[robot.current_vertex] = robot
+
+    def remove(self, robot_id):
+        """Drop a robot and make its ID available again"""
+        robot = self.robots.pop(robot_id)
+        if self.vertex_index.get(robot.current_vertex) is robot:
+            del self.vertex_index[robot.current_vertex]
+        heapq.heappush(self.free_ids, robot_id)
+        return robot
+
+    def move(self, robot, vertex):
+        """Re-index a robot whose current vertex is about to change to vertex"""
+        if self.vertex_index.get(robot.current_vertex) is robot:
+            del self.vertex_index[robot.current_vertex]
+        if vertex >= 0:
+            self.vertex_index[vertex] = robot
+
+    def get(self, robot_id, default=None):
+        return self.robots.get(robot_id, default)
+
+    def robot_at(self, vertex):
+        """Robot whose current vertex is vertex (it may be leaving on a lane), or None"""
+        return self.vertex_index.get(vertex)
+
+    def is_vertex_free(self, vertex):
+        """True if no robot is standing at vertex"""
+        robot = self.vertex_index.get(vertex)
+        return robot is None or robot.current_lane is not None
+
+    def __getitem__(self, robot_id):
+        return self.robots[robot_id]
+
+    def __contains__(self, robot_id):
+        return robot_id in self.robots
+
+    def __iter__(self):
+        return iter(list(self.robots.values()))
+
+    def __len__(self):
+        return len(self.robots)
@@ -0,0 +1,108 @@
+import heapq
+import math
+from src.models.nav_graph import NavGraph
+from src.models.map_loader import scan_levels
+
+LIFT_TRANSFER_COST = 10.0  # distance-equivalent cost of riding a lift between two floors
+
+
+class SiteGraph:
+    """All levels of a multi-floor map under one object.
+
+    Only the level names and lift vertices are read up front. Each level's
+    NavGraph is built on first access, and levels nobody uses can be
+    unloaded again. Vertices that share a 'lift' attribute on different
+    levels are connected, so routes can span floors.
+    """
+
+    def __init__(self, json_file, compact=False, use_cache=True):
+        self.json_file = json_file
+        self.compact = compact
+        self.use_cache = use_cache
+        self.level_names, self.vertex_counts, self.lifts = scan_levels(json_file)
+        self.loaded_levels = {}
+
+        # level -> {vertex: lift name}
+        self.lift_vertices = {name: {} for name in self.level_names}
+        for lift, stops in self.lifts.items():
+            for level, vertex in stops.items():
+                self.lift_vertices[level][vertex] = lift
+
+    def level(self, name):
+        """NavGraph for a level, loaded on first access"""
+        if name not in self.loaded_levels:
+            if name not in self.lift_vertices:
+                raise KeyError(f"Unknown level {name!r}")
+            self.loaded_levels[name] = NavGraph(
+                self.json_file, compact=self.compact, use_cache=self.use_cache, level=name
+            )
+        return self.loaded_levels[name]
+
+    def unload_level(self, name):
+        """Drop a level's graph (SiteFleetManager does this once no robots are left on that floor)"""
+        self.loaded_levels.pop(name, None)
+
+    def find_route(self, start_level, start, end_level, end):
+        """Shortest route between (level, vertex) pairs, possibly via lifts.
+
+        Runs Dijkstra over the start, the end and all lift stops. Moves within
+        a floor are priced by that floor's own search, and a lift ride costs
+        LIFT_TRANSFER_COST. Only floors the search actually reaches get loaded.
+        Returns a list of (level, vertex) pairs or None.
+        """
+        source = (start_level, start)
+        goal = (end_level, end)
+        costs = {source: 0.0}
+        parents = {source: None}  # node -> (previous node, segment from it)
+        heap = [(0.0, source)]
+
+        while heap:
+            cost, node = heapq.heappop(heap)
+            if node == goal:
+                return self._build_route(parents, goal)
+            if cost > costs[node]:
+                continue  # Stale heap entry
+
+            level, vertex = node
+            graph = self.level(level)
+            moves = []
+
+            # Moves on this floor: to the goal and to every lift stop
+            targets = list(self.lift_vertices[level])
+            if level == end_level:
+                targets.append(end)
+            for target in targets:
+                if target == vertex:
+                    continue
+                path = graph.find_shortest_path(vertex, target)
+                if path:
+                    segment = [(level, v) for v in path[1:]]
+                    moves.append(((level, target), graph.path_length(path), segment))
+
+            # Lift rides to the other floors this lift serves
+            lift = self.lift_vertices[level].get(vertex)
+            if lift is not None:
+                for other_level, other_vertex in self.lifts[lift].items():
+                    if other_level != level:
+                        moves.append(((other_level, other_vertex), LIFT_TRANSFER_COST,
+                                      [(other_level, other_vertex)]))
+
+            for neighbor, step_cost, segment in moves:
+                new_cost = cost + step_cost
+                if new_cost < costs.get(neighbor, math.inf):
+                    costs[neighbor] = new_cost
+                    parents[neighbor] = (node, segment)
+                    heapq.heappush(heap, (new_cost, neighbor))
+
+        return None
+
+    def _build_route(self, parents, goal):
+        segments = []
+        node = goal
+        while parents[node] is not None:
+            node, segment = parents[node]
+            segments.append(segment)
+        route = [node]
+        for segment in reversed(segments):
+            route.extend(segment)
+        return route
@@ -0,0 +1,111 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the plain loops are the fallback
+    np = None
+
+NUMPY_MIN_ENTRIES = 1 << 14  # cost matrices at least this big are solved with NumPy
+
+
+def solve_assignment(cost):
+    """Minimum-cost assignment of rows to columns (Hungarian algorithm).
+
+    cost is a list of equally long rows of finite numbers. Every row gets a
+    column when there are at least as many columns as rows, and every column
+    gets a row otherwise. Returns a list of (row, column) pairs. Runs in
+    O(n^2 m) for n = min(rows, columns) and m = max(rows, columns). Large
+    matrices scan the columns as NumPy vector operations when NumPy is
+    installed.
+    """
+    if not cost or not cost[0]:
+        return []
+    if len(cost) > len(cost[0]):
+        transposed = [list(column) for column in zip(*cost)]
+        return [(row, column) for column, row in solve_assignment(transposed)]
+
+    n, m = len(cost), len(cost[0])
+    if np is not None and n * m >= NUMPY_MIN_ENTRIES:
+        return _solve_vectorised(np.asarray(cost, dtype='float64'))
+    # Potentials and the matching, 1-based with column 0 as a sentinel
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    match = [0] * (m + 1)  # column -> row matched to it (0 = none)
+    way = [0] * (m + 1)
+
+    for row in range(1, n + 1):
+        match[0] = row
+        column = 0
+        min_slack = [math.inf] * (m + 1)
+        used = [False] * (m + 1)
+        # Grow an alternating tree from the new row until it reaches a free column
+        while True:
+            used[column] = True
+            current_row = match[column]
+            costs = cost[current_row - 1]
+            offset = u[current_row]
+            delta = math.inf
+            next_column = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    slack = costs[j - 1] - offset - v[j]
+                    if slack < min_slack[j]:
+                        min_slack[j] = slack
+                        way[j] = column
+                    if min_slack[j] < delta:
+                        delta = min_slack[j]
+                        next_column = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            column = next_column
+            if match[column] == 0:
+                break
+        # Flip the augmenting path
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+
+    return [(match[j] - 1, j - 1) for j in range(1, m + 1) if match[j]]
+
+
+def _solve_vectorised(cost):
+    """solve_assignment for an n x m NumPy array with n <= m, same steps"""
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    match = np.zeros(m + 1, dtype=np.int64)
+    way = np.zeros(m + 1, dtype=np.int64)
+    slack = np.empty(m + 1)
+    slack[0] = math.inf
+
+    for row in range(1, n + 1):
+        match[0] = row
+        column = 0
+        min_slack = np.full(m + 1, math.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current_row = match[column]
+            slack[1:] = cost[current_row - 1] - u[current_row] - v[1:]
+            better = ~used & (slack < min_slack)
+            min_slack[better] = slack[better]
+            way[better] = column
+            candidates = np.where(used, math.inf, min_slack)
+            column = int(candidates.argmin())
+            delta = candidates[column]
+            u[match[used]] += delta
+            v[used] -= delta
+            min_slack[~used] -= delta
+            if match[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+
+    return [(int(match[j]) - 1, j - 1) for j in range(1, m + 1) if match[j]]
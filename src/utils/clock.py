@@ -0,0 +1,22 @@
+import time
+
+
+class WallClock:
+    """Clock backed by the system time (used by the GUI)"""
+
+    def time(self):
+        return time.time()
+
+
+class SimulatedClock:
+    """Manually advanced clock for running the fleet faster than real time"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+        return self.now
@@ -0,0 +1,96 @@
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+from datetime import datetime
+
+LOG_BATCH_SIZE = 512               # records written per batch
+LOG_FLUSH_INTERVAL = 0.5           # seconds the writer waits for more records
+LOG_MAX_BYTES = 10 * 1024 * 1024   # rotate the log file beyond this size
+LOG_BACKUP_COUNT = 5               # compressed rotations kept (file.1.gz is newest)
+
+_STOP = object()
+
+
+class EventLog:
+    """Structured fleet event log written by a background thread.
+
+    emit() only puts the raw record (timestamp, robot, format string and
+    arguments) on a queue, so nothing is formatted on the simulation thread.
+    The writer thread takes records in batches, formats each one as a line
+    of JSON and appends the batch to the file. Once the file grows past
+    max_bytes it is rotated into gzip-compressed backups.
+    """
+
+    def __init__(self, path, level=logging.INFO, max_bytes=LOG_MAX_BYTES,
+                 backup_count=LOG_BACKUP_COUNT):
+        self.path = path
+        self.level = level
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.SimpleQueue()
+        self.closed = False
+
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.thread = threading.Thread(target=self._run, name="fleet-event-log", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def emit(self, timestamp, robot_id, message, args=(), level=logging.INFO):
+        """Queue a record; message is a %-format string applied to args when written"""
+        if level >= self.level and not self.closed:
+            self.queue.put((timestamp, robot_id, level, message, args))
+
+    def close(self):
+        """Flush everything queued so far and stop the writer thread"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(_STOP)
+        self.thread.join()
+        atexit.unregister(self.close)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            try:
+                while len(batch) < LOG_BATCH_SIZE:
+                    batch.append(self.queue.get(timeout=LOG_FLUSH_INTERVAL if len(batch) == 1 else 0))
+            except queue.Empty:
+                pass
+
+            if _STOP in batch:
+                stopping = True
+                batch = [record for record in batch if record is not _STOP]
+            if batch:
+                self.file.write(''.join(self._format(record) for record in batch))
+                self.file.flush()
+                if self.file.tell() >= self.max_bytes:
+                    self._rotate()
+        self.file.close()
+
+    def _format(self, record):
+        timestamp, robot_id, level, message, args = record
+        return json.dumps({
+            'time': datetime.fromtimestamp(timestamp).isoformat(timespec='milliseconds'),
+            'level': logging.getLevelName(level),
+            'robot': robot_id,
+            'message': message % args if args else message
+        }) + '\n'
+
+    def _rotate(self):
+        self.file.close()
+        for idx in range(self.backup_count - 1, 0, -1):
+            older = f"{self.path}.{idx}.gz"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{idx + 1}.gz")
+        if self.backup_count > 0:
+            with open(self.path, 'rb') as src, gzip.open(f"{self.path}.1.gz", 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+        self.file = open(self.path, 'a', encoding='utf-8')
@@ -0,0 +1,159 @@
+import math
+
+
+class GridIndex:
+    """Uniform grid over 2D points for nearest-point and radius queries.
+
+    Points are bucketed into square cells of cell_size, so a query only
+    looks at the cells around the query point rather than at every point.
+    Points can be inserted, moved and removed, which makes the index usable
+    for moving robots as well as for static vertices.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}   # (cell x, cell y) -> {key: (x, y)}
+        self.points = {}  # key -> (x, y)
+        self.bounds = None  # (min cell x, min cell y, max cell x, max cell y) ever used
+
+    @classmethod
+    def from_points(cls, points, cell_size=None):
+        """Index a sequence of (x, y) points keyed by their position in it.
+
+        Without a cell_size the cells are sized so that an evenly spread
+        set of points averages about one point per cell.
+        """
+        points = list(points)
+        if cell_size is None:
+            cell_size = 1.0
+            if len(points) > 1:
+                xs = [x for x, _ in points]
+                ys = [y for _, y in points]
+                width = max(xs) - min(xs)
+                height = max(ys) - min(ys)
+                area = width * height or max(width, height) ** 2
+                if area > 0:
+                    cell_size = math.sqrt(area / len(points))
+        index = cls(cell_size)
+        for key, (x, y) in enumerate(points):
+            index.insert(key, x, y)
+        return index
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def insert(self, key, x, y):
+        if key in self.points:
+            self.remove(key)
+        cell = self._cell(x, y)
+        self.cells.setdefault(cell, {})[key] = (x, y)
+        self.points[key] = (x, y)
+        if self.bounds is None:
+            self.bounds = (cell[0], cell[1], cell[0], cell[1])
+        else:
+            min_cx, min_cy, max_cx, max_cy = self.bounds
+            self.bounds = (min(min_cx, cell[0]), min(min_cy, cell[1]),
+                           max(max_cx, cell[0]), max(max_cy, cell[1]))
+
+    def remove(self, key):
+        x, y = self.points.pop(key)
+        cell = self._cell(x, y)
+        bucket = self.cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self.cells[cell]
+
+    def move(self, key, x, y):
+        """Update a point's position, cheap when it stays in the same cell"""
+        old = self.points.get(key)
+        if old is not None and self._cell(*old) == self._cell(x, y):
+            self.cells[self._cell(x, y)][key] = (x, y)
+            self.points[key] = (x, y)
+        else:
+            self.insert(key, x, y)
+
+    def within(self, x, y, radius):
+        """Keys of all points within radius of (x, y), nearest first"""
+        min_cx, min_cy = self._cell(x - radius, y - radius)
+        max_cx, max_cy = self._cell(x + radius, y + radius)
+        limit = radius * radius
+        found = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = self.cells.get((cx, cy))
+                if not bucket:
+                    continue
+                for key, (px, py) in bucket.items():
+                    distance = (px - x) ** 2 + (py - y) ** 2
+                    if distance <= limit:
+                        found.append((distance, key))
+        found.sort(key=lambda item: item[0])
+        return [key for _, key in found]
+
+    def in_box(self, min_x, min_y, max_x, max_y):
+        """Keys of all points inside an axis-aligned box, in no particular order"""
+        min_cx, min_cy = self._cell(min_x, min_y)
+        max_cx, max_cy = self._cell(max_x, max_y)
+        if self.bounds is not None:
+            # Clamp to the occupied area so huge boxes do not walk empty cells
+            min_cx, min_cy = max(min_cx, self.bounds[0]), max(min_cy, self.bounds[1])
+            max_cx, max_cy = min(max_cx, self.bounds[2]), min(max_cy, self.bounds[3])
+        found = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = self.cells.get((cx, cy))
+                if not bucket:
+                    continue
+                for key, (px, py) in bucket.items():
+                    if min_x <= px <= max_x and min_y <= py <= max_y:
+                        found.append(key)
+        return found
+
+    def nearest(self, x, y, max_distance=None):
+        """Key of the point nearest to (x, y), or None if none is within max_distance.
+
+        Searches rings of cells outward from the query cell and stops once no
+        unvisited cell can hold anything closer than the best point so far.
+        """
+        if not self.points:
+            return None
+        cx, cy = self._cell(x, y)
+        min_cx, min_cy, max_cx, max_cy = self.bounds
+        # Rings beyond this one lie entirely outside every cell ever used
+        last_ring = max(cx - min_cx, max_cx - cx, cy - min_cy, max_cy - cy)
+        best_key = None
+        best = math.inf if max_distance is None else max_distance * max_distance
+
+        ring = 0
+        while ring <= last_ring:
+            for cell in self._ring_cells(cx, cy, ring):
+                bucket = self.cells.get(cell)
+                if not bucket:
+                    continue
+                for key, (px, py) in bucket.items():
+                    distance = (px - x) ** 2 + (py - y) ** 2
+                    if distance < best or (distance == best and best_key is None):
+                        best, best_key = distance, key
+            # Everything outside this ring is at least ring cells away
+            reach = ring * self.cell_size
+            if reach * reach >= best:
+                break
+            ring += 1
+        return best_key
+
+    def _ring_cells(self, cx, cy, ring):
+        if ring == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-ring, ring + 1):
+            yield (cx + dx, cy - ring)
+            yield (cx + dx, cy + ring)
+        for dy in range(-ring + 1, ring):
+            yield (cx - ring, cy + dy)
+            yield (cx + ring, cy + dy)
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, key):
+        return key in self.points
@@ -0,0 +1,101 @@
+import itertools
+import os
+import random
+
+import pytest
+
+from src.controllers.fleet_manager import FleetManager
+from src.models.nav_graph import NavGraph
+from src.utils import assignment
+from src.utils.assignment import solve_assignment
+from src.utils.clock import SimulatedClock
+
+MAP_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'nav_graph_2.json')
+
+
+def brute_force_cost(cost):
+    """Minimum total cost over every assignment of the smaller side"""
+    rows, columns = len(cost), len(cost[0])
+    if rows <= columns:
+        return min(sum(cost[row][column] for row, column in enumerate(chosen))
+                   for chosen in itertools.permutations(range(columns), rows))
+    return min(sum(cost[row][column] for column, row in enumerate(chosen))
+               for chosen in itertools.permutations(range(rows), columns))
+
+
+def total(cost, pairs):
+    return sum(cost[row][column] for row, column in pairs)
+
+
+def check_matching(cost, pairs):
+    rows, columns = len(cost), len(cost[0])
+    assert len(pairs) == min(rows, columns)
+    assert len({row for row, _ in pairs}) == len(pairs)
+    assert len({column for _, column in pairs}) == len(pairs)
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_solve_assignment_is_optimal(seed):
+    rng = random.Random(seed)
+    rows, columns = rng.randint(1, 6), rng.randint(1, 6)
+    cost = [[rng.choice([rng.randint(0, 20), rng.randint(0, 3)]) for _ in range(columns)] for _ in range(rows)]
+    pairs = solve_assignment(cost)
+    check_matching(cost, pairs)
+    assert total(cost, pairs) == brute_force_cost(cost)
+
+
+def test_vectorised_solver_matches_the_loops():
+    np = pytest.importorskip('numpy')
+    rng = random.Random(5)
+    for rows, columns in ((30, 30), (20, 45), (45, 20), (60, 60)):
+        cost = [[rng.randint(0, 40) for _ in range(columns)] for _ in range(rows)]
+        expected = total(cost, solve_assignment(cost))  # Below NUMPY_MIN_ENTRIES: the loops
+        if rows <= columns:
+            pairs = assignment._solve_vectorised(np.asarray(cost, dtype='float64'))
+        else:
+            transposed = [list(column) for column in zip(*cost)]
+            pairs = [(row, column) for column, row in
+                     assignment._solve_vectorised(np.asarray(transposed, dtype='float64'))]
+        check_matching(cost, pairs)
+        assert total(cost, pairs) == expected
+
+
+@pytest.fixture
+def fleet(tmp_path):
+    manager = FleetManager(NavGraph(MAP_FILE), SimulatedClock(), log_file=str(tmp_path / 'fleet.jsonl'),
+                           thread_safe=False)
+    yield manager
+    manager.close()
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_assign_tasks_minimises_total_lanes(fleet, seed):
+    rng = random.Random(seed)
+    vertices = list(range(len(fleet.nav_graph.vertices)))
+    rng.shuffle(vertices)
+    robot_count, target_count = rng.randint(1, 5), rng.randint(1, 5)
+    robots = [fleet.spawn_robot(vertex) for vertex in vertices[:robot_count]]
+    targets = vertices[robot_count:robot_count + target_count]
+    hops = {target: fleet.nav_graph.hop_counts(target) for target in targets}
+    cost = [[hops[target][robot.current_vertex] for target in targets] for robot in robots]
+    starts = {robot.id: robot.current_vertex for robot in robots}
+
+    results = fleet.assign_tasks(targets)
+
+    assigned = [(robot_id, target) for target, robot_id, _ in results if robot_id is not None]
+    assert len(assigned) == min(robot_count, target_count)
+    assert len({robot_id for robot_id, _ in assigned}) == len(assigned)
+    assert sum(hops[target][starts[robot_id]] for robot_id, target in assigned) == brute_force_cost(cost)
+    for robot_id, target in assigned:
+        assert fleet.robots[robot_id].status == "moving"
+        assert fleet.robots[robot_id].target_vertex == target
+
+
+def test_assign_tasks_skips_robots_already_at_a_target(fleet):
+    graph = fleet.nav_graph
+    standing = fleet.spawn_robot(0)
+    other = fleet.spawn_robot(max(graph.hop_counts(0), key=graph.hop_counts(0).get))
+    results = fleet.assign_tasks([0])
+    # The robot standing on the target is only used when nothing else is left
+    assert results[0][1] == other.id
+    assert standing.status == "idle"
@@ -0,0 +1,164 @@
+import os
+import random
+from collections import Counter
+
+import pytest
+
+from src.controllers.fleet_manager import FleetManager
+from src.controllers.traffic_manager import TrafficManager
+from src.models.nav_graph import NavGraph
+from src.utils.clock import SimulatedClock
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+TICK = 0.1
+
+
+def make_manager():
+    return TrafficManager(SimulatedClock(), thread_safe=False)
+
+
+def hold_and_wait(manager, waits):
+    """Give every robot its own vertex (its ID), then have it wait for the given vertex"""
+    for robot_id in waits:
+        manager.reserve_vertex(robot_id, robot_id)
+    for robot_id, vertex in waits.items():
+        manager.wait_for(robot_id, vertex)
+
+
+def test_two_robot_cycle_is_broken_by_one_victim():
+    manager = make_manager()
+    hold_and_wait(manager, {1: 2, 2: 1})
+    assert manager.get_deadlock_counts() == {'detected': 1}
+    # Neither has yielded before, so the higher ID gives way
+    assert list(manager.deadlock_victims) == [2]
+    assert manager.pop_woken_robots() == {2}
+
+    manager.report_deadlock_resolution(2, "backoff")
+    assert not manager.deadlock_victims
+    assert manager.get_deadlock_counts() == {'detected': 1, 'backoff': 1}
+    assert manager.yields[2] == 1
+
+
+def test_robot_that_yielded_before_is_not_picked_again():
+    manager = make_manager()
+    manager.yields[3] = 1
+    hold_and_wait(manager, {1: 3, 3: 5, 5: 1})
+    assert manager.get_deadlock_counts() == {'detected': 1}
+    assert list(manager.deadlock_victims) == [5]
+
+
+def test_chain_without_cycle_is_not_a_deadlock():
+    manager = make_manager()
+    hold_and_wait(manager, {1: 2, 2: 3, 3: 4})
+    assert manager.get_deadlock_counts() == {}
+    assert not manager.deadlock_victims
+
+
+def test_cycle_through_a_lane_holder():
+    manager = make_manager()
+    manager.reserve_vertex(1, 1)
+    manager.reserve_lane((5, 6), 2)
+    manager.add_waiting_robot(1, 1, blocked_lane=(6, 5))  # Either direction of the lane
+    manager.wait_for(2, 1)
+    assert manager.get_deadlock_counts() == {'detected': 1}
+    assert list(manager.deadlock_victims) == [2]
+
+
+def test_victim_that_cannot_move_hands_the_cycle_on_then_it_is_stuck():
+    manager = make_manager()
+    hold_and_wait(manager, {1: 2, 2: 1})
+    manager.report_deadlock_resolution(2, None)
+    assert list(manager.deadlock_victims) == [1]
+
+    manager.report_deadlock_resolution(1, None)
+    assert not manager.deadlock_victims
+    assert manager.get_deadlock_counts() == {'detected': 1, 'unresolved': 1}
+    assert len(manager.stuck_cycles) == 1
+
+    # A member moving breaks the cycle for good
+    manager.release_vertex(1, 1)
+    assert not manager.stuck_cycles
+    assert 2 in manager.pop_woken_robots()
+
+
+def test_stuck_cycle_retry_is_not_counted_twice():
+    manager = make_manager()
+    hold_and_wait(manager, {1: 2, 2: 1})
+    manager.report_deadlock_resolution(2, None)
+    manager.report_deadlock_resolution(1, None)
+    manager.wait_for(2, None)
+    manager.wait_for(2, 1)  # The same cycle closes again
+    assert list(manager.deadlock_victims) == [2]
+    manager.report_deadlock_resolution(2, "reroute")
+    assert manager.get_deadlock_counts() == {'detected': 1, 'unresolved': 0, 'reroute': 1}
+    assert not manager.stuck_cycles
+
+
+def check_invariants(fleet):
+    """Problems with the fleet's occupancy bookkeeping, as readable strings"""
+    traffic = fleet.traffic_manager
+    robots = {robot.id: robot for robot in fleet.robots}
+    problems = []
+
+    shared = [vertex for vertex, count in Counter(robot.current_vertex for robot in robots.values()).items()
+              if count > 1]
+    if shared:
+        problems.append(f"robots share vertices {shared}")
+
+    held = Counter(traffic.occupied_vertices.values())
+    for robot in robots.values():
+        if traffic.occupied_vertices.get(robot.current_vertex) != robot.id:
+            problems.append(f"robot {robot.id} does not hold its vertex {robot.current_vertex}")
+        # Its own vertex, plus the one ahead while on a lane
+        if held[robot.id] > 1 + (robot.current_lane is not None):
+            problems.append(f"robot {robot.id} holds {held[robot.id]} vertices")
+
+    for lane, robot_id in traffic.occupied_lanes.items():
+        robot = robots.get(robot_id)
+        if robot is None or robot.current_lane != lane:
+            problems.append(f"lane {lane} leaked by robot {robot_id}")
+
+    ghosts = set(traffic.occupied_vertices.values()) | set(traffic.occupied_lanes.values())
+    ghosts.update(robot_id for holders in traffic.lane_holders.values() for robot_id in holders)
+    ghosts.update(robot_id for waiters in traffic.waiters.values() for robot_id in waiters)
+    ghosts.update(traffic.blocked_on)
+    ghosts.update(traffic.deadlock_victims)
+    ghosts.update(traffic.reservations.by_robot)
+    ghosts.update(robot_id for waiting in traffic.waiting_robots.values() for robot_id in waiting)
+    ghosts.difference_update(robots)
+    if ghosts:
+        problems.append(f"resources held by despawned robots {sorted(ghosts)}")
+    return problems
+
+
+@pytest.mark.parametrize('robot_count', [3, 6, 10])
+@pytest.mark.parametrize('seed', range(4))
+def test_fleet_invariants_hold(tmp_path, robot_count, seed):
+    rng = random.Random(seed)
+    # Both 14-vertex maps: 10 robots fill most of them, so waits and deadlocks are common
+    graph = NavGraph(os.path.join(DATA_DIR, f'nav_graph_{1 + seed % 2}.json'))
+    clock = SimulatedClock()
+    fleet = FleetManager(graph, clock, log_file=str(tmp_path / 'fleet.jsonl'), thread_safe=False, tick=TICK)
+    dispatcher = fleet.dispatcher
+    vertices = list(range(len(graph.vertices)))
+    rng.shuffle(vertices)
+    for vertex in vertices[:robot_count]:
+        fleet.spawn_robot(vertex)
+
+    try:
+        for tick in range(3000):
+            for _ in range(len(dispatcher.available) - len(dispatcher.pending)):
+                dispatcher.submit(rng.randrange(len(graph.vertices)))
+            if tick % 500 == 499:
+                # Churn: swap out a robot wherever it is, spawn a new one on a free vertex
+                fleet.despawn_robot(rng.choice([robot.id for robot in fleet.robots]))
+                free = [vertex for vertex in vertices if fleet.robots.is_vertex_free(vertex)
+                        and not fleet.traffic_manager.is_vertex_occupied(vertex)]
+                fleet.spawn_robot(rng.choice(free))
+            fleet.update_robots()
+            clock.advance(TICK)
+            problems = check_invariants(fleet)
+            assert not problems, f"tick {tick}: {problems}"
+    finally:
+        fleet.close()
+    assert dispatcher.completed > 0
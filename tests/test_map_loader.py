@@ -0,0 +1,130 @@
+import io
+import json
+import os
+
+import pytest
+
+from src.models.csr_graph import CSRBuilder
+from src.models.map_loader import JsonStream, LevelCollector, load_csr, read_cache, stream_level
+from src.models.nav_graph import NavGraph
+
+MAP_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'nav_graph_2.json')
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / 'cache'
+    monkeypatch.setenv('FLEET_NAV_CACHE', str(path))
+    return path
+
+
+def graph_arrays(csr):
+    return {
+        'xs': list(csr.xs), 'ys': list(csr.ys), 'offsets': list(csr.offsets),
+        'targets': list(csr.targets), 'weights': list(csr.weights),
+        'chargers': csr.chargers(), 'names': [csr.get_name(idx) for idx in range(csr.vertex_count)],
+        'field': [list(values) for values in csr.build_charger_field()],
+    }
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64])
+def test_json_stream_matches_json_across_chunk_boundaries(chunk_size):
+    document = {'levels': {'L1': {'vertices': [[1.5, -2e3, {'name': 'a"b'}], [10, 20, {}]],
+                                  'lanes': [[0, 1, {}]], 'extra': {'x': [1, 2, {'y': None}]}}},
+                'version': 12345678901}
+    stream = JsonStream(io.StringIO(json.dumps(document)), chunk_size)
+    decoded = {}
+    for key in stream.iter_object():
+        if key != 'levels':
+            decoded[key] = stream.read_value()
+            continue
+        levels = decoded[key] = {}
+        for name in stream.iter_object():
+            sections = levels[name] = {}
+            for section in stream.iter_object():
+                if section in ('vertices', 'lanes'):
+                    sections[section] = list(stream.iter_array())
+                else:
+                    sections[section] = stream.read_value()
+    assert decoded == document
+
+
+def test_json_stream_reports_malformed_input():
+    stream = JsonStream(io.StringIO('{"levels" 1}'), 4)
+    with pytest.raises(ValueError):
+        list(stream.iter_object())
+
+
+def test_streamed_level_matches_json_load():
+    collector = LevelCollector()
+    stream_level(MAP_FILE, collector)
+    with open(MAP_FILE) as f:
+        level = next(iter(json.load(f)['levels'].values()))
+    assert [list(vertex) for vertex in collector.vertices] == level['vertices']
+    assert [lane[:2] for lane in collector.lanes] == [tuple(lane[:2]) for lane in level['lanes']]
+
+
+def test_cache_round_trip(cache_dir):
+    builder = CSRBuilder()
+    stream_level(MAP_FILE, builder)
+    expected = graph_arrays(builder.build())
+
+    cold = load_csr(MAP_FILE)
+    cache_files = os.listdir(cache_dir)
+    assert len(cache_files) == 1
+    warm = read_cache(os.path.join(cache_dir, cache_files[0]))
+    assert warm is not None
+    assert isinstance(warm.xs, memoryview)  # Mapped, not parsed
+    assert graph_arrays(cold) == expected
+    assert graph_arrays(warm) == expected
+    assert graph_arrays(load_csr(MAP_FILE)) == expected
+
+
+def test_cached_charger_field_matches_a_fresh_build(cache_dir):
+    plain = NavGraph(MAP_FILE)
+    NavGraph(MAP_FILE, compact=True)  # Writes the cache
+    cached = NavGraph(MAP_FILE, compact=True)
+    assert isinstance(cached.nearest_charger, memoryview)
+    assert list(cached.nearest_charger) == list(plain.nearest_charger)
+    assert list(cached.charger_distance) == list(plain.charger_distance)
+    assert list(cached.charger_next_hop) == list(plain.charger_next_hop)
+
+
+def test_changed_source_gets_a_new_cache(tmp_path, cache_dir):
+    source = tmp_path / 'map.json'
+    with open(MAP_FILE) as f:
+        document = json.load(f)
+    source.write_text(json.dumps(document))
+    first = load_csr(str(source))
+
+    level = next(iter(document['levels'].values()))
+    level['vertices'][0][0] += 100.0
+    source.write_text(json.dumps(document))
+    os.utime(source, ns=(0, 12345))
+    second = load_csr(str(source))
+
+    assert second.xs[0] == first.xs[0] + 100.0
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_verify_rejects_a_cache_built_from_other_contents(tmp_path, cache_dir):
+    source = tmp_path / 'map.json'
+    source.write_text('{"levels": {"L1": {"vertices": [[1, 0, {}], [2, 0, {"is_charger": true}]], '
+                      '"lanes": [[0, 1, {}]]}}}')
+    stat = os.stat(source)
+    assert load_csr(str(source)).xs[0] == 1
+
+    # Same size and modification time, different contents: only the hash tells
+    source.write_text(source.read_text().replace('[[1, 0', '[[3, 0'))
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert load_csr(str(source)).xs[0] == 1
+    assert load_csr(str(source), verify=True).xs[0] == 3
+
+
+def test_failed_cache_write_warns(tmp_path, monkeypatch):
+    blocker = tmp_path / 'not_a_directory'
+    blocker.write_text('')
+    monkeypatch.setenv('FLEET_NAV_CACHE', str(blocker))
+    with pytest.warns(UserWarning, match='Could not write nav graph cache'):
+        csr = load_csr(MAP_FILE)
+    assert csr.vertex_count > 0
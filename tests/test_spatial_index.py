@@ -0,0 +1,106 @@
+import math
+import random
+
+import pytest
+
+from src.utils.spatial_index import GridIndex
+
+
+def brute_nearest(points, x, y, max_distance=None):
+    best = None
+    for key, (px, py) in points.items():
+        distance = math.hypot(px - x, py - y)
+        if max_distance is not None and distance > max_distance:
+            continue
+        if best is None or distance < best[0]:
+            best = (distance, key)
+    return None if best is None else best[1]
+
+
+def count_rings(index, monkeypatch):
+    """Record the rings nearest() visits"""
+    rings = []
+    ring_cells = index._ring_cells
+
+    def counting(cx, cy, ring):
+        rings.append(ring)
+        return ring_cells(cx, cy, ring)
+
+    monkeypatch.setattr(index, '_ring_cells', counting)
+    return rings
+
+
+@pytest.mark.parametrize('cell_size', [1.0, 3.0, 25.0])
+def test_nearest_matches_brute_force(cell_size):
+    rng = random.Random(cell_size)
+    points = {key: (rng.uniform(-50, 50), rng.uniform(-20, 80)) for key in range(300)}
+    index = GridIndex(cell_size)
+    for key, (x, y) in points.items():
+        index.insert(key, x, y)
+    for _ in range(300):
+        # Queries inside, around and well outside the indexed area
+        x, y = rng.uniform(-80, 80), rng.uniform(-60, 120)
+        expected = brute_nearest(points, x, y)
+        found = index.nearest(x, y)
+        assert math.isclose(math.dist(points[found], (x, y)), math.dist(points[expected], (x, y)))
+
+
+def test_nearest_respects_max_distance():
+    index = GridIndex.from_points([(0.0, 0.0), (10.0, 0.0)])
+    assert index.nearest(4.0, 0.0, max_distance=5.0) == 0
+    assert index.nearest(5.0, 7.0, max_distance=5.0) is None
+    assert index.nearest(9.0, 0.0, max_distance=1.0) == 1
+
+
+def test_nearest_stops_at_the_first_ring_that_cannot_hold_anything_closer(monkeypatch):
+    index = GridIndex(1.0)
+    for key in range(100):
+        index.insert(key, key % 10 + 0.5, key // 10 + 0.5)  # One point per cell centre
+    rings = count_rings(index, monkeypatch)
+    assert index.nearest(4.2, 4.7) == 44
+    # The point in the query's own cell is under a cell away, so ring 1 settles it
+    assert rings == [0, 1]
+    rings.clear()
+    # A query right on a point needs no ring beyond its own cell
+    assert index.nearest(4.5, 4.5) == 44
+    assert rings == [0]
+
+
+def test_nearest_searches_outwards_until_a_point_is_found(monkeypatch):
+    index = GridIndex(1.0)
+    index.insert('far', 0.5, 0.5)
+    index.insert('corner', 20.5, 20.5)
+    rings = count_rings(index, monkeypatch)
+    assert index.nearest(16.5, 16.5) == 'corner'
+    # 'corner' is 4 * sqrt(2) = 5.7 cells away, ring 6 is the first entirely beyond that
+    assert rings == list(range(7))
+
+
+def test_nearest_gives_up_at_max_distance(monkeypatch):
+    index = GridIndex(1.0)
+    index.insert('a', 0.5, 0.5)
+    rings = count_rings(index, monkeypatch)
+    # Nothing within max_distance: rings stop at max_distance, not at the nearest point
+    assert index.nearest(30.5, 0.5, max_distance=3.0) is None
+    assert rings == [0, 1, 2, 3]
+    rings.clear()
+    assert index.nearest(0.5, 0.5, max_distance=0.1) == 'a'
+    assert rings == [0]
+
+
+def test_nearest_on_an_empty_index():
+    index = GridIndex(1.0)
+    assert index.nearest(0.0, 0.0) is None
+    index.insert('a', 1.0, 1.0)
+    index.remove('a')
+    assert index.nearest(1.0, 1.0) is None
+
+
+def test_moved_points_are_found_at_their_new_position():
+    index = GridIndex(2.0)
+    index.insert('robot', 0.0, 0.0)
+    index.insert('other', 5.0, 5.0)
+    index.move('robot', 9.0, 9.0)
+    assert index.nearest(8.0, 8.0) == 'robot'
+    assert index.nearest(0.0, 0.0) == 'other'
+    assert index.within(9.0, 9.0, 0.5) == ['robot']
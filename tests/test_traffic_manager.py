@@ -0,0 +1,91 @@
+import threading
+import time
+
+from src.controllers.traffic_manager import TrafficManager
+from src.utils.clock import SimulatedClock
+
+
+class YieldingDict(dict):
+    """Occupancy dict that lets other threads run between a lookup and what follows it"""
+
+    def get(self, *args):
+        value = super().get(*args)
+        time.sleep(0.001)
+        return value
+
+
+def make_manager(thread_safe=True):
+    return TrafficManager(SimulatedClock(), thread_safe=thread_safe)
+
+
+def test_try_reserve_move_reserves_lane_and_vertex():
+    manager = make_manager()
+    assert manager.try_reserve_move((0, 1), 1, 7) == (True, None)
+    assert manager.occupied_lanes[(0, 1)] == 7
+    assert manager.occupied_vertices[1] == 7
+    # Reserving what the robot already holds succeeds again
+    assert manager.try_reserve_move((0, 1), 1, 7) == (True, None)
+
+
+def test_try_reserve_move_reserves_nothing_when_the_vertex_is_taken():
+    manager = make_manager()
+    manager.reserve_vertex(1, 3)
+    assert manager.try_reserve_move((0, 1), 1, 7) == (False, "vertex")
+    assert (0, 1) not in manager.occupied_lanes
+    assert manager.occupied_vertices[1] == 3
+
+
+def test_try_reserve_move_reserves_nothing_when_the_lane_is_taken():
+    manager = make_manager()
+    manager.reserve_lane((0, 1), 3)
+    assert manager.try_reserve_move((0, 1), 1, 7) == (False, "lane")
+    assert manager.occupied_lanes[(0, 1)] == 3
+    assert 1 not in manager.occupied_vertices
+
+
+def contend(manager, robots, rounds):
+    """Have robots race for the same vertices from their own lanes: vertex -> winning robot IDs"""
+    winners = [[] for _ in range(rounds)]
+    barrier = threading.Barrier(robots)
+
+    def run(robot_id):
+        for vertex in range(rounds):
+            barrier.wait()
+            # Every robot comes from its own vertex, so only the end vertex is shared
+            success, _ = manager.try_reserve_move((1000 + robot_id, vertex), vertex, robot_id)
+            if success:
+                winners[vertex].append(robot_id)
+
+    # Without the locks, robots would now see the vertex free and all take it
+    manager.occupied_vertices = YieldingDict()
+    threads = [threading.Thread(target=run, args=(robot_id,)) for robot_id in range(robots)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return winners
+
+
+def test_try_reserve_move_has_one_winner_per_vertex_under_contention():
+    manager = make_manager()
+    for vertex, vertex_winners in enumerate(contend(manager, robots=8, rounds=50)):
+        assert len(vertex_winners) == 1
+        winner = vertex_winners[0]
+        assert manager.occupied_vertices[vertex] == winner
+        # Losers left no lane behind
+        lanes = [lane for lane in manager.occupied_lanes if lane[1] == vertex]
+        assert lanes == [(1000 + winner, vertex)]
+
+
+def test_release_frees_only_the_holders_resources():
+    manager = make_manager()
+    manager.try_reserve_move((0, 1), 1, 7)
+    manager.release_lane((0, 1), 3)
+    manager.release_vertex(1, 3)
+    assert manager.occupied_lanes[(0, 1)] == 7
+    assert manager.occupied_vertices[1] == 7
+    manager.release_lane((0, 1), 7)
+    manager.release_vertex(1, 7)
+    assert not manager.occupied_lanes
+    assert not manager.occupied_vertices
+    assert not manager.lane_holders